@@ -1,75 +1,114 @@
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_cors import CORS
-from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required
 import os
 
-app = Flask(__name__)
-CORS(app)
-bcrypt = Bcrypt(app)
-
-# Load environment variables
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URL", "sqlite:///users.db")  # fallback for local
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = os.getenv("JWT_SECRET_KEY", "super-secret")  # fallback for local
-
-db = SQLAlchemy(app)
-jwt = JWTManager(app)
-
-# Define User model
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password = db.Column(db.String(128), nullable=False)
-
-with app.app_context():
-    db.create_all()
-
-# Register API
-@app.route("/api/register", methods=["POST"])
-def register():
-    data = request.get_json()
-    username = data.get("username")
-    email = data.get("email")
-    password = data.get("password")
-
-    if User.query.filter_by(email=email).first():
-        return jsonify({"msg": "Email already registered"}), 400
-
-    hashed_pw = bcrypt.generate_password_hash(password).decode("utf-8")
-    new_user = User(username=username, email=email, password=hashed_pw)
-    db.session.add(new_user)
-    db.session.commit()
-
-    return jsonify({"msg": "Registration successful"}), 201
-
-# Login API
-@app.route("/api/login", methods=["POST"])
-def login():
-    data = request.get_json()
-    email = data.get("email")
-    password = data.get("password")
-
-    user = User.query.filter_by(email=email).first()
-
-    if user and bcrypt.check_password_hash(user.password, password):
-        token = create_access_token(identity=user.id)
-        return jsonify({"token": token}), 200
-    return jsonify({"msg": "Invalid email or password"}), 401
-
-# Test API
-@app.route("/api/users", methods=["GET"])
-def users():
-    return jsonify({"msg": "Backend is working fine"}), 200
-
-# Default root
-@app.route("/", methods=["GET"])
-def root():
-    return jsonify({"msg": "Welcome to Mini LinkedIn Backend!"})
-
-# Run the app
-if __name__ == "__main__":
-    port = int(os.environ.get("PORT", 10000))
-    app.run(host="0.0.0.0", port=port, debug=True)
+import click
+from flask import Flask, current_app, jsonify
+from flask.cli import with_appcontext
+
+from config import config
+from extensions import (
+    bulk_io, change_log, compression, conditional_requests, connection_graph, cors, db,
+    instrumentation, jwt, like_buffer, password_hasher, ranked_feed, rate_limiter, read_replicas,
+    response_cache, schema_migrations, search_index, timelines, trending, viewer_resolver
+)
+from json_provider import init_json_provider
+from models import Connection, Post, PostChange, PostLike, TrendingBucket, User, reconcile_counters
+from routes import register_blueprints
+
+
+def create_app(config_name=None):
+    """Build the API app with the settings from ``config.py``.
+
+    ``config_name`` defaults to ``FLASK_ENV`` (``development``, ``production``
+    or ``testing``).
+    """
+    app = Flask(__name__)
+    app.config.from_object(config[config_name or os.environ.get('FLASK_ENV') or 'default'])
+    init_json_provider(app)
+
+    # Initialize extensions; the expensive parts (password hash pool, timeline
+    # warm-up, like flush thread) start on first use
+    db.init_app(app)
+    read_replicas.init_app(app)
+    jwt.init_app(app)
+    cors.init_app(app)
+    # First, so requests over the in-flight cap are shed before any other work
+    rate_limiter.init_app(app)
+    viewer_resolver.init_app(app)
+    password_hasher.init_app(app)
+    search_index.init_app(app, db)
+    response_cache.init_app(app)
+    conditional_requests.init_app(app)
+    compression.init_app(app)
+    instrumentation.init_app(app)
+    connection_graph.init_app(app, db, Connection)
+    timelines.init_app(app, db, Post, User, Connection, connection_graph)
+    ranked_feed.init_app(app, db, Post, PostLike)
+    trending.init_app(app, db, TrendingBucket)
+    like_buffer.init_app(app, db, Post, PostLike)
+    change_log.init_app(app, db, PostChange)
+    bulk_io.init_app(app, db, User=User, Post=Post, PostLike=PostLike)
+    schema_migrations.init_app(app, db)
+
+    # Toggles feed the trending counters. Flushed likes go into the change log
+    # and the trending buckets in the same transaction, and cached responses
+    # are dropped again once they are written
+    like_buffer.after_toggle = [trending.liked]
+    like_buffer.before_commit = [
+        lambda post_ids: change_log.record('likes', post_ids),
+        lambda post_ids: trending.save()
+    ]
+    like_buffer.after_flush = [
+        lambda post_ids: response_cache.invalidate(*(f'post:{post_id}' for post_id in post_ids)),
+        lambda post_ids: trending.saved()
+    ]
+    like_buffer.after_failure = [lambda post_ids: trending.unsaved()]
+    # `flask bulk import` writes rows directly, so every derived structure is
+    # rebuilt once when an import finishes
+    bulk_io.after_import = [reconcile_counters, search_index.rebuild, timelines.rebuild, response_cache.clear]
+
+    register_blueprints(app)
+    app.add_url_rule('/', 'home', home)
+    app.add_url_rule('/api/cache/stats', 'cache_stats', instrumentation.protected(cache_stats))
+    for command in (rebuild_search_index_command, rebuild_timelines_command, reconcile_counters_command):
+        app.cli.add_command(command)
+
+    # Bring the schema up to date; production can run `flask db upgrade`
+    # as a release step instead (AUTO_MIGRATE=0)
+    if app.config['AUTO_MIGRATE']:
+        with app.app_context():
+            schema_migrations.upgrade()
+
+    return app
+
+# Root endpoint for testing
+def home():
+    return jsonify({'message': 'Mini LinkedIn API is running', 'version': '1.0'}), 200
+
+def cache_stats():
+    return jsonify(response_cache.snapshot()), 200
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Repopulate the full-text search index from the posts and users tables."""
+    search_index.rebuild()
+    print(f"Rebuilt {search_index.backend.name} search index")
+
+@click.command('rebuild-timelines')
+@with_appcontext
+def rebuild_timelines_command():
+    """Drop the materialized timelines; each reloads from posts when next read."""
+    timelines.rebuild()
+    print(f"Dropped timelines ({current_app.config['TIMELINE_BACKEND']} store); they reload on first read")
+
+@click.command('reconcile-counters')
+@with_appcontext
+def reconcile_counters_command():
+    """Recompute likes_count and posts_count after drift."""
+    fixed = reconcile_counters()
+    print(f"Reconciled likes_count on {fixed['posts']} posts and posts_count on {fixed['users']} users")
+
+if __name__ == '__main__':
+    # Development server only; production runs gunicorn -c gunicorn.conf.py wsgi:app
+    create_app().run(debug=os.environ.get('FLASK_ENV') != 'production',
+                     port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,7 @@
+"""ASGI entry point: async read endpoints in front of the Flask app.
+
+    uvicorn asgi:app --workers 4
+"""
+from async_api import app
+
+application = app
@@ -0,0 +1,506 @@
+"""Asyncio read path for the busiest GET endpoints.
+
+``GET /api/posts``, ``/api/posts/user/<id>``, ``/api/search`` and
+``/api/users/<id>`` are served by async handlers on SQLAlchemy's async
+engine (aiosqlite for SQLite, asyncpg for Postgres), so a worker keeps
+serving other requests while it waits on the database. So is the
+``/api/posts/events`` stream, which only exists here (see ``events.py``).
+Every other route is passed through to the Flask app from ``wsgi.py``,
+which runs in a thread pool:
+
+    uvicorn asgi:app --workers 4
+
+The handlers share the ``User``/``Post``/``PostLike`` models, serializers,
+pagination cursors, search backends, token cache and pending-like overlay
+with the Flask app and return the same JSON, with the same ETags,
+conditional 304s (``versions.py``), compression, rate limits and in-flight
+cap (``ratelimit.py``), and read from the same replicas (``replicas.py``;
+streamed bodies read the primary). Two differences: they
+read posts straight from the indexed ``posts`` table rather than the
+materialized timelines, and they don't go through the Flask response cache.
+"""
+import asyncio
+from contextvars import ContextVar
+from functools import wraps
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import configure_mappers
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse as StarletteJSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import versions
+from changes import (
+    LIKES_FIELDS, ChangesExpired, decode_change_cursor, delta, encode_change_cursor, fold
+)
+from compression import negotiate
+from conditional import not_modified, validator_headers
+from events import Broadcaster, format_event
+from pagination import (
+    PaginationError, is_paginated_request, keyset_filter, parse_limit, split_page
+)
+from extensions import (
+    change_log, compression, db, like_buffer, ranked_feed, rate_limiter, read_replicas, search_index,
+    viewer_resolver
+)
+from models import Connection, Post, PostLike, User
+from projection import (
+    POST_COLUMNS, USER_COLUMNS, FieldsError, parse_fields, post_options, user_options
+)
+from ranking import RankingUnavailable, SortError
+from ratelimit import client_key, retry_after
+from replicas import PIN_HEADER
+from routes.common import feed_options
+from streaming import (
+    STREAM_BATCH_SIZE, STREAM_MIMETYPES, StreamFormatError, close_stream, compact_dumps, encode_items,
+    stream_format
+)
+from timeline import FeedError, in_network
+from wsgi import app as flask_app
+
+# Post.author is a backref, only created once the mappers are configured
+configure_mappers()
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_database_url(url):
+    """The async-driver equivalent of a synchronous SQLAlchemy URL."""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend}')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+with flask_app.app_context():
+    # The resolved URL: Flask-SQLAlchemy puts relative SQLite paths in instance/
+    engine = create_async_engine(
+        async_database_url(db.engine.url), **flask_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    )
+    search_backend = search_index.backend
+sessions = async_sessionmaker(engine, expire_on_commit=False)
+replica_engines = {}  # replica URL -> async engine, created on first use
+# Replica index the current handler reads from, set by read_only
+read_replica = ContextVar('read_replica', default=None)
+
+
+def Session():
+    """A session on the primary, or on this request's replica."""
+    index = read_replica.get()
+    if index is None:
+        return sessions()
+    url = read_replicas.engine(index).url
+    if url not in replica_engines:
+        replica_engines[url] = create_async_engine(
+            async_database_url(url), **flask_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        )
+    return sessions(bind=replica_engines[url])
+# The Flask app's JSON provider (orjson when installed), so both paths send the same bytes
+dumps = compact_dumps(flask_app.json)
+
+
+class JSONResponse(StarletteJSONResponse):
+    def render(self, content):
+        return dumps(content).encode()
+
+
+def viewer_id(request):
+    """The bearer token's user id; like the Flask views, bad tokens read as anonymous."""
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    if scheme != 'Bearer' or not token:
+        return None
+    with flask_app.app_context():
+        return viewer_resolver.resolve_token(token)[0]
+
+
+def conditional(statement, per_viewer=True, overlaid=False, ranked=False, network=False):
+    """``ConditionalRequests.conditional`` for a handler: 304 before it runs
+    when the client's copy is current. ``statement(**path_params)`` is one of
+    the ``versions`` statements; ``ranked`` if the handler serves ``?sort=ranked``
+    and ``network`` if it serves ``?feed=network``."""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            if not flask_app.config['CONDITIONAL_REQUESTS_ENABLED']:
+                return await handler(request)
+            params = dict(request.path_params)
+            network_of = viewer_id(request) if network and versions.is_network(request.query_params) else None
+            if network_of:
+                params['network_of'] = network_of
+            async with Session() as session:
+                row = (await session.execute(statement(**params))).first()
+            version = versions.version_of(row, overlaid, ranked and versions.is_ranked(request.query_params),
+                                          bool(network_of))
+            if version is None:
+                return await handler(request)
+
+            etag = version.etag(viewer_id(request) if per_viewer else None)
+            if not_modified(request.headers, etag, version.last_modified):
+                response = Response(status_code=304)
+            else:
+                response = await handler(request)
+                if response.status_code != 200:
+                    return response
+            response.headers.update(validator_headers(etag, version.last_modified, per_viewer))
+            if per_viewer:
+                response.headers.add_vary_header('Authorization')
+            return response
+        return wrapper
+    return decorator
+
+
+async def compress_stream(chunks, compressor):
+    async for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        if data := compressor.compress(chunk) + compressor.flush():
+            yield data
+    yield compressor.finish()
+
+
+def compressed(handler):
+    """The Flask app's gzip/brotli compression (``compression.py``) for a handler."""
+    @wraps(handler)
+    async def wrapper(request):
+        response = await handler(request)
+        if not compression.eligible(response.media_type, response.status_code):
+            return response
+        response.headers.add_vary_header('Accept-Encoding')
+        encoding = negotiate(request.headers.get('accept-encoding'))
+        if encoding is None:
+            return response
+
+        if isinstance(response, StreamingResponse):
+            response.body_iterator = compress_stream(response.body_iterator, compression.compressor(encoding))
+        elif len(response.body) >= flask_app.config['COMPRESS_MIN_SIZE']:
+            compressor = compression.compressor(encoding)
+            response.body = compressor.compress(response.body) + compressor.finish()
+            response.headers['content-length'] = str(len(response.body))
+        else:
+            return response
+        response.headers['content-encoding'] = encoding
+        return response
+    return wrapper
+
+
+def admitted(handler):
+    """The Flask app's in-flight cap (``ratelimit.py``) for a handler. A
+    streamed body is counted until the handler returns, not until it is sent."""
+    @wraps(handler)
+    async def wrapper(request):
+        if not rate_limiter.enter():
+            return JSONResponse({'message': 'Server busy, please retry'}, status_code=503, headers={
+                'Retry-After': retry_after(flask_app.config['ADMISSION_RETRY_AFTER'])
+            })
+        try:
+            return await handler(request)
+        finally:
+            rate_limiter.leave()
+    return wrapper
+
+
+def rate_limited(budget):
+    """``RateLimiter.limit`` for a handler. The check runs in a thread: the
+    SQLite bucket store waits on the file's write lock, which would stall
+    every request and stream on the event loop."""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            client = client_key(viewer_id(request), request.client.host if request.client else None)
+            wait = await run_in_threadpool(rate_limiter.check, budget, client)
+            if wait:
+                return JSONResponse({'message': 'Too many requests, please retry later'}, status_code=429,
+                                    headers={'Retry-After': retry_after(wait)})
+            return await handler(request)
+        return wrapper
+    return decorator
+
+
+def read_only(handler=None, primary_when=None):
+    """``ReadReplicas.read_only`` for a handler."""
+    def decorate(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            if read_replicas.pinned(viewer_id(request), request.headers.get(PIN_HEADER)) \
+                    or (primary_when is not None and primary_when(request.query_params)):
+                return await handler(request)
+            token = read_replica.set(read_replicas.pick())
+            try:
+                return await handler(request)
+            finally:
+                read_replica.reset(token)
+        return wrapper
+    return decorate(handler) if handler is not None else decorate
+
+
+def posts_query(fields=None):
+    return select(Post).options(*post_options(fields))
+
+
+async def load_in_order(session, query, model, ids):
+    if not ids:
+        return []
+    rows = {row.id: row for row in (await session.scalars(query.where(model.id.in_(ids))))}
+    return [rows[row_id] for row_id in ids if row_id in rows]
+
+
+async def serialize_posts(session, posts, current_user_id=None, fields=None):
+    liked_ids = set()
+    if current_user_id and posts and (fields is None or 'liked_by_user' in fields):
+        liked_ids = set(await session.scalars(select(PostLike.post_id).where(
+            PostLike.user_id == current_user_id, PostLike.post_id.in_([post.id for post in posts])
+        )))
+    result = [post.to_dict(current_user_id, post.id in liked_ids, fields) for post in posts]
+    return like_buffer.overlay(result, current_user_id)
+
+
+async def stream_posts(query, current_user_id, fields, fmt):
+    """``streaming.encode_stream`` over an async server-side cursor."""
+    first = True
+    async with Session() as session:
+        result = await session.stream_scalars(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for posts in result.partitions():
+            yield encode_items(await serialize_posts(session, posts, current_user_id, fields), fmt, first, dumps)
+            first = False
+    if closing := close_stream(fmt, first):
+        yield closing
+
+
+async def post_list(request, query, fields=None):
+    """Shared body of the feed endpoints: full list, or one keyset page."""
+    current_user_id = viewer_id(request)
+    if not is_paginated_request(request.query_params):
+        # Compatibility mode: clients that don't page get the full list
+        query = query.order_by(Post.created_at.desc(), Post.id.desc())
+        stream = stream_format(request.query_params)
+        if stream:
+            return StreamingResponse(stream_posts(query, current_user_id, fields, stream),
+                                     media_type=STREAM_MIMETYPES[stream])
+        async with Session() as session:
+            posts = (await session.scalars(query)).all()
+            return JSONResponse(await serialize_posts(session, posts, current_user_id, fields))
+
+    async with Session() as session:
+        limit = parse_limit(request.query_params.get('limit'))
+        rows = (await session.scalars(
+            keyset_filter(query, Post, request.query_params.get('cursor'), limit)
+        )).all()
+        posts, next_cursor = split_page(rows, limit)
+        return JSONResponse({
+            'posts': await serialize_posts(session, posts, current_user_id, fields),
+            'next_cursor': next_cursor
+        })
+
+
+async def ranked_posts(request, fields):
+    """The ``?sort=ranked`` list or page; the ranking is shared with the Flask app."""
+    params = request.query_params
+    limit = parse_limit(params.get('limit')) if is_paginated_request(params) else None
+    current_user_id = viewer_id(request)
+    async with Session() as session:
+        post_ids, next_cursor = await session.run_sync(
+            lambda sync_session: ranked_feed.page(sync_session, current_user_id, params.get('cursor'), limit)
+        )
+        posts = await load_in_order(session, posts_query(fields), Post, post_ids)
+        posts = await serialize_posts(session, posts, current_user_id, fields)
+    if limit is None:
+        return posts
+    return {'posts': posts, 'next_cursor': next_cursor}
+
+
+@admitted
+@read_only(primary_when=lambda params: 'since' in params)
+@compressed
+@conditional(versions.feed_statement, overlaid=True, ranked=True, network=True)
+async def get_all_posts(request):
+    try:
+        since = request.query_params.get('since')
+        if since is not None:
+            async with Session() as session:
+                after = await changes_start(session, since)
+                return JSONResponse(await post_changes(session, after, viewer_id(request)))
+        fields, network, ranked = feed_options(request.query_params)
+        if network and not viewer_id(request):
+            return JSONResponse({'message': 'Log in to see your network feed'}, status_code=401)
+        if ranked:
+            return JSONResponse(await ranked_posts(request, fields))
+        query = posts_query(fields)
+        if network:
+            query = query.where(in_network(Post, Connection, viewer_id(request)))
+        return await post_list(request, query, fields)
+    except (PaginationError, StreamFormatError, FieldsError, SortError, FeedError) as e:
+        return JSONResponse({'message': str(e)}, status_code=400)
+    except ChangesExpired as e:
+        return JSONResponse({'message': str(e)}, status_code=410)
+    except RankingUnavailable as e:
+        return JSONResponse({'message': str(e)}, status_code=501)
+    except Exception as e:
+        print(f"Async get posts error: {e}")
+        return JSONResponse({'message': 'Failed to fetch posts'}, status_code=500)
+
+
+@admitted
+@read_only
+@compressed
+@conditional(versions.author_feed_statement, overlaid=True)
+async def get_user_posts(request):
+    try:
+        user_id = request.path_params['user_id']
+        fields = parse_fields(request.query_params, POST_COLUMNS)
+        return await post_list(request, posts_query(fields).where(Post.author_id == user_id), fields)
+    except (PaginationError, StreamFormatError, FieldsError) as e:
+        return JSONResponse({'message': str(e)}, status_code=400)
+    except Exception as e:
+        print(f"Async get user posts error: {e}")
+        return JSONResponse({'message': 'Failed to fetch user posts'}, status_code=500)
+
+
+# Change log: ?since= deltas and the event stream
+
+# Events are the same for every client, so they leave liked_by_user out
+EVENT_POST_FIELDS = frozenset(POST_COLUMNS) - {'liked_by_user'}
+EVENT_LIKES_FIELDS = LIKES_FIELDS - {'liked_by_user'}
+
+
+async def changes_start(session, since):
+    return change_log.start(since, *(await session.execute(change_log.bounds_statement())).one())
+
+
+async def post_changes(session, after, current_user_id=None, post_fields=None, likes_fields=LIKES_FIELDS):
+    """The delta for the changes after ``after``; see ``changes.py``."""
+    changes, has_more = change_log.split((await session.scalars(change_log.page_statement(after))).all())
+    created, deleted, liked = fold(changes)
+    posts = (await session.scalars(posts_query(post_fields).where(Post.id.in_(created)).order_by(
+        Post.created_at.desc(), Post.id.desc()
+    ))).all()
+    likes = await load_in_order(session, posts_query(likes_fields), Post, liked)
+    return delta(
+        await serialize_posts(session, posts, current_user_id, post_fields),
+        deleted,
+        await serialize_posts(session, likes, current_user_id, likes_fields),
+        changes[-1].id if changes else after,
+        has_more
+    )
+
+
+async def fetch_event(after):
+    """``Broadcaster.fetch``: one ``changes`` event for the changes after ``after``."""
+    async with Session() as session:
+        if after is None:
+            return await changes_start(session, 'now'), None, False
+        body = await post_changes(session, after, post_fields=EVENT_POST_FIELDS, likes_fields=EVENT_LIKES_FIELDS)
+    last_id = decode_change_cursor(body['next_cursor'])
+    if last_id == after:
+        return after, None, False
+    return last_id, format_event(dumps(body), body['next_cursor'], 'changes'), body['has_more']
+
+
+broadcaster = Broadcaster(
+    fetch_event,
+    interval=flask_app.config['CHANGES_POLL_INTERVAL'],
+    heartbeat=flask_app.config['CHANGES_HEARTBEAT'],
+    hello=lambda cursor: format_event('{}', encode_change_cursor(cursor), 'ready'),
+)
+
+
+async def post_events(request):
+    """``GET /api/posts/events``: the change log as server-sent events.
+
+    Starts after ``Last-Event-ID`` (sent by a reconnecting ``EventSource``)
+    or ``?since=``, else from now; the first event, ``ready``, carries the
+    starting cursor.
+    """
+    since = request.headers.get('last-event-id') or request.query_params.get('since')
+    after = None
+    try:
+        if since is not None:
+            async with Session() as session:
+                after = await changes_start(session, since)
+    except PaginationError as e:
+        return JSONResponse({'message': str(e)}, status_code=400)
+    except ChangesExpired as e:
+        return JSONResponse({'message': str(e)}, status_code=410)
+    return StreamingResponse(broadcaster.subscribe(after), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@admitted
+@read_only
+@compressed
+@conditional(versions.profile_statement, per_viewer=False)
+async def get_user(request):
+    try:
+        async with Session() as session:
+            user = await session.get(User, request.path_params['user_id'])
+            if not user:
+                return JSONResponse({'message': 'User not found'}, status_code=404)
+            return JSONResponse(user.to_dict(include_counts=True))
+    except Exception as e:
+        print(f"Async get user error: {e}")
+        return JSONResponse({'message': 'Failed to fetch user'}, status_code=500)
+
+
+async def search_users(query, fields):
+    async with Session() as session:
+        ids = await session.run_sync(lambda sync_session: search_backend.user_ids(sync_session, query, 10))
+        users = await load_in_order(session, select(User).options(*user_options(fields)), User, ids)
+        return [user.to_dict(include_counts=True, fields=fields) for user in users]
+
+
+async def search_posts(query, fields):
+    async with Session() as session:
+        ids = await session.run_sync(
+            lambda sync_session: search_backend.post_ids(sync_session, query, 10, match_author=False)
+        )
+        posts = await load_in_order(session, posts_query(fields), Post, ids)
+        return await serialize_posts(session, posts, fields=fields)
+
+
+@admitted
+@read_only
+@rate_limited('search')
+@compressed
+async def search(request):
+    try:
+        query = request.query_params.get('q', '').strip()
+        user_fields = parse_fields(request.query_params, USER_COLUMNS, 'user_fields')
+        post_fields = parse_fields(request.query_params, POST_COLUMNS, 'post_fields')
+        if not query:
+            return JSONResponse({'users': [], 'posts': []})
+
+        # Independent queries on separate connections, so they run concurrently
+        users, posts = await asyncio.gather(search_users(query, user_fields), search_posts(query, post_fields))
+        return JSONResponse({'users': users, 'posts': posts})
+    except FieldsError as e:
+        return JSONResponse({'message': str(e)}, status_code=400)
+    except Exception as e:
+        print(f"Async search error: {e}")
+        return JSONResponse({'message': 'Search failed'}, status_code=500)
+
+
+async def dispose_engine():
+    await engine.dispose()
+    for replica_engine in replica_engines.values():
+        await replica_engine.dispose()
+
+
+# Flask-CORS covers the Flask routes (including preflight OPTIONS for these paths)
+cors = [Middleware(CORSMiddleware, allow_origins=['*'])]
+
+app = Starlette(
+    routes=[
+        Route('/api/posts', get_all_posts, methods=['GET'], middleware=cors),
+        Route('/api/posts/user/{user_id:int}', get_user_posts, methods=['GET'], middleware=cors),
+        Route('/api/users/{user_id:int}', get_user, methods=['GET'], middleware=cors),
+        Route('/api/search', search, methods=['GET'], middleware=cors),
+        Route('/api/posts/events', post_events, methods=['GET'], middleware=cors),
+        # Everything else, including writes, is the Flask app
+        Mount('', app=WSGIMiddleware(flask_app)),
+    ],
+    on_shutdown=[dispose_engine],
+)
@@ -0,0 +1,124 @@
+"""Benchmark: connection lists, mutual counts and "people you may know" for a 10k-connection user.
+
+Seeds an SQLite database (reused on later runs) with ``--users`` users
+connected at random, ``--degree`` connections each on average, plus one
+hub user connected to ``--hub`` of them. Times the hub's requests through
+Flask test clients, with NumPy and with the pure-Python fallback:
+
+* ``list``: a page of the hub's connections (``?limit=20``).
+* ``mutual``: mutual connections of the hub and one of its connections.
+* ``counts``: ``/mutual-counts`` for 100 users.
+* ``suggestions``: people you may know, from the adjacency already loaded.
+* ``cold``: suggestions right after clearing the adjacency (loads every
+  list it needs from the database).
+
+    python backend/benchmarks/bench_connections.py --hub 10000 --iterations 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import batched_insert  # noqa: E402
+
+
+def seed(db, User, Connection, users, degree, hub, seed=0):
+    rng = random.Random(seed)
+    batched_insert(db, User.__table__, (
+        {'name': f'Bench User {i}', 'email': f'user{i}@bench.example', 'password_hash': 'x'}
+        for i in range(users)
+    ))
+    edges = set()
+    # The hub is user 1
+    edges.update((1, other) for other in rng.sample(range(2, users + 1), hub))
+    while len(edges) < hub + users * degree // 2:
+        a, b = rng.randint(2, users), rng.randint(2, users)
+        if a != b:
+            edges.add((min(a, b), max(a, b)))
+    batched_insert(db, Connection.__table__, (
+        {'user_id': user_id, 'connection_id': connection_id}
+        for a, b in edges for user_id, connection_id in ((a, b), (b, a))
+    ))
+    db.session.commit()
+
+
+def ensure_dataset(path, users, degree, hub):
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    from app import create_app
+    from extensions import db
+    from models import Connection, User
+
+    app = create_app('production')
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    with app.app_context():
+        if not db.session.query(Connection.id).first():
+            started = time.perf_counter()
+            seed(db, User, Connection, users, degree, hub)
+            print(f'Seeded in {time.perf_counter() - started:.0f}s')
+    return app
+
+
+def timed(client, url, headers, iterations, before=None):
+    times = []
+    for _ in range(iterations):
+        if before:
+            before()
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        response.get_data()
+        times.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.get_json()
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.95) - 1 if len(times) > 1 else 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--degree', type=int, default=50)
+    parser.add_argument('--hub', type=int, default=10_000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--db', default='/tmp/bench_connections.db')
+    args = parser.parse_args()
+
+    app = ensure_dataset(args.db, args.users, args.degree, args.hub)
+    import graph
+    from extensions import connection_graph
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        headers = {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+        friend = connection_graph.connections_of(1)[0]
+        sample = ','.join(str(user_id) for user_id in range(2, 102))
+        lists = connection_graph.connections_of_many(list(connection_graph.connections_of(1)))
+        print(f'hub: {args.hub} connections, {sum(map(len, lists.values()))} ids among their lists\n')
+    client = app.test_client()
+    scenarios = [
+        ('list', '/api/connections/1?limit=20', None),
+        ('mutual', f'/api/connections/{friend}/mutual', None),
+        ('counts', f'/api/connections/mutual-counts?ids={sample}', None),
+        ('suggestions', '/api/connections/suggestions', None),
+        ('cold', '/api/connections/suggestions', connection_graph.clear),
+    ]
+
+    numpy = graph.np
+    print(f'{"scenario":<14}{"mode":<10}{"p50 ms":>10}{"p95 ms":>10}')
+    for mode, np_module in [('numpy', numpy), ('python', None)]:
+        if mode == 'numpy' and numpy is None:
+            continue
+        graph.np = np_module
+        client.get('/api/connections/suggestions', headers=headers)  # load the adjacency
+        for name, url, before in scenarios:
+            iterations = max(3, args.iterations // 10) if before else args.iterations
+            p50, p95 = timed(client, url, headers, iterations, before)
+            print(f'{name:<14}{mode:<10}{p50:>10.2f}{p95:>10.2f}')
+    graph.np = numpy
+
+
+if __name__ == '__main__':
+    main()
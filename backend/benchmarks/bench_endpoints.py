@@ -0,0 +1,303 @@
+"""Benchmark: latency, throughput and queries per request for the main endpoints.
+
+Seeds a synthetic dataset (see ``datagen.py``; reused across runs), then
+drives each scenario with concurrent clients and reports p50/p95/p99,
+requests/s and SQL statements per request.
+
+Drivers:
+
+* ``inprocess`` (default): Flask test clients, one per thread. No sockets,
+  so it isolates the application's own cost.
+* ``http``: ``requests`` sessions over real HTTP. Without ``--url`` a
+  threaded Werkzeug server is started in this process (so queries can still
+  be counted); with ``--url`` it targets an already running server, seeded
+  with the same ``datagen`` settings, and queries per request are unknown.
+
+Results are written as JSON; pass ``--baseline`` to compare against a
+stored run (exit status 1 on regression).
+
+    python backend/benchmarks/bench_endpoints.py --requests 500 --concurrency 8 -o results.json
+    python backend/benchmarks/bench_endpoints.py --baseline backend/benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import WORDS, ensure_dataset  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+# Scenarios: name -> fn(rng, ctx) returning (method, path, user_id or None)
+
+def feed(rng, ctx):
+    return 'GET', '/api/posts?limit=20', rng.choice(ctx['user_ids'])
+
+
+def search(rng, ctx):
+    return 'GET', f'/api/search?q={rng.choice(WORDS[:200])}', None
+
+
+def like_toggle(rng, ctx):
+    return 'POST', f'/api/posts/{rng.choice(ctx["hot_post_ids"])}/like', rng.choice(ctx['user_ids'])
+
+
+def profile(rng, ctx):
+    return 'GET', f'/api/users/{rng.choice(ctx["user_ids"])}', None
+
+
+def user_list(rng, ctx):
+    return 'GET', '/api/users', None
+
+
+SCENARIOS = {
+    'feed': feed,
+    'search': search,
+    'like_toggle': like_toggle,
+    'profile': profile,
+    'user_list': user_list,
+}
+
+
+class QueryCounter:
+    """Counts SQL statements executed by the app's engine."""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        from sqlalchemy import event
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+# Drivers
+
+class InProcessDriver:
+    name = 'inprocess'
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, headers):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client.open(path, method=method, headers=headers).status_code
+
+    def close(self):
+        pass
+
+
+class HttpDriver:
+    name = 'http'
+
+    def __init__(self, app, url=None):
+        import requests
+        self.requests = requests
+        self.server = None
+        if url is None:
+            from werkzeug.serving import WSGIRequestHandler, make_server
+
+            class QuietHandler(WSGIRequestHandler):
+                def log_request(self, *args):
+                    pass
+
+            self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            url = f'http://127.0.0.1:{self.server.server_port}'
+        self.url = url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, headers):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self.requests.Session()
+        return session.request(method, self.url + path, headers=headers).status_code
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+
+# Running
+
+def percentile(sorted_values, pct):
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(driver, counter, scenario, ctx, args):
+    rng = random.Random(args.seed)
+    calls = [scenario(rng, ctx) for _ in range(args.warmup + args.requests)]
+
+    def call(spec):
+        method, path, user_id = spec
+        headers = {'Authorization': f'Bearer {ctx["tokens"][user_id]}'} if user_id else {}
+        started = time.perf_counter()
+        status = driver.request(method, path, headers)
+        return (time.perf_counter() - started) * 1000, status
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(call, calls[:args.warmup]))
+        queries_before = counter.count if counter else 0
+        started = time.perf_counter()
+        results = list(pool.map(call, calls[args.warmup:]))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'requests': args.requests,
+        'errors': sum(1 for _, status in results if status >= 400),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'throughput_rps': round(args.requests / elapsed, 1),
+        'queries_per_request': round((counter.count - queries_before) / args.requests, 2) if counter else None,
+    }
+
+
+def build_context(app, args):
+    from flask_jwt_extended import create_access_token
+    from extensions import db
+    from models import Post, User
+
+    with app.app_context():
+        user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+        hot_post_ids = [post_id for (post_id,) in db.session.query(Post.id).order_by(
+            Post.likes_count.desc()
+        ).limit(50)]
+        tokens = {user_id: create_access_token(identity=str(user_id)) for user_id in user_ids}
+    return {'user_ids': user_ids, 'hot_post_ids': hot_post_ids, 'tokens': tokens}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# Baseline comparison
+
+# Settings that must match for latencies to be comparable
+COMPARABLE = ('driver', 'concurrency', 'users', 'posts', 'likes', 'skew', 'response_cache')
+# p95 changes smaller than this are scheduler noise, whatever the percentage
+MIN_P95_DELTA_MS = 2.0
+
+
+def compare(results, baseline, tolerance):
+    """Print per-endpoint deltas; return the names that regressed."""
+    regressions = []
+    print(f'\nvs. baseline ({baseline["meta"].get("revision")}, tolerance {tolerance:.0%})')
+    mismatched = [key for key in COMPARABLE if results['meta'].get(key) != baseline['meta'].get(key)]
+    if mismatched:
+        print(f'warning: baseline was recorded with different {", ".join(mismatched)}')
+    print(f'{"endpoint":<14}{"p95 ms":>18}{"req/s":>20}{"queries":>14}')
+    for name, current in results['endpoints'].items():
+        base = baseline['endpoints'].get(name)
+        if base is None:
+            continue
+        p95_change = current['p95_ms'] / base['p95_ms'] - 1 if base['p95_ms'] else 0
+        rps_change = current['throughput_rps'] / base['throughput_rps'] - 1 if base['throughput_rps'] else 0
+        queries, base_queries = current['queries_per_request'], base['queries_per_request']
+        # Cache hit rates shift a little between runs, so allow the same slack
+        queries_grew = (queries is not None and base_queries is not None
+                        and queries > base_queries * (1 + tolerance) + 0.1)
+        regressed = ((p95_change > tolerance and current['p95_ms'] - base['p95_ms'] > MIN_P95_DELTA_MS)
+                     or rps_change < -tolerance or queries_grew)
+        if regressed:
+            regressions.append(name)
+        print(f'{name:<14}{base["p95_ms"]:>8.1f} {p95_change:>+8.0%}{base["throughput_rps"]:>10.0f} '
+              f'{rps_change:>+8.0%}{str(base_queries):>7} -> {str(queries):<5}'
+              f'{"  REGRESSED" if regressed else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--driver', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--url', help='http driver: benchmark an already running server')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated subset')
+    parser.add_argument('--requests', type=int, default=300, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--likes', type=int, default=100_000)
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent for popularity')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default='/tmp/bench_endpoints.db')
+    parser.add_argument('--no-cache', action='store_true', help='disable the response cache')
+    parser.add_argument('-o', '--output', help='write results JSON here')
+    parser.add_argument('--baseline', help=f'compare against a results file, e.g. {DEFAULT_BASELINE}')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95/throughput change')
+    args = parser.parse_args()
+
+    app = ensure_dataset(args.db, args.users, args.posts, args.likes, args.seed, args.skew)
+    if args.no_cache:
+        app.config['RESPONSE_CACHE_ENABLED'] = False
+    ctx = build_context(app, args)
+
+    counter = None
+    if args.url is None:
+        from extensions import db
+        with app.app_context():
+            counter = QueryCounter(db.engine)
+    if args.driver == 'http':
+        driver = HttpDriver(app, args.url)
+    else:
+        driver = InProcessDriver(app)
+
+    results = {
+        'meta': {
+            'driver': driver.name, 'url': args.url, 'requests': args.requests,
+            'concurrency': args.concurrency, 'users': args.users, 'posts': args.posts,
+            'likes': args.likes, 'skew': args.skew, 'response_cache': not args.no_cache,
+            'revision': git_revision(), 'python': platform.python_version(),
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+        },
+        'endpoints': {},
+    }
+    print(f'{driver.name} driver, {args.concurrency} clients, {args.requests} requests per scenario\n')
+    print(f'{"endpoint":<14}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"req/s":>10}{"queries":>10}{"errors":>8}')
+    try:
+        for name in args.scenarios.split(','):
+            row = run_scenario(driver, counter, SCENARIOS[name], ctx, args)
+            results['endpoints'][name] = row
+            queries = '-' if row['queries_per_request'] is None else row['queries_per_request']
+            print(f'{name:<14}{row["p50_ms"]:>10.2f}{row["p95_ms"]:>10.2f}{row["p99_ms"]:>10.2f}'
+                  f'{row["throughput_rps"]:>10.0f}{queries:>10}{row["errors"]:>8}')
+    finally:
+        driver.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nWrote {args.output}')
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f'\nRegressed: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Benchmark: thousands of idle /api/posts/events connections on one uvicorn worker.
+
+Starts ``uvicorn asgi:app`` on a fresh SQLite database and opens
+``--clients`` server-sent event streams from one asyncio client process.
+With every stream idle it reports the server's resident memory and thread
+count (from ``/proc``); then it creates posts over HTTP and reports how long
+each took to reach every client.
+
+Each connection is a file descriptor on both sides; both processes raise
+their soft limit up to the hard one (``ulimit -Hn``) as needed.
+
+    python backend/benchmarks/bench_events.py --clients 5000 --posts 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_server import BACKEND, free_port, wait_for_port  # noqa: E402
+
+
+def seed(db_path):
+    """One user to post with; returns a bearer token."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from extensions import db
+    from models import User
+
+    app = create_app('production')
+    with app.app_context():
+        user = User(name='Bench Poster', email='poster@bench.example')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        return create_access_token(identity=str(user.id))
+
+
+def server_usage(pid):
+    status = dict(line.split(':', 1) for line in open(f'/proc/{pid}/status'))
+    return int(status['VmRSS'].split()[0]) / 1024, int(status['Threads'])
+
+
+async def listen(port, ready, received):
+    """One SSE client: counts ``ready`` and records when each ``changes`` event arrives."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=1 << 20)
+    writer.write(b'GET /api/posts/events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n')
+    await writer.drain()
+    try:
+        while line := await reader.readline():
+            if line.startswith(b'event: ready'):
+                ready.release()
+            elif line.startswith(b'event: changes'):
+                received.append(time.perf_counter())
+    finally:
+        writer.close()
+
+
+def create_post(port, token, content):
+    request = urllib.request.Request(
+        f'http://127.0.0.1:{port}/api/posts', data=json.dumps({'content': content}).encode(),
+        headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+    )
+    urllib.request.urlopen(request).read()
+
+
+async def run(args, port, pid, token):
+    ready = asyncio.Semaphore(0)
+    received = []
+    started = time.perf_counter()
+    clients = []
+    for _ in range(args.clients):
+        clients.append(asyncio.create_task(listen(port, ready, received)))
+        # Stay under the listen backlog while connecting
+        if len(clients) % 500 == 0:
+            await asyncio.sleep(0.2)
+    for _ in range(args.clients):
+        await ready.acquire()
+    print(f'{args.clients} streams connected in {time.perf_counter() - started:.1f}s')
+
+    await asyncio.sleep(args.idle)
+    rss, threads = server_usage(pid)
+    print(f'server while idle: {rss:.0f} MB RSS ({rss * 1024 / args.clients:.1f} KB per stream), '
+          f'{threads} threads')
+
+    print(f'\n{"post":<6}{"first ms":>10}{"p50 ms":>10}{"p99 ms":>10}{"last ms":>10}{"delivered":>11}')
+    for i in range(args.posts):
+        received.clear()
+        sent = time.perf_counter()
+        await asyncio.to_thread(create_post, port, token, f'bench post {i}')
+        deadline = sent + args.interval * 2 + 10
+        while len(received) < args.clients and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        latencies = sorted((at - sent) * 1000 for at in received)
+        if latencies:
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f'{i:<6}{latencies[0]:>10.1f}{statistics.median(latencies):>10.1f}{p99:>10.1f}'
+                  f'{latencies[-1]:>10.1f}{len(latencies):>11}')
+        else:
+            print(f'{i:<6}{"-":>10}{"-":>10}{"-":>10}{"-":>10}{0:>11}')
+        await asyncio.sleep(args.interval)
+
+    for client in clients:
+        client.cancel()
+    await asyncio.gather(*clients, return_exceptions=True)
+
+
+def start_server(port, env, clients):
+    # Through uvicorn.run, to raise the server's descriptor limit first
+    command = [sys.executable, '-c', (
+        'import resource, uvicorn; '
+        'soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE); '
+        f'resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, {clients * 2 + 100})), hard)); '
+        f'uvicorn.run("asgi:app", port={port}, backlog=4096, access_log=False, log_level="warning", '
+        'timeout_graceful_shutdown=1)'
+    )]
+    return subprocess.Popen(command, cwd=BACKEND, env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=2_000)
+    parser.add_argument('--posts', type=int, default=5)
+    parser.add_argument('--interval', type=float, default=1.0, help='CHANGES_POLL_INTERVAL for the server')
+    parser.add_argument('--idle', type=float, default=2.0, help='seconds to wait before measuring memory')
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < args.clients + 100:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, args.clients * 2 + 100), hard))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'events.db')
+        token = seed(db_path)
+        port = free_port()
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', FLASK_ENV='production',
+                   CHANGES_POLL_INTERVAL=str(args.interval))
+        process = start_server(port, env, args.clients)
+        try:
+            wait_for_port(port, process)
+            asyncio.run(run(args, port, process.pid, token))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
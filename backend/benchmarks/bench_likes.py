@@ -0,0 +1,100 @@
+"""Benchmark: like toggles under contention, synchronous vs. write-behind.
+
+Many concurrent clients, each with its own user, toggle likes on the same
+few hot posts (``--hot-posts``; 1 by default, the worst case: every write
+touches one ``likes_count`` row). Each mode runs the same request sequence
+in-process against the seeded SQLite dataset (see ``datagen.py``):
+
+* ``sync``: ``LIKE_WRITE_BEHIND`` off, one transaction per toggle.
+* ``write-behind``: toggles coalesce per (user, post) in the like buffer;
+  its flush thread writes the like rows and ``likes_count`` in batches.
+
+SQL statements per request include the flush thread's. After each mode the
+buffer is flushed and ``likes_count`` is checked against the rows in
+``post_likes``.
+
+Keep ``--concurrency`` under the connection pool (5 + 10 overflow for
+SQLite files): beyond it the tail latencies measure threads queueing for a
+connection rather than the like path.
+
+    python backend/benchmarks/bench_likes.py --concurrency 12 --requests 3000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import InProcessDriver, QueryCounter, build_context, run_scenario  # noqa: E402
+from datagen import ensure_dataset  # noqa: E402
+
+MODES = [('sync', False), ('write-behind', True)]
+
+
+def contention(hot_post_ids, user_ids):
+    def scenario(rng, ctx):
+        return 'POST', f'/api/posts/{rng.choice(hot_post_ids)}/like', rng.choice(user_ids)
+    return scenario
+
+
+def check_counts(app, post_ids):
+    """Posts whose likes_count disagrees with post_likes."""
+    from extensions import db
+    from models import Post, PostLike
+
+    with app.app_context():
+        rows = db.session.query(Post.id, Post.likes_count).filter(Post.id.in_(post_ids)).all()
+        stored = dict(db.session.query(PostLike.post_id, db.func.count(PostLike.id)).filter(
+            PostLike.post_id.in_(post_ids)
+        ).group_by(PostLike.post_id).all())
+    return [post_id for post_id, likes_count in rows if likes_count != stored.get(post_id, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=12)
+    parser.add_argument('--hot-posts', type=int, default=1)
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--likes', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default='/tmp/bench_endpoints.db')
+    args = parser.parse_args()
+
+    app = ensure_dataset(args.db, args.users, args.posts, args.likes, args.seed)
+    from extensions import db, like_buffer
+    ctx = build_context(app, args)
+    hot_post_ids = ctx['hot_post_ids'][:args.hot_posts]
+    # One user per client: requests from the same client never race each other
+    user_ids = random.Random(args.seed).sample(ctx['user_ids'], min(args.concurrency, len(ctx['user_ids'])))
+    scenario = contention(hot_post_ids, user_ids)
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+    driver = InProcessDriver(app)
+
+    print(f'{args.concurrency} clients toggling {len(hot_post_ids)} hot post(s), '
+          f'{args.requests} requests, flush every {like_buffer.interval}s or {like_buffer.max_pending} pairs\n')
+    print(f'{"mode":<14}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+          f'{"queries":>10}{"errors":>8}{"drift":>8}')
+    for label, write_behind in MODES:
+        like_buffer.flush()
+        like_buffer.enabled = write_behind
+        row = run_scenario(driver, counter, scenario, ctx, args)
+        # Durability check: everything buffered is in the database after a flush
+        started = time.perf_counter()
+        like_buffer.flush()
+        final_flush_ms = (time.perf_counter() - started) * 1000
+        drift = check_counts(app, hot_post_ids)
+        print(f'{label:<14}{row["throughput_rps"]:>10.0f}{row["p50_ms"]:>10.2f}{row["p95_ms"]:>10.2f}'
+              f'{row["p99_ms"]:>10.2f}{row["queries_per_request"]:>10.2f}{row["errors"]:>8}{len(drift):>8}'
+              f'   (final flush {final_flush_ms:.1f} ms)')
+    driver.close()
+
+
+if __name__ == '__main__':
+    main()
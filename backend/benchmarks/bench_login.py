@@ -0,0 +1,81 @@
+"""Benchmark: login throughput at several password-hash cost settings.
+
+Each setting registers a fresh user and then fires concurrent logins at
+POST /api/auth/login through Flask test clients, one per thread.
+
+    python backend/benchmarks/bench_login.py --threads 16 --requests 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SETTINGS = [
+    ('pbkdf2_sha256', 100_000),
+    ('pbkdf2_sha256', 300_000),
+    ('pbkdf2_sha256', 600_000),
+    ('scrypt', 14),
+    ('scrypt', 15),
+    ('bcrypt', 10),
+    ('bcrypt', 12),
+]
+
+
+def run_setting(app, db, User, password_hasher, algorithm, cost, args):
+    password_hasher.configure(algorithm, cost, workers=args.workers, max_pending=args.requests)
+    email = f'{algorithm}-{cost}@example.com'
+    with app.app_context():
+        user = User(name='Bench', email=email)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+
+    def login(_):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post('/api/auth/login', json={'email': email, 'password': 'password123'})
+        assert response.status_code == 200, response.get_json()
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        latencies = sorted(pool.map(login, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return args.requests / elapsed, statistics.median(latencies), p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='hash pool size')
+    parser.add_argument('--requests', type=int, default=100, help='logins per setting')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_login.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    # Load generators are one client hammering one route: exactly what the limits stop
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    from app import create_app
+    from extensions import db, password_hasher
+    from models import User
+    from passwords import HASHERS
+
+    app = create_app()
+
+    print(f'{args.requests} logins, {args.threads} clients, {args.workers} hash workers\n')
+    print(f'{"algorithm":<16}{"cost":>8}{"logins/s":>12}{"p50 ms":>10}{"p95 ms":>10}')
+    for algorithm, cost in SETTINGS:
+        if algorithm not in HASHERS:
+            continue  # bcrypt is optional
+        rate, p50, p95 = run_setting(app, db, User, password_hasher, algorithm, cost, args)
+        print(f'{algorithm:<16}{cost:>8}{rate:>12.1f}{p50:>10.1f}{p95:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
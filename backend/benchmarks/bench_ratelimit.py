@@ -0,0 +1,106 @@
+"""Benchmark: cost of the rate limiter and the in-flight cap.
+
+* ``take``: one token-bucket take in each store, over ``--clients`` keys.
+* ``request``: ``GET /api/search`` through the Flask test client with
+  limits off and with each store, to show the per-request overhead.
+* ``flood``: ``--threads`` clients hammering ``/api/search`` on one app with
+  ``ADMISSION_MAX_IN_FLIGHT`` set to ``--cap``; how many get 503 and the
+  latency of the rest, against the same flood without the cap.
+
+    python backend/benchmarks/bench_ratelimit.py --threads 64 --cap 8
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import ensure_dataset  # noqa: E402
+
+
+def per_call_us(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def flood(app, threads, requests_each):
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        for _ in range(requests_each):
+            started = time.perf_counter()
+            status = client.get('/api/search?q=python').status_code
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                statuses.append(status)
+                if status == 200:
+                    latencies.append(elapsed)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    return statuses.count(503), statistics.median(latencies) if latencies else 0, p99, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=10_000)
+    parser.add_argument('--iterations', type=int, default=20_000)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--cap', type=int, default=8)
+    parser.add_argument('--db', default='/tmp/bench_endpoints.db')
+    args = parser.parse_args()
+
+    app = ensure_dataset(args.db, 1_000, 20_000, 100_000)
+    from extensions import rate_limiter
+    from ratelimit import BUCKET_STORES
+
+    config = {**app.config, 'RATE_LIMIT_SQLITE_PATH': os.path.join(tempfile.mkdtemp(), 'rate_limits.db')}
+    stores = {name: cls(config) for name, cls in sorted(BUCKET_STORES.items())}
+    keys = [f'search:ip:10.0.{i // 256}.{i % 256}' for i in range(args.clients)]
+    print(f'{"store":<10}{"take µs":>10}')
+    for name, store in stores.items():
+        take = lambda: store.take(random.choice(keys), 60, 1.0, time.time())  # noqa: E731
+        print(f'{name:<10}{per_call_us(take, args.iterations):>10.1f}')
+
+    # Limits high enough that nothing is rejected: only the overhead shows
+    app.config['RATE_LIMITS'] = {**app.config['RATE_LIMITS'], 'search': (10 ** 9, 1)}
+    client = app.test_client()
+    search = lambda: client.get('/api/search?q=python')  # noqa: E731
+    search()
+    print(f'\n{"limits":<10}{"request µs":>12}')
+    app.config['RATE_LIMIT_ENABLED'] = False
+    print(f'{"off":<10}{per_call_us(search, args.requests):>12.0f}')
+    app.config['RATE_LIMIT_ENABLED'] = True
+    for name, store in stores.items():
+        rate_limiter.store = store
+        print(f'{name:<10}{per_call_us(search, args.requests):>12.0f}')
+
+    each = max(1, args.requests // args.threads)
+    print(f'\n{args.threads} threads x {each} requests of /api/search')
+    print(f'{"cap":<10}{"503s":>8}{"p50 ms":>10}{"p99 ms":>10}{"wall s":>10}')
+    for cap in (0, args.cap):
+        app.config['ADMISSION_MAX_IN_FLIGHT'] = cap
+        shed, p50, p99, wall = flood(app, args.threads, each)
+        print(f'{cap or "off":<10}{shed:>8}{p50:>10.1f}{p99:>10.1f}{wall:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark: read routing over SQLite file copies standing in for replicas.
+
+Copies the ``datagen`` database ``--replicas`` times, then times:
+
+* ``pick``: choosing the next healthy replica (per call).
+* ``check``: one health probe of every replica.
+* the feed, a profile and a search through the Flask test client with the
+  primary only and with the copies, with the response cache off, so every
+  request reaches a database;
+* the same reads by a user pinned to the primary after a write.
+
+    python backend/benchmarks/bench_replicas.py --replicas 2
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import ensure_dataset  # noqa: E402
+
+URLS = ['/api/posts?limit=20', '/api/users/42', '/api/search?q=python']
+
+
+def per_call_us(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def median_ms(client, url, requests, headers=None):
+    times = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        client.get(url, headers=headers)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--replicas', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--db', default='/tmp/bench_endpoints.db')
+    args = parser.parse_args()
+
+    app = ensure_dataset(args.db, 1_000, 20_000, 100_000)
+    from flask_jwt_extended import create_access_token
+    from extensions import read_replicas
+    from replicas import PIN_HEADER
+
+    with app.app_context():
+        headers = {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+    paths = []
+    for index in range(args.replicas):
+        path = f'{args.db}.replica{index}'
+        shutil.copyfile(args.db, path)
+        paths.append(path)
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    client = app.test_client()
+
+    results = {}
+    for label, uris in (('primary', []), (f'{args.replicas} replicas', [f'sqlite:///{path}' for path in paths])):
+        app.config['READ_REPLICA_URIS'] = uris
+        read_replicas.clear()
+        for url in URLS:
+            client.get(url, headers=headers)  # warm the pools
+        results[label] = [median_ms(client, url, args.requests, headers) for url in URLS]
+
+    print(f'{"":<12}{"pick µs":>10}{"check ms":>10}')
+    print(f'{"replicas":<12}{per_call_us(read_replicas.pick, 100_000):>10.2f}'
+          f'{per_call_us(read_replicas.check, 100) / 1000:>10.2f}')
+
+    pinned_headers = {**headers, PIN_HEADER: read_replicas.pin(1)}
+    print(f'{"pinned":<12}{per_call_us(lambda: read_replicas.pinned(1, pinned_headers[PIN_HEADER]), 100_000):>10.2f}')
+    results['pinned'] = [median_ms(client, url, args.requests, pinned_headers) for url in URLS]
+    print(f'\n{"p50 ms":<16}' + ''.join(f'{url.split("?")[0]:>18}' for url in URLS))
+    for label, timings in results.items():
+        print(f'{label:<16}' + ''.join(f'{ms:>18.2f}' for ms in timings))
+    print(f'\nreplicas healthy: {read_replicas.healthy()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark: full-text search index vs. the old ILIKE '%q%' scans.
+
+Seeds an SQLite database with synthetic users and posts (1M posts by
+default; the file is reused on later runs) and times both search paths
+for a handful of queries.
+
+    python backend/benchmarks/bench_search.py --posts 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Zipf-ish vocabulary: a few very common words, a long tail of rare ones
+WORDS = (
+    'python flask react hiring remote startup engineer design product data '
+    'cloud team launch growth mentor career learning network conference open '
+    'source security mobile backend frontend analytics leadership project'
+).split() + [f'topic{i}' for i in range(20_000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(WORDS))))
+QUERIES = ['python', 'remote engineer', 'topic1234', 'topic19999', 'Author 42', 'nosuchword']
+
+
+def seed(db, User, Post, users, posts, batch_size=50_000):
+    start = datetime.utcnow() - timedelta(days=365)
+    db.session.execute(User.__table__.insert(), [
+        {'name': f'Author {i}', 'email': f'author{i}@example.com', 'password_hash': '',
+         'job_title': random.choice(WORDS).title(), 'created_at': start}
+        for i in range(users)
+    ])
+    for offset in range(0, posts, batch_size):
+        db.session.execute(Post.__table__.insert(), [
+            {'content': ' '.join(random.choices(WORDS, cum_weights=CUM_WEIGHTS, k=12)),
+             'author_id': random.randint(1, users),
+             'created_at': start + timedelta(seconds=offset + i)}
+            for i in range(min(batch_size, posts - offset))
+        ])
+        print(f'  seeded {offset + batch_size:,} posts', end='\r', flush=True)
+    db.session.commit()
+    print()
+
+
+def time_query(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', default='/tmp/bench_search.db')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{args.db}'
+    from app import create_app
+    from extensions import db, search_index
+    from models import Post, User
+    from search import LikeBackend
+
+    app = create_app()
+
+    with app.app_context():
+        if Post.query.count() < args.posts:
+            db.drop_all()
+            db.create_all()
+            print(f'Seeding {args.users:,} users and {args.posts:,} posts into {args.db}')
+            seed(db, User, Post, args.users, args.posts)
+            started = time.perf_counter()
+            search_index.rebuild()
+            print(f'Built {search_index.backend.name} index in {time.perf_counter() - started:.1f}s')
+
+        like, fts = LikeBackend(), search_index.backend
+        print(f'\n{"query":<22}{"ILIKE ms":>12}{fts.name + " ms":>18}{"speedup":>10}')
+        for query in QUERIES:
+            like_ms = time_query(lambda: like.post_ids(db.session, query, 20), args.repeat)
+            fts_ms = time_query(lambda: fts.post_ids(db.session, query, 20), args.repeat)
+            print(f'{query:<22}{like_ms:>12.1f}{fts_ms:>18.1f}{like_ms / fts_ms:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark: serializing a 1,000-post feed, stdlib vs. orjson, full vs. projected fields.
+
+Three layers, each timed for both JSON providers:
+
+* ``encode``: ``app.json.response()`` on the already-built list of dicts.
+* ``to_dict+encode``: ``serialize_posts`` on loaded posts, then encode.
+* ``GET``: ``GET /api/posts`` end to end (SQL, serialization, encoding),
+  once with every field and once with ``?fields=`` (``--fields``).
+
+The feed is the compatibility full list of a 1,000-post in-memory database,
+requested by a viewer who has liked some of the posts. The response cache
+is off.
+
+    python backend/benchmarks/bench_serialize.py --iterations 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from json_provider import OrjsonProvider, orjson  # noqa: E402
+
+PROVIDERS = {'stdlib': DefaultJSONProvider}
+if orjson is not None:
+    PROVIDERS['orjson'] = OrjsonProvider
+
+
+def seed(app, posts, authors):
+    from flask_jwt_extended import create_access_token
+
+    from extensions import db, password_hasher, timelines
+    from models import Post, PostLike, User, reconcile_counters
+
+    with app.app_context():
+        password_hash = password_hasher.hash('password123')
+        db.session.add_all([
+            User(name=f'Author {i}', email=f'author{i}@bench.example', password_hash=password_hash,
+                 bio='Writing about data', job_title='Engineer', avatar=f'/avatars/{i}.png')
+            for i in range(authors)
+        ])
+        db.session.flush()
+        db.session.add_all([
+            Post(content=f'Post {i}: shipping the new search index, ask me anything ' * 3,
+                 author_id=i % authors + 1)
+            for i in range(posts)
+        ])
+        db.session.flush()
+        db.session.add_all([PostLike(user_id=1, post_id=post_id) for post_id in range(1, posts + 1, 3)])
+        db.session.commit()
+        reconcile_counters()
+        timelines.rebuild()
+        return {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+
+
+def timed(fn, iterations):
+    fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1_000)
+    parser.add_argument('--authors', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--fields', default='content,author_name,likes_count,liked_by_user')
+    args = parser.parse_args()
+
+    os.environ.setdefault('RESPONSE_CACHE_ENABLED', '0')
+    from app import create_app
+    from extensions import db
+    from models import Post
+    from routes.common import serialize_posts
+
+    app = create_app('testing')
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    headers = seed(app, args.posts, args.authors)
+    client = app.test_client()
+
+    print(f"\n{args.posts:,}-post feed, median of {args.iterations} runs\n")
+    print(f"{'layer':<28} {'provider':<8} {'ms':>8} {'feeds/s':>9} {'KB':>8}")
+    for name, provider_class in PROVIDERS.items():
+        app.json = provider_class(app)
+        with app.test_request_context():
+            posts = Post.query.options(db.joinedload(Post.author)).order_by(
+                Post.created_at.desc(), Post.id.desc()
+            ).all()
+            data = serialize_posts(posts, 1)
+            layers = [
+                ('encode', lambda: app.json.response(data).get_data()),
+                ('to_dict+encode', lambda: app.json.response(serialize_posts(posts, 1)).get_data()),
+            ]
+            results = [(layer, *timed(fn, args.iterations)) for layer, fn in layers]
+        for label, url in (('GET /api/posts', '/api/posts'),
+                           ('GET /api/posts?fields=...', f'/api/posts?fields={args.fields}')):
+            results.append((label, *timed(lambda: client.get(url, headers=headers).get_data(), args.iterations)))
+        for layer, seconds, body in results:
+            print(f"{layer:<28} {name:<8} {seconds * 1000:>8.2f} {1 / seconds:>9.1f} {len(body) / 1024:>8.1f}")
+    if orjson is None:
+        print('\norjson is not installed; only the stdlib provider was measured')
+
+
+if __name__ == '__main__':
+    main()
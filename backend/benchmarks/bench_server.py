@@ -0,0 +1,96 @@
+"""Benchmark: Flask dev server vs. gunicorn worker configurations vs. the ASGI app.
+
+Starts each server as a subprocess on the same seeded SQLite dataset (see
+``datagen.py``), drives it over HTTP with the ``bench_endpoints`` scenarios
+and prints throughput and latency per server.
+
+    python backend/benchmarks/bench_server.py --concurrency 16 --requests 500
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_endpoints import SCENARIOS, HttpDriver, build_context, run_scenario  # noqa: E402
+from datagen import ensure_dataset  # noqa: E402
+
+DEV_SERVER = ("from app import create_app; "
+              "create_app().run(port={port}, debug=True, use_reloader=False)")
+
+
+def servers(port):
+    gunicorn = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+    return [
+        ('dev server (debug)', [sys.executable, '-c', DEV_SERVER.format(port=port)], {}),
+        ('gunicorn 1x1 sync', gunicorn, {'WEB_CONCURRENCY': '1', 'GUNICORN_THREADS': '1'}),
+        ('gunicorn 2x4 gthread', gunicorn, {'WEB_CONCURRENCY': '2', 'GUNICORN_THREADS': '4'}),
+        ('gunicorn 4x4 gthread', gunicorn, {'WEB_CONCURRENCY': '4', 'GUNICORN_THREADS': '4'}),
+        # Async read endpoints (async_api.py) in front of the same Flask app
+        ('uvicorn asgi 1 worker', [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+                                   '--no-access-log', '--log-level', 'warning'], {'FLASK_ENV': 'production'}),
+    ]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default='feed,search,profile,user_list')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--likes', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default='/tmp/bench_endpoints.db')
+    args = parser.parse_args()
+
+    app = ensure_dataset(args.db, args.users, args.posts, args.likes, args.seed)
+    ctx = build_context(app, args)
+    names = args.scenarios.split(',')
+
+    print(f'{args.concurrency} HTTP clients, {args.requests} requests per scenario, {os.cpu_count()} CPUs\n')
+    print(f'{"server":<24}{"scenario":<12}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}')
+    for label, command, extra_env in servers(port := free_port()):
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{args.db}', PORT=str(port),
+                   GUNICORN_ACCESS_LOG='', **extra_env)
+        process = subprocess.Popen(command, cwd=BACKEND, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port, process)
+            driver = HttpDriver(None, f'http://127.0.0.1:{port}')
+            for name in names:
+                row = run_scenario(driver, None, SCENARIOS[name], ctx, args)
+                print(f'{label:<24}{name:<12}{row["throughput_rps"]:>10.0f}{row["p50_ms"]:>10.2f}'
+                      f'{row["p95_ms"]:>10.2f}{row["p99_ms"]:>10.2f}{row["errors"]:>8}')
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark: cold start and per-request import overhead.
+
+Cold start runs ``--code`` (by default: build the app with ``create_app``)
+in fresh interpreters and reports the time to a ready app and to the first
+response, plus import time per package from ``python -X importtime``. The
+first run creates the tables, so the measured runs start against an
+existing database, like a restarted worker.
+
+Per-request import overhead compares a view that imports its model inside
+the function body (the old ``from app import Post  # Lazy import`` pattern)
+with one using the module-level name.
+
+    python backend/benchmarks/bench_startup.py --runs 10
+    # an older checkout, before create_app existed
+    python backend/benchmarks/bench_startup.py --code "import simple_app; app = simple_app.app"
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import timeit
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CODE = 'from app import create_app; app = create_app()'
+
+CHILD = '''
+import json, time
+started = time.perf_counter()
+{code}
+ready = time.perf_counter()
+app.test_client().get('/api/posts?limit=20')
+first_response = time.perf_counter()
+print(json.dumps({{'ready_ms': (ready - started) * 1000, 'first_response_ms': (first_response - started) * 1000}}))
+'''
+
+
+def child_env(db):
+    # Production cost settings: the dummy hash must cost what a real one does
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db}')
+    env.pop('PASSWORD_HASH_COST', None)
+    return env
+
+
+def cold_start(code, db, runs):
+    samples = []
+    for _ in range(runs + 1):
+        output = subprocess.run([sys.executable, '-c', CHILD.format(code=code)], cwd=BACKEND,
+                                env=child_env(db), capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return samples[1:]  # the first run created the tables
+
+
+def import_time_by_package(code, db):
+    """Self time of every module imported, summed per top-level package."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=BACKEND,
+                            env=child_env(db), capture_output=True, text=True, check=True).stderr
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def import_overhead(number):
+    setup = f'import sys; sys.path.insert(0, {BACKEND!r}); import config'
+    local_import = timeit.timeit('from config import Config; Config', setup=setup, number=number)
+    global_name = timeit.timeit('Config', setup=setup + '; Config = config.Config', number=number)
+    return local_import / number * 1e9, global_name / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--code', default=DEFAULT_CODE, help='builds `app` in a fresh interpreter')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--db', default='/tmp/bench_startup.db')
+    args = parser.parse_args()
+
+    samples = cold_start(args.code, args.db, args.runs)
+    ready = [sample['ready_ms'] for sample in samples]
+    first = [sample['first_response_ms'] for sample in samples]
+    print(f'cold start ({args.runs} runs): {args.code}')
+    print(f'{"":<22}{"median ms":>12}{"min ms":>10}{"max ms":>10}')
+    for label, values in (('app ready', ready), ('first response', first)):
+        print(f'{label:<22}{statistics.median(values):>12.1f}{min(values):>10.1f}{max(values):>10.1f}')
+
+    print('\nimport time by package (self time)')
+    for package, self_us in import_time_by_package(args.code, args.db)[:8]:
+        print(f'  {package:<28}{self_us / 1000:>8.1f} ms')
+
+    local_ns, global_ns = import_overhead(1_000_000)
+    print('\nper-request model lookup')
+    print(f'  import inside the view   {local_ns:>8.0f} ns')
+    print(f'  module-level name        {global_ns:>8.0f} ns')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark: memory and first-byte latency of the full post list, buffered vs. streamed.
+
+Each mode fetches ``GET /api/posts`` (the compatibility full list) from the
+seeded SQLite dataset in a fresh subprocess and reads the body chunk by chunk
+without keeping it, so the peak RSS of the process is the cost of building
+the response:
+
+* ``buffered``: the default; every row serialized, then ``jsonify``.
+* ``json``: ``?stream=json``, the same array sent in batches.
+* ``ndjson``: ``?stream=ndjson``, one object per line.
+
+``peak MB`` is the growth of the peak RSS over the RSS before the request.
+
+    python backend/benchmarks/bench_stream.py --posts 1000000
+    python backend/benchmarks/bench_stream.py --modes json ndjson --path /api/users
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import ensure_dataset  # noqa: E402
+
+MODES = {'buffered': '', 'json': 'stream=json', 'ndjson': 'stream=ndjson'}
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(args):
+    """Runs in the child: one request, body consumed and dropped chunk by chunk."""
+    app = ensure_dataset(args.db, args.users, args.posts, args.likes, quiet=True)
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    client = app.test_client()
+    query = MODES[args.child]
+    url = f'{args.path}?{query}' if query else args.path
+
+    before = rss_mb()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    first_byte = None
+    size = 0
+    for chunk in response.response:
+        if chunk and first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'status': response.status_code,
+        'bytes': size,
+        'first_byte': first_byte or elapsed,
+        'seconds': elapsed,
+        'peak_mb': peak_rss_mb() - before,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--likes', type=int, default=100_000)
+    parser.add_argument('--db', default='/tmp/bench_stream.db')
+    parser.add_argument('--path', default='/api/posts', help='a full-list endpoint')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--child', choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args)
+        return
+
+    ensure_dataset(args.db, args.users, args.posts, args.likes)
+    print(f"\n{args.path}, {args.posts:,} posts\n")
+    print(f"{'mode':<10} {'MB sent':>9} {'first byte ms':>14} {'total s':>9} {'MB/s':>8} {'peak MB':>9}")
+    for mode in args.modes:
+        child = subprocess.run(
+            [sys.executable, __file__, '--child', mode, '--db', args.db, '--path', args.path,
+             '--users', str(args.users), '--posts', str(args.posts), '--likes', str(args.likes)],
+            capture_output=True, text=True
+        )
+        if child.returncode != 0:
+            print(f'{mode:<10} failed: {child.stderr.strip().splitlines()[-1:]}')
+            continue
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        mb = result['bytes'] / 1e6
+        print(f"{mode:<10} {mb:>9.1f} {result['first_byte'] * 1000:>14.1f} {result['seconds']:>9.2f} "
+              f"{mb / result['seconds']:>8.1f} {result['peak_mb']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
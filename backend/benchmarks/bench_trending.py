@@ -0,0 +1,103 @@
+"""Benchmark: trending counters against scanning ``post_likes``.
+
+Replays ``--toggles`` like toggles on ``--posts`` posts (Zipf-skewed, 90%
+likes) spread evenly over one day of simulated time, straight into the
+``TrendingPosts`` extension, then times:
+
+* ``toggle``: one counted toggle, bucket rollovers included (per toggle).
+* ``top``: the 24h top 20 from the maintained leaders.
+* ``save`` / ``load``: writing every bucket to ``trending_buckets`` in one
+  transaction, and rebuilding the windows from it (a restart).
+* ``refresh``: the periodic re-read of the latest buckets.
+* ``GROUP BY``: the top 20 by counting ``post_likes`` rows of the last
+  day, what answering without the counters would cost. It runs on the
+  ``datagen`` dataset (``--likes`` rows), whose likes are all counted.
+
+    python backend/benchmarks/bench_trending.py --toggles 1000000 --posts 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import ensure_dataset, zipf_cum_weights  # noqa: E402
+
+
+def timed(fn, iterations):
+    times = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.95) - 1 if len(times) > 1 else 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--toggles', type=int, default=1_000_000)
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--likes', type=int, default=100_000)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--db', default='/tmp/bench_endpoints.db')
+    args = parser.parse_args()
+
+    app = ensure_dataset(args.db, 1_000, 20_000, args.likes)
+    from extensions import db, trending
+    from models import PostLike, TrendingBucket
+
+    rng = random.Random(0)
+    post_ids = list(range(1, args.posts + 1))
+    rng.shuffle(post_ids)
+    toggles = [(post_id, rng.random() < 0.9)
+               for post_id in rng.choices(post_ids, cum_weights=zipf_cum_weights(args.posts), k=args.toggles)]
+    start = time.time() - 24 * 3600
+    step = 24 * 3600 / args.toggles
+    now = [start]
+    trending.clock = lambda: now[0]
+
+    with app.app_context():
+        db.session.query(TrendingBucket).delete()
+        db.session.commit()
+        trending.clear()
+        trending.top('24h')  # windows loaded (empty) so toggles update them
+
+        started = time.perf_counter()
+        for i, (post_id, liked) in enumerate(toggles):
+            now[0] = start + i * step
+            trending.liked(post_id, liked)
+        per_toggle = (time.perf_counter() - started) / args.toggles * 1e6
+        print(f'{args.toggles:,} toggles on {args.posts:,} posts over 24h: {per_toggle:.2f} us per toggle\n')
+
+        print(f'{"scenario":<12}{"p50 ms":>10}{"p95 ms":>10}')
+        p50, p95 = timed(lambda: trending.top('24h', 20), args.iterations * 10)
+        print(f'{"top":<12}{p50:>10.3f}{p95:>10.3f}')
+
+        def save():
+            trending.save()
+            db.session.commit()
+            trending.saved()
+        p50, _ = timed(save, 1)
+        rows = db.session.query(TrendingBucket).count()
+        print(f'{"save":<12}{p50:>10.1f}{"":>10}  ({rows:,} bucket rows)')
+        p50, p95 = timed(trending.load, max(3, args.iterations // 4))
+        print(f'{"load":<12}{p50:>10.1f}{p95:>10.1f}')
+        p50, p95 = timed(trending.refresh, args.iterations)
+        print(f'{"refresh":<12}{p50:>10.1f}{p95:>10.1f}')
+
+        since = datetime.utcnow() - timedelta(days=365)
+        group_by = db.select(PostLike.post_id, db.func.count().label('likes')).where(
+            PostLike.created_at >= since
+        ).group_by(PostLike.post_id).order_by(db.text('likes DESC')).limit(20)
+        p50, p95 = timed(lambda: db.session.execute(group_by).all(), args.iterations)
+        print(f'{"GROUP BY":<12}{p50:>10.1f}{p95:>10.1f}  ({args.likes:,} likes)')
+
+
+if __name__ == '__main__':
+    main()
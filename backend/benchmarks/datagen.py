@@ -0,0 +1,144 @@
+"""Synthetic users, posts and likes for the benchmarks.
+
+Popularity is skewed the way real feeds are: authors are picked from a
+Zipf-like distribution (a few people write most posts), post words follow
+the same shape, and likes concentrate on a small set of popular posts.
+
+    python backend/benchmarks/datagen.py --users 1000 --posts 20000 --likes 100000 --db /tmp/bench.db
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = (
+    'python flask react hiring remote startup engineer design product data '
+    'cloud team launch growth mentor career learning network conference open '
+    'source security mobile backend frontend analytics leadership project'
+).split() + [f'topic{i}' for i in range(5_000)]
+JOB_TITLES = ['Engineer', 'Designer', 'Product Manager', 'Data Scientist', 'Recruiter', 'Founder']
+PASSWORD = 'password123'
+
+
+def zipf_cum_weights(n, s=1.0):
+    return list(itertools.accumulate(1 / (rank + 1) ** s for rank in range(n)))
+
+
+def batched_insert(db, table, rows, batch_size=20_000):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def generate(db, User, Post, PostLike, users, posts, likes, password_hash, seed=0, skew=1.0):
+    """Insert the rows directly; callers rebuild counters and indexes afterwards."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    start = now - timedelta(days=30)
+    word_weights = zipf_cum_weights(len(WORDS))
+
+    batched_insert(db, User.__table__, (
+        {'name': f'Bench User {i}', 'email': f'user{i}@bench.example', 'password_hash': password_hash,
+         'bio': f'Writing about {rng.choice(WORDS[:20])}', 'job_title': rng.choice(JOB_TITLES),
+         'created_at': start}
+        for i in range(users)
+    ))
+
+    # Shuffle which ids are popular so author and post ids aren't correlated with rank
+    author_ranks = list(range(1, users + 1))
+    rng.shuffle(author_ranks)
+    authors = rng.choices(author_ranks, cum_weights=zipf_cum_weights(users, skew), k=posts)
+    span = (now - start).total_seconds()
+    created = sorted(start + timedelta(seconds=rng.random() * span) for _ in range(posts))
+    batched_insert(db, Post.__table__, (
+        {'content': ' '.join(rng.choices(WORDS, cum_weights=word_weights, k=rng.randint(5, 30))),
+         'author_id': author, 'created_at': created_at}
+        for author, created_at in zip(authors, created)
+    ))
+
+    likes = min(likes, users * posts)
+    post_ranks = list(range(1, posts + 1))
+    rng.shuffle(post_ranks)
+    post_weights = zipf_cum_weights(posts, skew)
+    pairs = set()
+    while len(pairs) < likes:
+        needed = likes - len(pairs)
+        liked = rng.choices(post_ranks, cum_weights=post_weights, k=needed)
+        pairs.update(zip((rng.randint(1, users) for _ in range(needed)), liked))
+    batched_insert(db, PostLike.__table__, (
+        {'user_id': user_id, 'post_id': post_id,
+         'created_at': created[post_id - 1] + timedelta(seconds=rng.random() * 3600)}
+        for user_id, post_id in pairs
+    ))
+    db.session.commit()
+
+
+def ensure_dataset(db_path, users, posts, likes, seed=0, skew=1.0, quiet=False):
+    """Seed the SQLite file at ``db_path`` unless it already holds this dataset.
+
+    The parameters are recorded next to the database, since benchmark runs
+    change row counts (likes get toggled). Returns the app.
+    """
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    # Load generators are one client hammering one route: exactly what the limits stop
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    from app import create_app
+    from extensions import bulk_io, db, password_hasher
+    from models import Post, PostLike, User
+
+    app = create_app()
+
+    params = {'users': users, 'posts': posts, 'likes': likes, 'seed': seed, 'skew': skew}
+    params_path = db_path + '.params.json'
+    try:
+        with open(params_path) as f:
+            seeded = json.load(f) == params and os.path.exists(db_path)
+    except (OSError, ValueError):
+        seeded = False
+    if seeded:
+        return app
+
+    if not quiet:
+        print(f'Seeding {users:,} users, {posts:,} posts, {likes:,} likes into {db_path} ...', flush=True)
+    started = time.perf_counter()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        password_hash = password_hasher.hash(PASSWORD)
+        generate(db, User, Post, PostLike, users, posts, likes, password_hash, seed, skew)
+        # Same derived-data rebuild as `flask bulk import`
+        for hook in bulk_io.after_import:
+            hook()
+    with open(params_path, 'w') as f:
+        json.dump(params, f)
+    if not quiet:
+        print(f'Seeded in {time.perf_counter() - started:.1f}s', flush=True)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--posts', type=int, default=20_000)
+    parser.add_argument('--likes', type=int, default=100_000)
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent for popularity')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default='/tmp/bench_endpoints.db')
+    args = parser.parse_args()
+
+    ensure_dataset(args.db, args.users, args.posts, args.likes, args.seed, args.skew)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""Streaming bulk import/export of users, posts and likes.
+
+    flask --app app bulk export posts -o posts.ndjson
+    flask --app app bulk import posts posts.ndjson --batch-size 5000
+
+Everything is a generator pipeline: rows are read (file or keyset-paged
+query), converted and written/inserted one batch at a time, so memory stays
+flat however large the file. Inserts are executemany batches through SQLAlchemy
+Core, committed every ``--commit-every`` rows. Progress and throughput go to
+stderr.
+
+Rows keep their ids so foreign keys line up; import users, then posts,
+then likes. Every inserted row has every column: a missing or empty value
+takes the column's default (``created_at`` the import time, counters 0),
+else NULL where the column allows it. Rows missing a required value (``id``,
+``content``...) or holding one that doesn't parse are skipped and reported
+on stderr with their row number. Derived data (counters, search index, timelines, caches) is
+rebuilt once at the end of an import by the ``after_import`` hooks.
+"""
+import csv
+import io
+import json
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import DateTime, Integer
+
+
+class Progress:
+    """Prints ``rows, rows/s`` to stderr at most every ``interval`` seconds."""
+
+    def __init__(self, label, interval=1.0):
+        self.label = label
+        self.interval = interval
+        self.count = 0
+        self.started = self._last = time.perf_counter()
+
+    def update(self, n):
+        self.count += n
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._print('\r')
+
+    def done(self):
+        self._print('\n')
+
+    def _print(self, end):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        click.echo(f'{self.label}: {self.count:,} rows, {self.count / elapsed:,.0f} rows/s', err=True, nl=False)
+        click.echo(end, err=True, nl=False)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# Row conversion
+
+def _converter(column):
+    if isinstance(column.type, DateTime):
+        return lambda value: datetime.fromisoformat(value) if value else None
+    if isinstance(column.type, Integer):
+        return lambda value: int(value) if value not in (None, '') else None
+    return lambda value: value
+
+
+def encode_row(row):
+    return {key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in row.items()}
+
+
+def _default(column):
+    """The column's Python-side default as a function, or None."""
+    default = column.default
+    if default is None or column.primary_key:
+        return None
+    if default.is_callable:
+        return lambda: default.arg(None)
+    if default.is_scalar:
+        return lambda: default.arg
+    return None
+
+
+class RowError(ValueError):
+    """A row that can't be imported."""
+
+
+def decode_row(row, columns):
+    """``row`` with every column coerced, defaulted or NULL; raises ``RowError``."""
+    decoded = {}
+    for name, (convert, default, required) in columns.items():
+        value = row.get(name)
+        try:
+            value = convert(value)
+        except (TypeError, ValueError):
+            raise RowError(f'invalid {name} {value!r}')
+        if value is None and default is not None:
+            value = default()
+        if value is None and required:
+            raise RowError(f'missing {name}')
+        decoded[name] = value
+    return decoded
+
+
+def decode_rows(rows, table, rejected=None):
+    """Coerce raw dicts to column types; every row gets the same keys for
+    executemany. Rows that raise ``RowError`` are skipped and passed to
+    ``rejected(row_number, error)``."""
+    columns = {column.name: (_converter(column), _default(column), not column.nullable)
+               for column in table.columns}
+    for number, row in enumerate(rows, 1):
+        try:
+            yield decode_row(row, columns)
+        except RowError as e:
+            if rejected is not None:
+                rejected(number, e)
+
+
+# Readers and writers
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def write_ndjson(rows, stream, columns):
+    for row in rows:
+        stream.write(json.dumps(encode_row(row), separators=(',', ':')))
+        stream.write('\n')
+        yield 1
+
+
+def write_csv(rows, stream, columns):
+    writer = csv.DictWriter(stream, fieldnames=columns)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(encode_row(row))
+        yield 1
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+WRITERS = {'ndjson': write_ndjson, 'csv': write_csv}
+
+
+class BulkIO:
+    """Flask extension registering the ``flask bulk`` command group."""
+
+    def __init__(self, app=None, db=None, **models):
+        self.after_import = []
+        if app is not None:
+            self.init_app(app, db, **models)
+
+    def init_app(self, app, db, User, Post, PostLike):
+        self.db = db
+        self.tables = {
+            'users': User.__table__,
+            'posts': Post.__table__,
+            'likes': PostLike.__table__,
+        }
+        app.cli.add_command(self.command_group())
+        app.extensions['bulk_io'] = self
+
+    # Pipelines
+
+    def iter_rows(self, table, batch_size):
+        """Keyset-paged by id so the database never materializes the table."""
+        last_id = 0
+        with self.db.engine.connect() as conn:
+            while True:
+                rows = conn.execute(
+                    table.select().where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+                ).mappings().all()
+                if not rows:
+                    return
+                yield from rows
+                last_id = rows[-1]['id']
+
+    def export_table(self, name, stream, fmt='ndjson', batch_size=5000):
+        table = self.tables[name]
+        progress = Progress(f'export {name}')
+        written = WRITERS[fmt](self.iter_rows(table, batch_size), stream, [c.name for c in table.columns])
+        for chunk in batched(written, batch_size):
+            progress.update(len(chunk))
+        progress.done()
+        return progress.count
+
+    def import_table(self, name, stream, fmt='ndjson', batch_size=5000, commit_every=50000):
+        """Insert the rows of ``stream``; returns ``(imported, skipped)``."""
+        table = self.tables[name]
+        progress = Progress(f'import {name}')
+        skipped = []
+
+        def rejected(number, error):
+            skipped.append(number)
+            click.echo(f'\nSkipped {name} row {number}: {error}', err=True)
+
+        rows = decode_rows(READERS[fmt](stream), table, rejected)
+        with self.db.engine.connect() as conn:
+            since_commit = 0
+            for batch in batched(rows, batch_size):
+                conn.execute(table.insert(), batch)
+                since_commit += len(batch)
+                if since_commit >= commit_every:
+                    conn.commit()
+                    since_commit = 0
+                progress.update(len(batch))
+            if conn.dialect.name == 'postgresql':
+                # Explicit ids don't advance the serial sequence
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+                )
+            conn.commit()
+        progress.done()
+        if skipped:
+            click.echo(f'{len(skipped):,} {name} rows skipped', err=True)
+        for hook in self.after_import:
+            hook()
+        return progress.count, len(skipped)
+
+    # CLI
+
+    def command_group(self):
+        group = AppGroup('bulk', help='Stream users, posts and likes in and out as NDJSON or CSV.')
+        table_choice = click.Choice(sorted(self.tables))
+        format_option = click.option('--format', 'fmt', type=click.Choice(sorted(READERS)),
+                                     default=None, help='Defaults to the file extension, else ndjson.')
+        batch_option = click.option('--batch-size', default=5000, show_default=True)
+
+        @group.command('export')
+        @click.argument('table', type=table_choice)
+        @click.option('-o', '--output', default='-', help='File to write, or - for stdout.')
+        @format_option
+        @batch_option
+        def export_command(table, output, fmt, batch_size):
+            """Export TABLE ordered by id."""
+            fmt = fmt or _format_from_name(output)
+            stream = sys.stdout if output == '-' else open(output, 'w', newline='', encoding='utf-8')
+            try:
+                self.export_table(table, stream, fmt, batch_size)
+            finally:
+                if stream is not sys.stdout:
+                    stream.close()
+
+        @group.command('import')
+        @click.argument('table', type=table_choice)
+        @click.argument('source', default='-')
+        @format_option
+        @batch_option
+        @click.option('--commit-every', default=50000, show_default=True,
+                      help='Rows per transaction.')
+        def import_command(table, source, fmt, batch_size, commit_every):
+            """Import TABLE from SOURCE (a file, or - for stdin)."""
+            fmt = fmt or _format_from_name(source)
+            stream = (io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8') if source == '-'
+                      else open(source, newline='', encoding='utf-8'))
+            try:
+                self.import_table(table, stream, fmt, batch_size, commit_every)
+            finally:
+                if source != '-':
+                    stream.close()
+
+        return group
+
+
+def _format_from_name(path):
+    return 'csv' if path.endswith('.csv') else 'ndjson'
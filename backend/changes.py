@@ -0,0 +1,186 @@
+"""Append-only change log for incremental feed updates.
+
+    GET /api/posts?since=now          no changes, just the current cursor
+    GET /api/posts?since=<cursor>     what changed after the cursor
+    GET /api/posts/events             the same deltas as server-sent events (asgi.py)
+
+``create_post``, ``delete_post`` and the like buffer's flush append
+``post_changes`` rows (``created``, ``deleted``, ``likes``) in the same
+transaction as the change itself, so a change is in the log exactly when it
+is in the database. A delta folds a run of rows together:
+
+    {"posts": [...], "deleted": [ids], "likes": [{"id", "likes_count", "liked_by_user"}],
+     "next_cursor": "...", "has_more": false}
+
+``posts`` are the new posts that still exist, newest first; ``likes`` the
+current counts of the other posts whose likes changed. Clients apply
+``deleted``, then ``posts``, then ``likes``, keep ``next_cursor`` for the next
+call, and call again straight away while ``has_more`` is true. Take a cursor
+(``since=now``) before loading the list; a post seen in both is the same
+post.
+
+Rows older than ``CHANGE_LOG_RETENTION`` seconds are pruned. A cursor from
+before that gets 410 Gone, and the client reloads the list.
+
+On Postgres, ids are drawn from a sequence in insert order, not commit
+order, so a reader could see change 11 before 10 commits and skip 10 for
+good. Writers take a transaction-level advisory lock before inserting, which
+makes log rows commit in id order. SQLite has a single writer anyway.
+"""
+import base64
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from pagination import PaginationError
+
+CHANGE_LOG_LOCK_ID = 0x63686e67
+# Each process prunes at most this often, from the next write
+PRUNE_INTERVAL = 3600
+# Projection for the entries of "likes"
+LIKES_FIELDS = frozenset({'id', 'likes_count', 'liked_by_user'})
+
+
+class ChangesExpired(Exception):
+    """The cursor is older than the retained log, or from another database."""
+
+
+def encode_change_cursor(change_id):
+    return base64.urlsafe_b64encode(f'c{change_id}'.encode()).decode().rstrip('=')
+
+
+def decode_change_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode((cursor + '=' * (-len(cursor) % 4)).encode()).decode()
+        if not raw.startswith('c'):
+            raise ValueError(raw)
+        return int(raw[1:])
+    except ValueError as e:
+        raise PaginationError('Invalid cursor') from e
+
+
+def fold(changes):
+    """``(created, deleted, liked)`` post ids for a run of log rows."""
+    created, deleted, liked = {}, {}, {}
+    for change in changes:
+        if change.kind == 'deleted':
+            created.pop(change.post_id, None)
+            liked.pop(change.post_id, None)
+            deleted[change.post_id] = None
+        elif change.kind == 'created':
+            created[change.post_id] = None
+        elif change.post_id not in created:
+            # A new post is sent whole, its current likes_count included
+            liked[change.post_id] = None
+    return list(created), list(deleted), list(liked)
+
+
+def delta(posts, deleted, likes, last_id, has_more):
+    return {
+        'posts': posts,
+        'deleted': deleted,
+        'likes': likes,
+        'next_cursor': encode_change_cursor(last_id),
+        'has_more': has_more,
+    }
+
+
+class ChangeLog:
+    """Flask extension writing and reading the ``post_changes`` log."""
+
+    def __init__(self, app=None, db=None, PostChange=None):
+        self._last_prune = time.monotonic()
+        if app is not None:
+            self.init_app(app, db, PostChange)
+
+    def init_app(self, app, db, PostChange):
+        app.config.setdefault('CHANGE_LOG_RETENTION', 24 * 3600)
+        app.config.setdefault('CHANGES_PAGE_SIZE', 500)
+        app.config.setdefault('CHANGES_POLL_INTERVAL', 1.0)
+        app.config.setdefault('CHANGES_HEARTBEAT', 15)
+        self.db, self.PostChange = db, PostChange
+        self.config = app.config
+        app.cli.add_command(self.command_group())
+        app.extensions['change_log'] = self
+
+    # Writing; the caller commits
+
+    def record(self, kind, post_ids):
+        session = self.db.session
+        if session.get_bind().dialect.name == 'postgresql':
+            # Held until commit, so log rows commit in id order
+            session.execute(text('SELECT pg_advisory_xact_lock(:id)'), {'id': CHANGE_LOG_LOCK_ID})
+        session.add_all([self.PostChange(post_id=post_id, kind=kind) for post_id in post_ids])
+        if time.monotonic() - self._last_prune > PRUNE_INTERVAL:
+            self._last_prune = time.monotonic()
+            self.prune()
+
+    def prune(self):
+        """Delete rows past the retention period; returns how many."""
+        PostChange = self.PostChange
+        cutoff = datetime.utcnow() - timedelta(seconds=self.config['CHANGE_LOG_RETENTION'])
+        # Rows are in id order, so this reads just the expired rows. The
+        # newest row is always kept: max(id) is the head cursor
+        first_kept = self.db.func.coalesce(
+            self.db.select(PostChange.id).where(
+                PostChange.created_at >= cutoff
+            ).order_by(PostChange.id).limit(1).scalar_subquery(),
+            self.db.select(self.db.func.max(PostChange.id)).scalar_subquery()
+        )
+        return self.db.session.query(PostChange).filter(
+            PostChange.id < first_kept
+        ).delete(synchronize_session=False)
+
+    # Reading
+
+    def bounds_statement(self):
+        PostChange = self.PostChange
+        return self.db.select(self.db.func.min(PostChange.id), self.db.func.max(PostChange.id))
+
+    def page_statement(self, after):
+        PostChange = self.PostChange
+        return self.db.select(PostChange).where(PostChange.id > after).order_by(
+            PostChange.id
+        ).limit(self.config['CHANGES_PAGE_SIZE'] + 1)
+
+    @staticmethod
+    def start(since, oldest, head):
+        """The change id to read after for a ``since`` value, given the
+        log's ``(min(id), max(id))``."""
+        head = head or 0
+        if since == 'now':
+            return head
+        after = decode_change_cursor(since)
+        # Changes after `after` may have been pruned; ids only skip on rollbacks
+        if after > head or (oldest is not None and after < oldest - 1):
+            raise ChangesExpired('Cursor has expired; reload the list')
+        return after
+
+    def split(self, rows):
+        """``(rows, has_more)`` for a page fetched with one extra row."""
+        limit = self.config['CHANGES_PAGE_SIZE']
+        return rows[:limit], len(rows) > limit
+
+    def read(self, since):
+        """``(after, rows, has_more)`` for a ``since`` value, in the app's session."""
+        session = self.db.session
+        after = self.start(since, *session.execute(self.bounds_statement()).one())
+        rows, has_more = self.split(session.scalars(self.page_statement(after)).all())
+        return after, rows, has_more
+
+    # CLI
+
+    def command_group(self):
+        group = AppGroup('changes', help='The post_changes log behind ?since= and the event stream.')
+
+        @group.command('prune')
+        def prune_command():
+            """Delete log rows older than CHANGE_LOG_RETENTION seconds."""
+            deleted = self.prune()
+            self.db.session.commit()
+            click.echo(f'Pruned {deleted} change log rows')
+
+        return group
@@ -0,0 +1,123 @@
+"""gzip/brotli compression of JSON responses.
+
+Responses of ``COMPRESS_MIMETYPES`` whose body is at least
+``COMPRESS_MIN_SIZE`` bytes are compressed with the best encoding the client
+accepts: ``br`` when the ``brotli`` package is installed, else ``gzip``.
+Smaller bodies go out as they are; below about a kilobyte the headers and
+CPU cost more than the bytes saved. Streamed lists are compressed chunk by
+chunk, flushed after each so the client still gets every batch as it is
+sent.
+
+Brotli quality defaults to 4 rather than the library's 11, which is meant
+for static assets and far too slow for every request.
+"""
+import zlib
+
+from flask import request
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding):
+    """The encoding to use for an ``Accept-Encoding`` header, or ``None``."""
+    accepted = parse_accept_header(accept_encoding or '')
+    encodings = available_encodings()
+    best = accepted.best_match(encodings)
+    return best if best in encodings and accepted[best] else None
+
+
+class Compressor:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding, gzip_level=6, brotli_quality=4):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31: zlib stream with a gzip header and trailer
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self):
+        """Everything compressed so far, without ending the stream."""
+        if self.encoding == 'br':
+            return self._compressor.flush()
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_chunks(chunks, compressor):
+    """Compress an iterable of body chunks, flushing after each one."""
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+class Compression:
+    """Flask extension compressing eligible responses after each request."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_MIMETYPES', ('application/json', 'application/x-ndjson'))
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+        self.config = app.config
+        app.after_request(self.compress_response)
+        app.extensions['compression'] = self
+
+    def compressor(self, encoding):
+        return Compressor(encoding, self.config['COMPRESS_GZIP_LEVEL'], self.config['COMPRESS_BROTLI_QUALITY'])
+
+    def eligible(self, mimetype, status_code):
+        """Whether a response of this type and status may be compressed."""
+        return (self.config['COMPRESS_ENABLED'] and mimetype in self.config['COMPRESS_MIMETYPES']
+                and 200 <= status_code and status_code not in (204, 304))
+
+    def compress_response(self, response):
+        if not self.eligible(response.mimetype, response.status_code) or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_chunks(response.response, self.compressor(encoding))
+        else:
+            body = response.get_data()
+            if len(body) < self.config['COMPRESS_MIN_SIZE']:
+                return response
+            compressor = self.compressor(encoding)
+            response.set_data(compressor.compress(body) + compressor.finish())
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,123 @@
+"""Conditional GETs: ETag and Last-Modified for the feeds and profiles.
+
+A view declares what its response is derived from as a ``Version``: a few
+update timestamps read with one indexed query (``max(posts.updated_at)``,
+the user's ``updated_at``; see ``versions.py``) plus any in-process state,
+such as the like buffer's pending toggles. The ETag is a digest of that, not
+of the body, so a request whose ``If-None-Match`` (or ``If-Modified-Since``)
+still matches gets a 304 before the view runs: nothing is loaded or
+serialized.
+
+    @conditional_requests.conditional(versions.feed)
+
+ETags are weak (``W/"..."``), so the compressed and uncompressed bodies
+share one. Last-Modified has one-second resolution and is left off while
+pending toggles are part of the version; clients should send the ETag.
+The timestamps come from the app servers' clocks, which must be kept in
+sync (NTP) across machines.
+"""
+import hashlib
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+from werkzeug.http import http_date
+from werkzeug.sansio.http import is_resource_modified
+
+from viewer import current_viewer_id
+
+
+class Version:
+    """The update timestamps (and in-process state) behind a response."""
+
+    __slots__ = ('stamps', 'state')
+
+    def __init__(self, stamps, state=()):
+        self.stamps = tuple(stamps)
+        self.state = state
+
+    def etag(self, *scope):
+        """Digest of the version and ``scope`` (e.g. the viewer), unquoted."""
+        return hashlib.blake2b(repr((self.stamps, self.state, scope)).encode(), digest_size=16).hexdigest()
+
+    @property
+    def last_modified(self):
+        stamps = [stamp for stamp in self.stamps if stamp is not None]
+        if self.state or not stamps:
+            # In-process state has no timestamp; only the ETag covers it
+            return None
+        return max(stamps)
+
+
+def not_modified(headers, etag, last_modified):
+    """Whether the copy named by the request's validators is still current."""
+    return not is_resource_modified(
+        http_if_none_match=headers.get('If-None-Match'),
+        http_if_modified_since=headers.get('If-Modified-Since'),
+        etag=etag,
+        last_modified=last_modified,
+    )
+
+
+def validator_headers(etag, last_modified, private):
+    """ETag, Last-Modified and Cache-Control for a 200 or 304.
+
+    ``no-cache`` makes clients revalidate every time instead of guessing a
+    freshness lifetime from Last-Modified.
+    """
+    headers = {'ETag': f'W/"{etag}"', 'Cache-Control': 'private, no-cache' if private else 'no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+class ConditionalRequests:
+    """Flask extension; decorate GET views with ``@conditional_requests.conditional()``."""
+
+    def __init__(self, app=None, viewer_loader=current_viewer_id):
+        self.viewer_loader = viewer_loader
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CONDITIONAL_REQUESTS_ENABLED', True)
+        self.config = app.config
+        app.extensions['conditional_requests'] = self
+
+    def conditional(self, version, per_viewer=True):
+        """Answer ``If-None-Match``/``If-Modified-Since`` for a GET view.
+
+        ``version(**view_args)`` returns the response's ``Version``, or
+        ``None`` when there is nothing to validate (the view then runs as
+        usual, e.g. to return a 404). ``per_viewer`` puts the caller's id in
+        the ETag and marks the response private. Goes above
+        ``response_cache.cached()``: a cache hit is tagged with the version
+        its body was built from, not the current one.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.config['CONDITIONAL_REQUESTS_ENABLED']:
+                    return view(*args, **kwargs)
+
+                # Read before the view runs: a write in between leaves the tag
+                # older than the body, which only costs a 200 next time
+                g.response_version = version(**kwargs)
+                if g.response_version is None:
+                    return view(*args, **kwargs)
+                viewer = self.viewer_loader() if per_viewer else None
+
+                current = g.response_version
+                if not_modified(request.headers, current.etag(viewer), current.last_modified):
+                    response = current_app.response_class(status=304)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    current = g.response_version
+
+                response.headers.update(validator_headers(current.etag(viewer), current.last_modified, per_viewer))
+                if per_viewer:
+                    response.vary.add('Authorization')
+                return response
+            return wrapper
+        return decorator
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -7,16 +8,126 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-string'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    # Full-text search engine: 'auto' picks FTS5 on SQLite, tsvector on Postgres
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto'
+    # Materialized timelines: 'memory' (per process, one worker only) or
+    # 'database' (timeline_entries table), the default with several workers
+    TIMELINE_BACKEND = os.environ.get('TIMELINE_BACKEND') or (
+        'database' if int(os.environ.get('WEB_CONCURRENCY') or 1) > 1 else 'memory'
+    )
+    TIMELINE_MAX_LENGTH = 800
+    TIMELINE_PROLIFIC_THRESHOLD = 1000
+    # Seconds a worker keeps its list of prolific authors between reads
+    TIMELINE_PROLIFIC_TTL = 10
+    # Response cache for public GET endpoints (per process)
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_TTL = 30
+    RESPONSE_CACHE_MAX_ENTRIES = 1024
+    RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    # ETag/Last-Modified and 304s on the feeds, profiles and user list
+    CONDITIONAL_REQUESTS_ENABLED = True
+    # gzip/brotli for JSON bodies of at least COMPRESS_MIN_SIZE bytes; turn it
+    # off when a proxy in front already compresses
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)
+    # Password hashing: pbkdf2_sha256 (cost = iterations), scrypt (log2 N) or bcrypt (log2 rounds)
+    PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM') or 'pbkdf2_sha256'
+    PASSWORD_HASH_COST = int(os.environ['PASSWORD_HASH_COST']) if os.environ.get('PASSWORD_HASH_COST') else None
+    PASSWORD_HASH_WORKERS = 4
+    PASSWORD_HASH_MAX_PENDING = 64
+    # Instrumentation: /metrics, opt-in Server-Timing header, slow-request log
+    METRICS_ENABLED = True
+    # Bearer token for /metrics and /api/metrics/slow-requests; unset, they answer 404
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # JSON encoder: 'auto' uses orjson when installed, else the stdlib encoder
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER') or 'auto'
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS') or 500)
+    SLOW_REQUEST_SAMPLE_RATE = 1.0
+    SLOW_REQUEST_BUFFER_SIZE = 100
+    # Write-behind likes: toggles are coalesced and written in batches (per process)
+    LIKE_WRITE_BEHIND = os.environ.get('LIKE_WRITE_BEHIND', '1').lower() in ('1', 'true', 'yes')
+    LIKE_FLUSH_INTERVAL = 0.5
+    LIKE_FLUSH_SIZE = 500
+    # Apply pending schema migrations when the app starts (see migrations.py)
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1').lower() in ('1', 'true', 'yes')
+    # Per-process connection lists behind the graph queries (see graph.py);
+    # 4 bytes per id held
+    CONNECTION_GRAPH_TTL = 60
+    CONNECTION_GRAPH_MAX_IDS = 20_000_000
+    # post_changes log behind ?since= and /api/posts/events (see changes.py)
+    CHANGE_LOG_RETENTION = 24 * 3600
+    CHANGES_POLL_INTERVAL = float(os.environ.get('CHANGES_POLL_INTERVAL') or 1.0)
+    # ?sort=ranked (see ranking.py); rankings are cached per viewer for CACHE_TTL seconds
+    RANKED_FEED_CANDIDATES = 1000
+    RANKED_FEED_SCORER = os.environ.get('RANKED_FEED_SCORER') or 'default'
+    RANKED_FEED_WEIGHTS = {'half_life_hours': 12, 'velocity': 1.0, 'affinity': 2.0}
+    RANKED_FEED_VELOCITY_WINDOW = 6 * 3600
+    RANKED_FEED_AFFINITY_LIKES = 1000
+    RANKED_FEED_CACHE_TTL = 30
+    # GET /api/posts/trending (see trending.py): net likes per window, counted
+    # in TRENDING_BUCKET_SECONDS buckets and reloaded from the database every
+    # TRENDING_REFRESH_INTERVAL seconds for other workers' likes
+    TRENDING_WINDOWS = {'1h': 3600, '24h': 24 * 3600}
+    TRENDING_BUCKET_SECONDS = 300
+    TRENDING_TOP_K = 100
+    TRENDING_REFRESH_INTERVAL = 60
+    # Token buckets per client (see ratelimit.py): budget -> (burst, per seconds).
+    # RATE_LIMIT_BACKEND=sqlite shares them between the workers on a host
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    RATE_LIMITS = {
+        'login': (10, 60),
+        'register': (5, 3600),
+        'create_post': (30, 60),
+        'toggle_like': (120, 60),
+        'search': (60, 60),
+    }
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND') or 'memory'
+    RATE_LIMIT_SQLITE_PATH = os.environ.get('RATE_LIMIT_SQLITE_PATH') or os.path.join(
+        tempfile.gettempdir(), 'rate_limits.db'
+    )
+    # Requests in flight per worker before new ones get 503; 0 for no cap
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT') or 64)
+    # Read replicas (see replicas.py), comma-separated in DATABASE_REPLICA_URLS.
+    # Read-only GET views use them round-robin; a user who wrote reads from the
+    # primary for READ_REPLICA_PIN_SECONDS, the longest replication lag expected
+    READ_REPLICA_URIS = [url for url in (os.environ.get('DATABASE_REPLICA_URLS') or '').split(',') if url]
+    READ_REPLICA_HEALTH_INTERVAL = 5
+    READ_REPLICA_PIN_SECONDS = float(os.environ.get('READ_REPLICA_PIN_SECONDS') or 5)
+    # The frontend echoes the read-your-writes pin of write responses
+    CORS_EXPOSE_HEADERS = ['X-Read-Your-Writes']
     
+# Debug mode comes from FLASK_DEBUG or app.run(debug=...), not from here
 class DevelopmentConfig(Config):
-    DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///linkedin_clone.db'
 
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    # Cheap hashes; the tests don't measure them
+    PASSWORD_HASH_COST = 1000
+    # test_replicas.py points this at copies of the in-memory database
+    READ_REPLICA_URIS = []
+
 class ProductionConfig(Config):
-    DEBUG = False
+    # Several worker processes share one database; per-process timelines would diverge
+    TIMELINE_BACKEND = os.environ.get('TIMELINE_BACKEND') or 'database'
+    # Likewise per-process rate limits would let a client spend one budget per worker
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND') or 'sqlite'
+    # Per worker process: up to pool_size + max_overflow connections, so keep
+    # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) under the server's max_connections
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 5),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 5),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT') or 10),
+        # Connections dropped by the server or a proxy are replaced, not handed out
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE') or 1800),
+    }
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+# In-memory database and cheap hashes; see TestingConfig. The app wsgi.py
+# serves, so async_api.py (which mounts it) wraps this one too
+os.environ['FLASK_ENV'] = 'testing'
+from wsgi import app  # noqa: E402
+from extensions import (  # noqa: E402
+    connection_graph, db, instrumentation, like_buffer, ranked_feed, rate_limiter, read_replicas, response_cache,
+    search_index, timelines, trending
+)
+from models import Post, PostLike, User, reconcile_counters  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        timelines.rebuild()
+    response_cache.clear()
+    connection_graph.clear()
+    ranked_feed.clear()
+    trending.clear()
+    like_buffer.clear()
+    rate_limiter.clear()
+    read_replicas.clear()
+    instrumentation.reset()
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user():
+    def _make_user(name='Test User', email=None, **fields):
+        with app.app_context():
+            user = User(name=name, email=email or f'{name.lower().replace(" ", ".")}@example.com', **fields)
+            user.set_password('password123')
+            db.session.add(user)
+            db.session.commit()
+            search_index.rebuild()
+            response_cache.clear()
+            return user.id
+    return _make_user
+
+
+@pytest.fixture
+def auth_headers():
+    def _auth_headers(user_id):
+        with app.app_context():
+            return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+    return _auth_headers
+
+
+@pytest.fixture
+def seed_posts():
+    """Create ``count`` posts per author, each liked by every liker."""
+    def _seed_posts(author_ids, count, liker_ids=()):
+        with app.app_context():
+            posts = [Post(content=f'Post {i} by {author_id}', author_id=author_id)
+                     for author_id in author_ids for i in range(count)]
+            db.session.add_all(posts)
+            db.session.flush()
+            db.session.add_all([PostLike(user_id=liker_id, post_id=post.id)
+                                for post in posts for liker_id in liker_ids])
+            db.session.commit()
+            reconcile_counters()
+            search_index.rebuild()
+            timelines.rebuild()
+            response_cache.clear()
+            return [post.id for post in posts]
+    return _seed_posts
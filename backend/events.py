@@ -0,0 +1,117 @@
+"""Server-sent events fan-out for the async app.
+
+One task per process polls the change log every ``CHANGES_POLL_INTERVAL``
+seconds and encodes each new batch of changes once. Connected clients are
+coroutines waiting on an ``asyncio.Event``; a poll that finds changes wakes
+them all, and each writes the already-encoded events it hasn't sent yet. An
+idle connection costs a socket and a suspended coroutine, not a thread, and
+the database sees one query per poll however many clients are connected.
+
+The newest ``backlog`` events are kept in memory. A client that reconnects
+with an older ``Last-Event-ID``, or falls further behind than that, catches
+up from the database first. The poller stops when the last client leaves.
+"""
+import asyncio
+from collections import deque
+
+KEEPALIVE = ': keepalive\n\n'
+
+
+def format_event(data, event_id=None, event=None):
+    """One SSE message; ``data`` is a single line of JSON."""
+    lines = []
+    if event:
+        lines.append(f'event: {event}')
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {data}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Broadcaster:
+    """Shares one change-log poller between every connected client.
+
+    ``fetch(after)`` is a coroutine returning ``(last_id, message, has_more)``
+    for the changes after ``after`` (``None``: the current head, with no
+    message). ``hello(cursor)``, if given, is the first message each client
+    gets.
+    """
+
+    def __init__(self, fetch, interval=1.0, heartbeat=15, backlog=256, hello=None):
+        self.fetch = fetch
+        self.hello = hello
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.backlog = backlog
+        self.subscribers = 0
+        self._task = None
+
+    def _start(self):
+        if self._task is None:
+            self.head = None
+            self.recent = deque(maxlen=self.backlog)  # (after_id, last_id, message)
+            self._ready = asyncio.Event()
+            self._changed = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self.subscribers:
+            try:
+                await self._poll()
+            except Exception as e:
+                print(f"Change poll error: {e}")
+            await asyncio.sleep(self.interval)
+        # No await since the check: a client arriving now starts a new task
+        self._task = None
+
+    async def _poll(self):
+        if self.head is None:
+            self.head = (await self.fetch(None))[0]
+            self._ready.set()
+            return
+        has_more = True
+        while has_more:
+            last_id, message, has_more = await self.fetch(self.head)
+            if message is None:
+                return
+            self.recent.append((self.head, last_id, message))
+            self.head = last_id
+            changed, self._changed = self._changed, asyncio.Event()
+            changed.set()
+
+    async def catch_up(self, cursor, until):
+        """Messages for the changes after ``cursor``, read from the database."""
+        while cursor < until:
+            last_id, message, _ = await self.fetch(cursor)
+            if message is None:
+                return
+            yield last_id, message
+            cursor = last_id
+
+    async def subscribe(self, after=None):
+        """SSE text for every change after ``after`` (default: from now on),
+        until the client disconnects."""
+        self.subscribers += 1
+        self._start()
+        try:
+            await self._ready.wait()
+            cursor = self.head if after is None else after
+            if self.hello is not None:
+                yield self.hello(cursor)
+            while True:
+                changed = self._changed
+                if cursor < self.head and (not self.recent or cursor < self.recent[0][0]):
+                    # Older than anything in memory
+                    async for cursor, message in self.catch_up(cursor, self.head):
+                        yield message
+                for after_id, last_id, message in list(self.recent):
+                    if last_id > cursor:
+                        yield message
+                        cursor = last_id
+                try:
+                    await asyncio.wait_for(changed.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield KEEPALIVE
+        finally:
+            self.subscribers -= 1
@@ -0,0 +1,49 @@
+"""Extension instances shared by the models, blueprints and tooling.
+
+They are created unbound and attached to an app by ``create_app`` in
+``app.py``, so importing a module never builds an app or touches the
+database.
+"""
+from flask_cors import CORS
+from flask_jwt_extended import JWTManager
+from flask_sqlalchemy import SQLAlchemy
+
+from bulk import BulkIO
+from changes import ChangeLog
+from compression import Compression
+from conditional import ConditionalRequests
+from graph import ConnectionGraph
+from instrumentation import Instrumentation
+from like_buffer import LikeBuffer
+from migrations import SchemaMigrations
+from passwords import PasswordHasher
+from ranking import RankedFeed
+from ratelimit import RateLimiter
+from replicas import ReadReplicas, RoutingSession
+from response_cache import ResponseCache
+from search import FullTextSearch
+from timeline import Timelines
+from trending import TrendingPosts
+from viewer import ViewerResolver
+
+# RoutingSession sends read-only views' queries to the read replicas
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+read_replicas = ReadReplicas()
+jwt = JWTManager()
+cors = CORS()
+rate_limiter = RateLimiter()
+viewer_resolver = ViewerResolver()
+password_hasher = PasswordHasher()
+search_index = FullTextSearch()
+response_cache = ResponseCache()
+conditional_requests = ConditionalRequests()
+compression = Compression()
+instrumentation = Instrumentation()
+timelines = Timelines()
+ranked_feed = RankedFeed()
+trending = TrendingPosts()
+connection_graph = ConnectionGraph()
+like_buffer = LikeBuffer()
+change_log = ChangeLog()
+bulk_io = BulkIO()
+schema_migrations = SchemaMigrations()
@@ -0,0 +1,203 @@
+"""In-memory adjacency for the connections graph.
+
+Each user's connections are a sorted ``array('i')`` of user ids, loaded from
+the ``connections`` table on first use: one query per batch of up to
+``GRAPH_LOAD_BATCH`` users, answered from the ``(user_id, connection_id)``
+unique index without reading the table. Connecting and disconnecting update
+the loaded arrays of both users in place of a reload.
+
+Lists are kept for ``CONNECTION_GRAPH_TTL`` seconds, so changes made by
+other worker processes show up after at most that long, and least recently
+used lists are dropped once more than ``CONNECTION_GRAPH_MAX_IDS`` ids are
+held (4 bytes each). Writes that must not miss another worker's connect,
+such as timeline fan-out, ask for ``fresh`` lists instead.
+
+Mutual connections are a sorted-array intersection; "people you may know"
+counts how often each id occurs across the viewer's connections' lists. Both
+are vectorized with NumPy when it is installed (``np.intersect1d``,
+``np.bincount``) and fall back to sets and a ``Counter`` without it.
+"""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from itertools import chain, groupby
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Ids per IN (...) when loading lists; under SQLite's bound-parameter limit
+GRAPH_LOAD_BATCH = 500
+
+
+def as_numpy(ids):
+    """A read-only view of an id array, without copying."""
+    return np.frombuffer(ids, dtype=np.intc)
+
+
+def intersect(a, b):
+    """Sorted ids in both sorted arrays."""
+    if np is not None:
+        return np.intersect1d(as_numpy(a), as_numpy(b), assume_unique=True).tolist()
+    small, large = (a, b) if len(a) <= len(b) else (b, a)
+    return sorted(set(small).intersection(large))
+
+
+def count_shared(user_id, neighbours, lists, limit):
+    """``[(id, count)]``: the ``limit`` ids in most ``lists``, excluding
+    ``user_id`` and ``neighbours``; ties go to the lower id."""
+    if np is not None:
+        # One bytes join and one view: far cheaper than a view per list
+        every_id = np.frombuffer(b''.join(lists), dtype=np.intc)
+        if not len(every_id):
+            return []
+        counts = np.bincount(every_id)
+        if user_id < len(counts):
+            counts[user_id] = 0
+        known = as_numpy(neighbours)
+        counts[known[known < len(counts)]] = 0
+        candidates = np.flatnonzero(counts)
+        if len(candidates) > limit:
+            # Everyone tied with the limit-th count, then exact order below
+            cutoff = np.partition(counts[candidates], len(candidates) - limit)[len(candidates) - limit]
+            candidates = candidates[counts[candidates] >= cutoff]
+        order = np.lexsort((candidates, -counts[candidates]))[:limit]
+        return [(int(candidate), int(counts[candidate])) for candidate in candidates[order]]
+
+    counts = Counter(chain.from_iterable(lists))
+    counts.pop(user_id, None)
+    for known in neighbours:
+        counts.pop(known, None)
+    return heapq.nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+class ConnectionGraph:
+    """Flask extension holding connection lists as sorted int arrays."""
+
+    def __init__(self, app=None, db=None, Connection=None):
+        self._lists = OrderedDict()  # user_id -> (loaded_at, array), least recently used first
+        self._size = 0
+        self._writes = 0  # connects and disconnects applied so far
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db, Connection)
+
+    def init_app(self, app, db, Connection):
+        app.config.setdefault('CONNECTION_GRAPH_TTL', 60)
+        app.config.setdefault('CONNECTION_GRAPH_MAX_IDS', 20_000_000)
+        self.db, self.Connection = db, Connection
+        self.ttl = app.config['CONNECTION_GRAPH_TTL']
+        self.max_ids = app.config['CONNECTION_GRAPH_MAX_IDS']
+        app.extensions['connection_graph'] = self
+
+    # Loading
+
+    def _load(self, user_ids):
+        Connection = self.Connection
+        loaded = {user_id: array('i') for user_id in user_ids}
+        for start in range(0, len(user_ids), GRAPH_LOAD_BATCH):
+            rows = self.db.session.execute(
+                self.db.select(Connection.user_id, Connection.connection_id).where(
+                    Connection.user_id.in_(user_ids[start:start + GRAPH_LOAD_BATCH])
+                ).order_by(Connection.user_id, Connection.connection_id)
+            )
+            for user_id, group in groupby(rows, key=lambda row: row[0]):
+                loaded[user_id] = array('i', (connection_id for _, connection_id in group))
+        return loaded
+
+    def _store(self, user_id, ids, loaded_at):
+        old = self._lists.pop(user_id, None)
+        if old is not None:
+            self._size -= len(old[1])
+        self._lists[user_id] = (loaded_at, ids)
+        self._size += len(ids)
+        while self._size > self.max_ids and len(self._lists) > 1:
+            _, (_, evicted) = self._lists.popitem(last=False)
+            self._size -= len(evicted)
+
+    def connections_of_many(self, user_ids, fresh=False):
+        """``{user_id: sorted array of connection ids}``, loading what is
+        missing or expired (or everything, if ``fresh``) in batched queries."""
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            writes = self._writes
+            for user_id in user_ids:
+                entry = self._lists.get(user_id)
+                if not fresh and entry is not None and now - entry[0] < self.ttl:
+                    self._lists.move_to_end(user_id)
+                    found[user_id] = entry[1]
+                else:
+                    missing.append(user_id)
+        if missing:
+            loaded = self._load(missing)
+            with self._lock:
+                # A connect applied during the load may be missing from it
+                if self._writes == writes:
+                    for user_id, ids in loaded.items():
+                        self._store(user_id, ids, now)
+            found.update(loaded)
+        return found
+
+    def connections_of(self, user_id, fresh=False):
+        return self.connections_of_many([user_id], fresh)[user_id]
+
+    # Incremental updates, after the write is committed
+
+    def _update(self, user_id, other_id, connected):
+        self._writes += 1
+        entry = self._lists.get(user_id)
+        if entry is None:
+            return  # not loaded; the next load reads the new row
+        loaded_at, ids = entry
+        index = bisect_left(ids, other_id)
+        present = index < len(ids) and ids[index] == other_id
+        if connected == present:
+            return
+        # A new array rather than an in-place insert: readers may hold the old one
+        ids = ids[:index] + array('i', [other_id]) + ids[index:] if connected else ids[:index] + ids[index + 1:]
+        self._store(user_id, ids, loaded_at)
+
+    def connected(self, user_id, other_id):
+        with self._lock:
+            self._update(user_id, other_id, True)
+            self._update(other_id, user_id, True)
+
+    def disconnected(self, user_id, other_id):
+        with self._lock:
+            self._update(user_id, other_id, False)
+            self._update(other_id, user_id, False)
+
+    def clear(self):
+        with self._lock:
+            self._lists.clear()
+            self._size = 0
+
+    # Queries
+
+    def is_connected(self, user_id, other_id):
+        ids = self.connections_of(user_id)
+        index = bisect_left(ids, other_id)
+        return index < len(ids) and ids[index] == other_id
+
+    def mutual(self, user_id, other_id):
+        """Sorted ids connected to both users."""
+        lists = self.connections_of_many([user_id, other_id])
+        return intersect(lists[user_id], lists[other_id])
+
+    def mutual_counts(self, user_id, other_ids):
+        """``{other_id: number of mutual connections}``."""
+        lists = self.connections_of_many([user_id, *other_ids])
+        mine = lists[user_id]
+        return {other_id: len(intersect(mine, lists[other_id])) for other_id in other_ids}
+
+    def suggestions(self, user_id, limit):
+        """People you may know: ``[(id, shared connections)]``, most shared
+        first, among the connections of ``user_id``'s connections."""
+        neighbours = self.connections_of(user_id)
+        lists = self.connections_of_many(list(neighbours))
+        return count_shared(user_id, neighbours, lists.values(), limit)
@@ -0,0 +1,53 @@
+"""Gunicorn settings for the production API server.
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment (names below), so the
+same file serves Render/Heroku dynos and larger hosts.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Processes x threads. Requests mostly wait on the database, so a few threads
+# per process go further than one process per request.
+workers = int(os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1)
+threads = int(os.environ.get('GUNICORN_THREADS') or 4)
+# gthread, but finishes accepted connections before a recycled worker exits
+worker_class = 'gunicorn_workers.RecyclingThreadWorker' if threads > 1 else 'sync'
+# Per-process timelines would only show each worker's own posts (timeline.py);
+# set before the app (and its config) is imported
+if workers > 1:
+    os.environ.setdefault('TIMELINE_BACKEND', 'database')
+
+# Import the app once in the master and fork workers from it: faster boots and
+# shared copy-on-write memory. Connections opened during import must not be
+# shared with the children, see post_fork.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Graceful recycling: each worker exits after max_requests (+ jitter, so they
+# don't all restart at once), finishing in-flight requests within graceful_timeout
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 2000)
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER') or 200)
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT') or 30)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 30)
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE') or 5)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+raw_env = ['FLASK_ENV=production']
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from extensions import db
+    from wsgi import app  # already imported by the master
+
+    # Drop the pool inherited from the master without closing its sockets,
+    # which the master (and siblings) still reference. Thread pools and
+    # buffers are reset by the extensions' own fork hooks.
+    with app.app_context():
+        db.engine.dispose(close=False)
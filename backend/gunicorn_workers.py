@@ -0,0 +1,81 @@
+"""Gunicorn worker classes.
+
+``RecyclingThreadWorker`` is gunicorn's ``gthread`` worker with a graceful
+exit. The stock worker leaves its event loop as soon as it decides to stop
+(after ``max_requests`` or on SIGTERM) and closes connections it has
+accepted but not read yet, so clients see resets whenever a worker is
+recycled. This one stops accepting instead (the listen backlog goes to the
+other workers) and keeps looping until every accepted connection has been
+served, bounded by the keep-alive timeout.
+
+It also enforces the app's ``ADMISSION_MAX_IN_FLIGHT``. Inside the app at
+most ``threads`` requests run at once, so the cap there never triggers:
+the backlog waits in the thread pool's queue instead. Here a request that
+would be queued past the cap (running plus waiting for a thread) is
+answered 503 with ``Retry-After`` from the event loop and its connection
+closed.
+"""
+import json
+import time
+
+from gunicorn.workers.gthread import ThreadWorker
+
+from ratelimit import retry_after
+
+
+class RecyclingThreadWorker(ThreadWorker):
+    _alive = True
+    _drain_deadline = None
+
+    @property
+    def alive(self):
+        if self._alive:
+            return True
+        if self._drain_deadline is None:
+            self._drain_deadline = time.monotonic() + max(self.cfg.keepalive, 1)
+        return bool(self._keep or self.futures) and time.monotonic() < self._drain_deadline
+
+    @alive.setter
+    def alive(self, value):
+        self._alive = value
+
+    def accept(self, server, listener):
+        if not self._alive:
+            # Retiring: leave new connections to the sibling workers
+            self.poller.unregister(listener)
+            return
+        super().accept(server, listener)
+
+    def enqueue_req(self, conn):
+        if self._at_capacity():
+            self._shed(conn)
+            return
+        super().enqueue_req(conn)
+
+    def _at_capacity(self):
+        limit = getattr(self.wsgi, 'config', {}).get('ADMISSION_MAX_IN_FLIGHT')
+        # A TLS handshake would block the event loop; those are queued as usual
+        if not limit or self.cfg.is_ssl:
+            return False
+        return sum(not fs.done() for fs in self.futures) >= limit
+
+    def _shed(self, conn):
+        body = json.dumps({'message': 'Server busy, please retry'}).encode()
+        head = (
+            'HTTP/1.1 503 Service Unavailable\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f"Retry-After: {retry_after(self.wsgi.config['ADMISSION_RETRY_AFTER'])}\r\n"
+            'Connection: close\r\n\r\n'
+        )
+        self.nr_conns -= 1
+        try:
+            conn.sock.settimeout(1)
+            # Read the request first: closing with it unread resets the
+            # connection, and the client may never see the response
+            conn.sock.recv(65536)
+            conn.sock.sendall(head.encode('latin-1') + body)
+        except OSError:
+            pass
+        finally:
+            conn.close()
@@ -0,0 +1,258 @@
+"""Per-request timing and SQL instrumentation.
+
+For every request this records wall time, the number of SQL statements and
+the time spent in them (SQLAlchemy ``before/after_cursor_execute`` events),
+time spent serializing models (functions decorated with ``@serializer``)
+and the response size, then aggregates them per route.
+
+* ``GET /metrics`` renders the aggregates in the Prometheus text format.
+* ``SERVER_TIMING_ENABLED`` adds a ``Server-Timing`` header to each response
+  (``app``, ``db`` and ``serialize``), which browser dev tools display.
+* Requests slower than ``SLOW_REQUEST_THRESHOLD_MS`` are sampled into a
+  ring buffer together with their SQL statements; see
+  ``GET /api/metrics/slow-requests``. Query string values are left out of
+  the logged path; they may hold search terms or cursors.
+
+Both endpoints answer only requests carrying ``Authorization: Bearer
+<METRICS_TOKEN>``; without a ``METRICS_TOKEN`` they are off (404).
+
+Aggregates are per process.
+"""
+import hmac
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import wraps
+
+from flask import Response, abort, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_QUERIES_PER_REQUEST = 200  # statements kept for the slow-request log
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'query_count', 'sql_seconds', 'serialize_seconds',
+                 'serialize_depth', 'query_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.query_count = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.serialize_depth = 0
+        self.query_started = None
+
+
+class RouteStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'queries', 'sql_seconds', 'serialize_seconds',
+                 'response_bytes', 'statuses')
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+
+def _current():
+    return g.get('request_metrics') if has_request_context() else None
+
+
+def serializer(fn):
+    """Count the wrapped function's time as serialization; nested calls count once."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        metrics = _current()
+        if metrics is None:
+            return fn(*args, **kwargs)
+        metrics.serialize_depth += 1
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            metrics.serialize_depth -= 1
+            if metrics.serialize_depth == 0:
+                metrics.serialize_seconds += time.perf_counter() - started
+    return wrapper
+
+
+def _redacted_path():
+    if not request.args:
+        return request.path
+    return request.path + '?' + '&'.join(f'{name}=<redacted>' for name in request.args)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Instrumentation:
+    """Flask extension collecting request and SQL metrics."""
+
+    def __init__(self, app=None):
+        self._routes = {}
+        self._lock = threading.Lock()
+        self.slow_requests = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('SERVER_TIMING_ENABLED', False)
+        app.config.setdefault('SLOW_REQUEST_THRESHOLD_MS', 500)
+        app.config.setdefault('SLOW_REQUEST_SAMPLE_RATE', 1.0)
+        app.config.setdefault('SLOW_REQUEST_BUFFER_SIZE', 100)
+        self.config = app.config
+        if not app.config['METRICS_ENABLED']:
+            return
+        self.slow_requests = deque(maxlen=app.config['SLOW_REQUEST_BUFFER_SIZE'])
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        # Listening on the Engine class covers engines created after init
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.add_url_rule('/metrics', 'metrics', self.protected(self.metrics_view))
+        app.add_url_rule('/api/metrics/slow-requests', 'slow_requests', self.protected(self.slow_requests_view))
+        app.extensions['instrumentation'] = self
+
+    def protected(self, view):
+        """Serve ``view`` only to requests bearing ``METRICS_TOKEN``; 404 when it is unset."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = self.config['METRICS_TOKEN']
+            if not token:
+                abort(404)
+            scheme, _, presented = request.headers.get('Authorization', '').partition(' ')
+            if scheme != 'Bearer' or not hmac.compare_digest(presented.encode(), token.encode()):
+                return jsonify({'message': 'Invalid metrics token'}), 401
+            return view(*args, **kwargs)
+        return wrapper
+
+    # Request lifecycle
+
+    def _start(self):
+        g.request_metrics = RequestMetrics()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        metrics = _current()
+        if metrics is not None:
+            metrics.query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        metrics = _current()
+        if metrics is None or metrics.query_started is None:
+            return
+        elapsed = time.perf_counter() - metrics.query_started
+        metrics.query_started = None
+        metrics.query_count += 1
+        metrics.sql_seconds += elapsed
+        if len(metrics.queries) < MAX_QUERIES_PER_REQUEST:
+            metrics.queries.append((statement, elapsed))
+
+    def _finish(self, response):
+        metrics = g.pop('request_metrics', None)
+        if metrics is None:
+            return response
+        elapsed = time.perf_counter() - metrics.started
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        size = 0 if response.is_streamed else response.calculate_content_length() or 0
+
+        with self._lock:
+            stats = self._routes.get((request.method, route))
+            if stats is None:
+                stats = self._routes[(request.method, route)] = RouteStats()
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if elapsed <= bound:
+                    stats.buckets[i] += 1
+            stats.count += 1
+            stats.seconds += elapsed
+            stats.queries += metrics.query_count
+            stats.sql_seconds += metrics.sql_seconds
+            stats.serialize_seconds += metrics.serialize_seconds
+            stats.response_bytes += size
+            stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+
+        if (elapsed * 1000 >= self.config['SLOW_REQUEST_THRESHOLD_MS']
+                and random.random() < self.config['SLOW_REQUEST_SAMPLE_RATE']):
+            self.slow_requests.append({
+                'at': datetime.utcnow().isoformat(),
+                'method': request.method,
+                'path': _redacted_path(),
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+                'sql_ms': round(metrics.sql_seconds * 1000, 2),
+                'serialize_ms': round(metrics.serialize_seconds * 1000, 2),
+                'response_bytes': size,
+                'queries': [{'sql': statement, 'ms': round(seconds * 1000, 3)}
+                            for statement, seconds in metrics.queries],
+            })
+
+        if self.config['SERVER_TIMING_ENABLED']:
+            response.headers['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.2f}, '
+                f'db;dur={metrics.sql_seconds * 1000:.2f};desc="{metrics.query_count} queries", '
+                f'serialize;dur={metrics.serialize_seconds * 1000:.2f}'
+            )
+        return response
+
+    # Exposition
+
+    def render(self):
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = [
+                '# HELP http_request_duration_seconds Request wall time by route.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (method, route), stats in routes:
+                labels = f'method="{method}",route="{_label(route)}"'
+                for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {stats.seconds:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+            lines += ['# HELP http_requests_total Requests by route and status.',
+                      '# TYPE http_requests_total counter']
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'http_requests_total{{method="{method}",route="{_label(route)}",'
+                                 f'status="{status}"}} {count}')
+
+            for name, kind, help_text, attr, fmt in (
+                ('sql_queries_total', 'counter', 'SQL statements executed by route.', 'queries', '{}'),
+                ('sql_duration_seconds_total', 'counter', 'Time spent in SQL by route.', 'sql_seconds', '{:.6f}'),
+                ('serialize_duration_seconds_total', 'counter', 'Time spent in to_dict by route.',
+                 'serialize_seconds', '{:.6f}'),
+                ('http_response_bytes_total', 'counter', 'Response body bytes by route.', 'response_bytes', '{}'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for (method, route), stats in routes:
+                    value = fmt.format(getattr(stats, attr))
+                    lines.append(f'{name}{{method="{method}",route="{_label(route)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def slow_requests_view(self):
+        return jsonify({'threshold_ms': self.config['SLOW_REQUEST_THRESHOLD_MS'],
+                        'requests': list(self.slow_requests)[::-1]}), 200
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self.slow_requests.clear()
@@ -0,0 +1,59 @@
+"""Flask JSON provider backed by orjson.
+
+``JSON_PROVIDER`` picks the encoder for ``jsonify``, the streamed lists and
+the async handlers: ``auto`` (orjson when it is installed, else Flask's
+stdlib provider), ``orjson`` or ``stdlib``. orjson is optional; the app
+runs the same without it.
+
+The output matches the stdlib provider's: keys sorted, dates through Flask's
+``default`` (HTTP dates), compact unless debug pretty-printing is on. Only
+non-ASCII text differs, sent as UTF-8 instead of ``\\u`` escapes.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_PROVIDERS = ('auto', 'orjson', 'stdlib')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask's default provider with orjson doing the encoding and decoding."""
+
+    def _option(self, pretty=False):
+        # Dates and dataclasses go through default(), as with the stdlib encoder
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # Formatting arguments (indent, separators) don't apply; the output is compact
+        return orjson.dumps(obj, default=self.default, option=self._option()).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        # Newline-terminated like the stdlib provider's responses
+        option = self._option(pretty) | orjson.OPT_APPEND_NEWLINE
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option), mimetype=self.mimetype
+        )
+
+
+def init_json_provider(app):
+    """Install the provider chosen by ``JSON_PROVIDER`` on ``app``."""
+    name = app.config.setdefault('JSON_PROVIDER', 'auto')
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER must be one of {', '.join(JSON_PROVIDERS)}, not {name!r}")
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_PROVIDER is 'orjson' but orjson is not installed")
+    if name != 'stdlib' and orjson is not None:
+        app.json = OrjsonProvider(app)
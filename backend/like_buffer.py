@@ -0,0 +1,312 @@
+"""Write-behind buffer for like toggles.
+
+A toggle doesn't open a transaction of its own. It records the state the
+user asked for, per ``(user, post)`` pair, in memory and returns; repeated
+toggles of a pair coalesce, and toggling back to the stored state cancels
+the entry. A background thread writes everything pending every
+``LIKE_FLUSH_INTERVAL`` seconds, or as soon as ``LIKE_FLUSH_SIZE`` pairs are
+waiting, in one transaction:
+
+* one batched ``INSERT ... ON CONFLICT DO NOTHING`` for the pairs now liked,
+* one ``DELETE ... WHERE (user_id, post_id) IN (...)`` for the unliked ones,
+* one ``UPDATE`` recounting ``likes_count`` for the affected posts,
+* whatever the ``before_commit`` hooks add (change log rows, trending buckets).
+
+The flush writes each pair's final state rather than a flip, so a toggle is
+idempotent once written: two workers that both buffered a like for the
+same pair write one row. A toggle starts from the buffered state of the
+pair, or from ``post_likes`` when this worker has none; a click that
+reaches another worker within the flush interval of the previous one may
+start from the older state there.
+
+Until the flush, serialized posts overlay the pending state
+(``liked_by_user`` for the viewer and ``likes_count``), so the clicker sees
+the result immediately. Because a flush recounts, ``likes_count`` is exact
+whatever other workers wrote. Pending toggles are written when a worker
+stops gracefully (interpreter exit, including gunicorn's ``SIGTERM`` and
+``max_requests`` recycling), so only a hard kill loses up to one interval
+of clicks.
+
+The buffer is per process: other workers see a toggle after the flush.
+With ``LIKE_WRITE_BEHIND`` off every toggle is flushed before responding.
+"""
+import atexit
+import os
+import threading
+from datetime import datetime
+
+from importlib import import_module
+
+from flask import has_app_context
+from sqlalchemy import tuple_
+
+# Dialects with INSERT ... ON CONFLICT; imported when first used
+CONFLICT_DIALECTS = ('postgresql', 'sqlite')
+
+
+class PendingLike:
+    __slots__ = ('stored', 'liked', 'at')
+
+    def __init__(self, stored, liked, at):
+        self.stored = stored  # state in the database when first toggled
+        self.liked = liked    # state the user asked for
+        self.at = at          # when, for the row's created_at
+
+
+class LikeBuffer:
+    """Flask extension coalescing like toggles into batched writes."""
+
+    def __init__(self, app=None, db=None, Post=None, PostLike=None):
+        # before_commit hooks write in the flush's transaction; after_flush
+        # hooks run once it is committed, after_failure ones once it is rolled
+        # back. All get the affected post ids.
+        # after_toggle hooks get (post_id, liked) for every toggle, before an
+        # inline flush
+        self.before_commit = []
+        self.after_flush = []
+        self.after_failure = []
+        self.after_toggle = []
+        self._reset()
+        # A forked worker (gunicorn --preload) starts empty, with fresh locks
+        # and without the parent's flush thread
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.close)
+        if app is not None:
+            self.init_app(app, db, Post, PostLike)
+
+    def init_app(self, app, db, Post, PostLike):
+        app.config.setdefault('LIKE_WRITE_BEHIND', True)
+        app.config.setdefault('LIKE_FLUSH_INTERVAL', 0.5)
+        app.config.setdefault('LIKE_FLUSH_SIZE', 500)
+        self.app, self.db, self.Post, self.PostLike = app, db, Post, PostLike
+        self.enabled = app.config['LIKE_WRITE_BEHIND']
+        self.interval = app.config['LIKE_FLUSH_INTERVAL']
+        self.max_pending = app.config['LIKE_FLUSH_SIZE']
+        app.extensions['like_buffer'] = self
+
+    def _reset(self):
+        self._pending = {}   # (user_id, post_id) -> PendingLike
+        self._flushing = {}  # the batch being written, still visible to reads
+        self._deltas = {}    # post_id -> likes_count change from pending + flushing
+        self._toggles = 0    # toggles so far, for version()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    # Toggling
+
+    def _stored_state(self, user_id, post_id):
+        return self.db.session.query(self.PostLike.id).filter_by(
+            user_id=user_id, post_id=post_id
+        ).first() is not None
+
+    def toggle(self, user_id, post_id):
+        """Flip the like and return the new state; call inside a request."""
+        key = (user_id, post_id)
+        with self._lock:
+            current = self.liked_state(user_id, post_id)
+        if current is None:
+            # Outside the lock: one read on the unique index, nothing written
+            current = self._stored_state(user_id, post_id)
+
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                # Starts from what the running flush writes, if it has the pair
+                in_flight = self._flushing.get(key)
+                pending = PendingLike(in_flight.liked if in_flight else current, current, None)
+            liked = not pending.liked
+            self._adjust(post_id, pending, liked)
+            pending.liked, pending.at = liked, datetime.utcnow()
+            if pending.liked == pending.stored:
+                self._pending.pop(key, None)  # toggled back: nothing to write
+            else:
+                self._pending[key] = pending
+            self._toggles += 1
+            should_wake = len(self._pending) >= self.max_pending
+
+        for hook in self.after_toggle:
+            hook(post_id, liked)
+        if not self.enabled:
+            self.flush()
+        else:
+            self._ensure_thread()
+            if should_wake:
+                with self._wake:
+                    self._wake.notify()
+        return liked
+
+    def _adjust(self, post_id, pending, liked):
+        """Move the post's count change from ``pending.liked`` to ``liked``;
+        caller holds the lock."""
+        delta = self._deltas.get(post_id, 0) + (1 if liked else 0) - (1 if pending.liked else 0)
+        if delta:
+            self._deltas[post_id] = delta
+        else:
+            self._deltas.pop(post_id, None)
+
+    # Overlay for reads
+
+    def likes_delta(self, post_id):
+        return self._deltas.get(post_id, 0)
+
+    def liked_state(self, user_id, post_id):
+        """The buffered state of the pair, or None if nothing is buffered."""
+        entry = self._pending.get((user_id, post_id)) or self._flushing.get((user_id, post_id))
+        return entry.liked if entry else None
+
+    def overlay(self, data, user_id=None):
+        """Apply pending toggles to serialized post dicts in place: counts,
+        and ``user_id``'s ``liked_by_user``."""
+        if not self._deltas and not self._pending and not self._flushing:
+            return data
+        with self._lock:
+            for item in data:
+                # Projected items may leave out either field
+                if 'likes_count' in item:
+                    item['likes_count'] += self.likes_delta(item['id'])
+                if user_id and 'liked_by_user' in item:
+                    liked = self.liked_state(user_id, item['id'])
+                    if liked is not None:
+                        item['liked_by_user'] = liked
+        return data
+
+    def version(self):
+        """Toggles while anything is pending, for ETags; ``()`` when
+        nothing is, since the flush moves ``updated_at``."""
+        if not self._pending and not self._flushing:
+            return ()
+        return (('likes', self._toggles),)
+
+    def discard_post(self, post_id):
+        """Drop buffered toggles of a deleted post."""
+        with self._lock:
+            # The batch being flushed too: a failed flush must not queue it again
+            for pairs in (self._pending, self._flushing):
+                for key in [key for key in pairs if key[1] == post_id]:
+                    del pairs[key]
+            self._deltas.pop(post_id, None)
+
+    # Flushing
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='like-flush', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._wake:
+                if not self._closed and len(self._pending) < self.max_pending:
+                    self._wake.wait(self.interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Write every pending pair in one transaction; returns pairs written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                # A copy: discard_post may drop pairs from _flushing meanwhile
+                batch = dict(self._flushing)
+                post_ids = {post_id for _, post_id in batch}
+            try:
+                if has_app_context():
+                    # Inline (write-behind off): reuse the request's session and
+                    # connection rather than waiting on the pool for a second one
+                    self._write(batch, post_ids)
+                else:
+                    with self.app.app_context():
+                        self._write(batch, post_ids)
+            except Exception as e:
+                print(f"Like flush error: {e}")
+                with self._lock:
+                    # Retried with the next flush, less posts deleted meanwhile; a
+                    # newer toggle of the same pair still starts from what is stored
+                    for key, entry in self._flushing.items():
+                        pending = self._pending.setdefault(key, entry)
+                        pending.stored = entry.stored
+                        if pending.liked == pending.stored:
+                            del self._pending[key]
+                    self._flushing = {}
+                for hook in self.after_failure:
+                    hook(post_ids)
+                return 0
+
+            with self._lock:
+                # Written now. Toggles made during the flush started from
+                # entry.liked and keep their own change
+                for key, entry in self._flushing.items():
+                    self._adjust(key[1], entry, entry.stored)
+                self._flushing = {}
+            for hook in self.after_flush:
+                hook(post_ids)
+            return len(batch)
+
+    def _write(self, batch, post_ids):
+        try:
+            self._write_batch(batch, post_ids)
+        except Exception:
+            self.db.session.rollback()
+            raise
+
+    def _write_batch(self, batch, post_ids):
+        db, Post, PostLike = self.db, self.Post, self.PostLike
+        session = db.session
+        # Skip likes on posts deleted since the click
+        existing = sorted(post_id for (post_id,) in session.query(Post.id).filter(Post.id.in_(post_ids)))
+        kept = set(existing)
+
+        likes = [{'user_id': user_id, 'post_id': post_id, 'created_at': entry.at}
+                 for (user_id, post_id), entry in batch.items() if entry.liked and post_id in kept]
+        unlikes = [key for key, entry in batch.items() if not entry.liked]
+        if likes:
+            dialect = session.get_bind().dialect.name
+            if dialect in CONFLICT_DIALECTS:
+                insert = import_module(f'sqlalchemy.dialects.{dialect}').insert
+                session.execute(insert(PostLike).on_conflict_do_nothing(
+                    index_elements=['user_id', 'post_id']
+                ), likes)
+            else:
+                stored = set(session.query(PostLike.user_id, PostLike.post_id).filter(
+                    tuple_(PostLike.user_id, PostLike.post_id).in_([(row['user_id'], row['post_id']) for row in likes])
+                ).all())
+                session.add_all(PostLike(**row) for row in likes if (row['user_id'], row['post_id']) not in stored)
+        if unlikes:
+            session.query(PostLike).filter(
+                tuple_(PostLike.user_id, PostLike.post_id).in_(unlikes)
+            ).delete(synchronize_session=False)
+
+        # Recount instead of adding deltas: exact even if another process wrote too
+        like_total = db.select(db.func.count(PostLike.id)).where(
+            PostLike.post_id == Post.id
+        ).scalar_subquery()
+        session.query(Post).filter(Post.id.in_(existing)).update(
+            {Post.likes_count: like_total}, synchronize_session=False
+        )
+        for hook in self.before_commit:
+            hook(existing)
+        session.commit()
+
+    def clear(self):
+        """Drop pending toggles without writing them."""
+        with self._lock:
+            self._pending.clear()
+            self._flushing = {}
+            self._deltas.clear()
+
+    def close(self):
+        """Stop the flush thread and write what is left."""
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
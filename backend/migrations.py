@@ -0,0 +1,350 @@
+"""Versioned schema migrations.
+
+    flask --app app db upgrade
+    flask --app app db status
+
+Migrations are numbered functions registered with ``@migration``; the
+versions applied to a database are recorded in ``schema_migrations``.
+``create_app`` runs ``upgrade()`` at start-up unless ``AUTO_MIGRATE`` is off.
+
+Databases created by ``db.create_all()`` before this module existed have
+some of the later changes already and some not, so every step checks what
+is there (``IF NOT EXISTS``, the inspector) instead of assuming a version.
+The DDL is written out in each step, not taken from the models, so a
+migration keeps doing the same thing after the models change. The search
+index is the exception: its DDL belongs to the backend ``SEARCH_BACKEND``
+picks (``search.py``).
+
+On Postgres indexes are built with ``CREATE INDEX CONCURRENTLY``, which
+doesn't block writes to the table but can't run inside a transaction; such
+steps are registered with ``transactional=False`` and run on an autocommit
+connection.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, UniqueConstraint, inspect, text
+)
+
+# Kept out of db.metadata, so db.drop_all() doesn't forget what was applied
+version_table = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+Migration = namedtuple('Migration', 'version name description apply transactional')
+MIGRATIONS = []
+
+# Session-level lock so two processes starting together don't both migrate
+ADVISORY_LOCK_ID = 0x6d696772
+
+
+def migration(version, transactional=True):
+    def register(fn):
+        MIGRATIONS.append(Migration(version, fn.__name__, (fn.__doc__ or '').strip(), fn, transactional))
+        MIGRATIONS.sort(key=lambda step: step.version)
+        return fn
+    return register
+
+
+def create_index(conn, name, table, columns, method=None):
+    using = f' USING {method}' if method else ''
+    if conn.dialect.name == 'postgresql':
+        # An interrupted CONCURRENTLY build leaves an invalid index behind,
+        # which IF NOT EXISTS would keep; drop it and build it again
+        invalid = conn.execute(text(
+            'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE c.relname = :name AND NOT i.indisvalid'
+        ), {'name': name}).first()
+        if invalid:
+            conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+        conn.execute(text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table}{using} ({columns})'))
+    else:
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table}{using} ({columns})'))
+
+
+def drop_index(conn, name):
+    concurrently = ' CONCURRENTLY' if conn.dialect.name == 'postgresql' else ''
+    conn.execute(text(f'DROP INDEX{concurrently} IF EXISTS {name}'))
+
+
+# Migrations
+
+@migration(1)
+def initial_schema(conn, metadata):
+    """The users, posts and post_likes tables as first released; tables that
+    already exist are left alone."""
+    snapshot = MetaData()
+    Table(
+        'users', snapshot,
+        Column('id', Integer, primary_key=True),
+        Column('name', String(100), nullable=False),
+        Column('email', String(120), unique=True, nullable=False),
+        Column('password_hash', String(128), nullable=False),
+        Column('bio', Text),
+        Column('avatar', String(255)),
+        Column('job_title', String(100)),
+        Column('location', String(100)),
+        Column('created_at', DateTime),
+    )
+    Table(
+        'posts', snapshot,
+        Column('id', Integer, primary_key=True),
+        Column('content', Text, nullable=False),
+        Column('created_at', DateTime),
+        Column('author_id', Integer, ForeignKey('users.id'), nullable=False),
+    )
+    Table(
+        'post_likes', snapshot,
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+        Column('post_id', Integer, ForeignKey('posts.id'), nullable=False),
+        Column('created_at', DateTime),
+        UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),
+    )
+    snapshot.create_all(conn)
+
+
+# Derived from the hot queries (see test_schema.py for the plan check):
+HOT_QUERY_INDEXES = [
+    # GET /api/posts: ORDER BY created_at DESC, id DESC and the keyset cursor
+    ('ix_posts_created_at_id', 'posts', 'created_at, id'),
+    # GET /api/posts/user/<id>: author_id = ? in the same order; posts_count recounts
+    ('ix_posts_author_id_created_at_id', 'posts', 'author_id, created_at, id'),
+    # Like flushes, delete_post and likes_count recounts look likes up by post;
+    # the unique (user_id, post_id) index only serves lookups by user
+    ('ix_post_likes_post_id', 'post_likes', 'post_id'),
+    # GET /api/users: ORDER BY name
+    ('ix_users_name', 'users', 'name'),
+]
+
+
+@migration(2, transactional=False)
+def hot_query_indexes(conn, metadata):
+    """Indexes for the feed, profile, like and user list queries."""
+    for name, table, columns in HOT_QUERY_INDEXES:
+        create_index(conn, name, table, columns)
+
+
+@migration(3)
+def counter_columns(conn, metadata):
+    """posts.likes_count and users.posts_count, backfilled from the source tables."""
+    inspector = inspect(conn)
+    if 'likes_count' not in {column['name'] for column in inspector.get_columns('posts')}:
+        conn.execute(text('ALTER TABLE posts ADD COLUMN likes_count INTEGER NOT NULL DEFAULT 0'))
+        conn.execute(text(
+            'UPDATE posts SET likes_count = '
+            '(SELECT count(*) FROM post_likes WHERE post_likes.post_id = posts.id)'
+        ))
+    if 'posts_count' not in {column['name'] for column in inspector.get_columns('users')}:
+        conn.execute(text('ALTER TABLE users ADD COLUMN posts_count INTEGER NOT NULL DEFAULT 0'))
+        conn.execute(text(
+            'UPDATE users SET posts_count = '
+            '(SELECT count(*) FROM posts WHERE posts.author_id = users.id)'
+        ))
+
+
+@migration(4)
+def updated_at_columns(conn, metadata):
+    """users.updated_at and posts.updated_at, backfilled from created_at."""
+    inspector = inspect(conn)
+    column_type = DateTime().compile(dialect=conn.dialect)
+    for table in ('users', 'posts'):
+        if 'updated_at' not in {column['name'] for column in inspector.get_columns(table)}:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN updated_at {column_type}'))
+            conn.execute(text(f'UPDATE {table} SET updated_at = created_at'))
+
+
+# max(updated_at) is the version behind the feed and user list ETags
+VERSION_INDEXES = [
+    ('ix_users_updated_at', 'users', 'updated_at'),
+    ('ix_posts_updated_at', 'posts', 'updated_at'),
+]
+
+
+@migration(5, transactional=False)
+def version_indexes(conn, metadata):
+    """Indexes for the max(updated_at) lookups of conditional GETs."""
+    for name, table, columns in VERSION_INDEXES:
+        create_index(conn, name, table, columns)
+
+
+@migration(6)
+def post_changes(conn, metadata):
+    """The post_changes log behind ?since= deltas and the event stream."""
+    Table(
+        'post_changes', MetaData(),
+        Column('id', Integer, primary_key=True),
+        Column('post_id', Integer, nullable=False),
+        Column('kind', String(10), nullable=False),
+        Column('created_at', DateTime, nullable=False),
+        sqlite_autoincrement=True,
+    ).create(conn, checkfirst=True)
+
+
+@migration(7)
+def connections(conn, metadata):
+    """The connections edge table, both directions per connection."""
+    snapshot = MetaData()
+    # For the foreign keys to refer to; only connections is created
+    Table('users', snapshot, Column('id', Integer, primary_key=True))
+    Table(
+        'connections', snapshot,
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+        Column('connection_id', Integer, ForeignKey('users.id'), nullable=False),
+        Column('created_at', DateTime, nullable=False),
+        UniqueConstraint('user_id', 'connection_id', name='unique_user_connection'),
+        Index('ix_connections_user_id_created_at_id', 'user_id', 'created_at', 'id', 'connection_id'),
+    ).create(conn, checkfirst=True)
+
+
+@migration(8, transactional=False)
+def like_velocity_index(conn, metadata):
+    """Index for the ranked feed's recent-likes count."""
+    create_index(conn, 'ix_post_likes_created_at_post_id', 'post_likes', 'created_at, post_id')
+
+
+@migration(9)
+def trending_buckets(conn, metadata):
+    """Bucketed like counts behind the trending posts."""
+    Table(
+        'trending_buckets', MetaData(),
+        Column('bucket_start', Integer, primary_key=True),
+        Column('post_id', Integer, primary_key=True),
+        Column('likes', Integer, nullable=False),
+    ).create(conn, checkfirst=True)
+
+
+@migration(10)
+def timeline_entries(conn, metadata):
+    """The materialized timelines of TIMELINE_BACKEND=database."""
+    Table(
+        'timeline_entries', MetaData(),
+        Column('timeline_key', String(64), primary_key=True),
+        Column('created_at', DateTime, primary_key=True),
+        Column('post_id', Integer, primary_key=True),
+    ).create(conn, checkfirst=True)
+
+
+@migration(11)
+def search_index(conn, metadata):
+    """The full-text search index (FTS5 tables or tsvector columns), built
+    by the backend SEARCH_BACKEND picks and backfilled; the tsvector
+    columns' GIN indexes follow in 13."""
+    current_app.extensions['full_text_search'].setup(conn)
+
+
+@migration(12, transactional=False)
+def prolific_authors_index(conn, metadata):
+    """Index for the timelines' prolific authors lookup."""
+    create_index(conn, 'ix_users_posts_count', 'users', 'posts_count')
+
+
+@migration(13, transactional=False)
+def search_gin_indexes(conn, metadata):
+    """GIN indexes over the tsvector columns of migration 11 (Postgres)."""
+    for name, table, columns, method in current_app.extensions['full_text_search'].indexes(conn.dialect.name):
+        create_index(conn, name, table, columns, method)
+
+
+@migration(14, transactional=False)
+def like_velocity_per_post_index(conn, metadata):
+    """The ranked feed counts recent likes per candidate post: index
+    (post_id, created_at) instead of (created_at, post_id)."""
+    create_index(conn, 'ix_post_likes_post_id_created_at', 'post_likes', 'post_id, created_at')
+    drop_index(conn, 'ix_post_likes_created_at_post_id')
+
+
+class SchemaMigrations:
+    """Flask extension applying ``MIGRATIONS`` to the app's database."""
+
+    def __init__(self, app=None, db=None):
+        self.db = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        app.config.setdefault('AUTO_MIGRATE', True)
+        app.cli.add_command(self.command_group())
+        app.extensions['schema_migrations'] = self
+
+    def applied_versions(self):
+        with self.db.engine.begin() as conn:
+            version_table.create(conn, checkfirst=True)
+            return {version for (version,) in conn.execute(version_table.select().with_only_columns(
+                version_table.c.version
+            ))}
+
+    def pending(self):
+        applied = self.applied_versions()
+        return [step for step in MIGRATIONS if step.version not in applied]
+
+    def upgrade(self):
+        """Apply the pending migrations in order; returns the ones applied."""
+        engine = self.db.engine
+        done = []
+        with self._lock(engine):
+            for step in self.pending():
+                if step.transactional:
+                    with engine.begin() as conn:
+                        step.apply(conn, self.db.metadata)
+                        self._record(conn, step)
+                else:
+                    with engine.connect() as conn:
+                        conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+                        step.apply(conn, self.db.metadata)
+                        self._record(conn, step)
+                click.echo(f'Applied migration {step.version:04d} {step.name}')
+                done.append(step)
+        return done
+
+    def _record(self, conn, step):
+        conn.execute(version_table.insert().values(
+            version=step.version, name=step.name, applied_at=datetime.utcnow()
+        ))
+
+    @contextmanager
+    def _lock(self, engine):
+        if engine.dialect.name != 'postgresql':
+            # SQLite serializes writers itself and every step is idempotent
+            yield
+            return
+        # Held on an idle autocommit connection, so CONCURRENTLY builds
+        # on the other connections don't wait for it
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+            conn.execute(text('SELECT pg_advisory_lock(:id)'), {'id': ADVISORY_LOCK_ID})
+            try:
+                yield
+            finally:
+                conn.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': ADVISORY_LOCK_ID})
+
+    # CLI
+
+    def command_group(self):
+        group = AppGroup('db', help='Versioned schema migrations.')
+
+        @group.command('upgrade')
+        def upgrade_command():
+            """Apply every pending migration."""
+            if not self.upgrade():
+                click.echo('Schema is up to date')
+
+        @group.command('status')
+        def status_command():
+            """List the migrations and whether each is applied."""
+            applied = self.applied_versions()
+            for step in MIGRATIONS:
+                state = 'applied' if step.version in applied else 'pending'
+                click.echo(f'{step.version:04d} {step.name:<20} {state:<8} {step.description}')
+
+        return group
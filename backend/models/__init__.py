@@ -1,52 +1,230 @@
 from datetime import datetime
-import hashlib
-
-def init_db(db):
-    class User(db.Model):
-        __tablename__ = 'users'
-        
-        id = db.Column(db.Integer, primary_key=True)
-        name = db.Column(db.String(100), nullable=False)
-        email = db.Column(db.String(120), unique=True, nullable=False)
-        password_hash = db.Column(db.String(128), nullable=False)
-        bio = db.Column(db.Text)
-        created_at = db.Column(db.DateTime, default=datetime.utcnow)
-        
-        # Relationship with posts
-        posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan')
-        
-        def set_password(self, password):
-            # Simple hash for demo purposes - use proper bcrypt in production
-            self.password_hash = hashlib.sha256(password.encode()).hexdigest()
-        
-        def check_password(self, password):
-            # Simple hash check for demo purposes - use proper bcrypt in production
-            return self.password_hash == hashlib.sha256(password.encode()).hexdigest()
-        
-        def to_dict(self):
-            return {
-                'id': self.id,
-                'name': self.name,
-                'email': self.email,
-                'bio': self.bio,
-                'created_at': self.created_at.isoformat()
-            }
-
-    class Post(db.Model):
-        __tablename__ = 'posts'
-        
-        id = db.Column(db.Integer, primary_key=True)
-        content = db.Column(db.Text, nullable=False)
-        created_at = db.Column(db.DateTime, default=datetime.utcnow)
-        author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-        
-        def to_dict(self):
-            return {
-                'id': self.id,
-                'content': self.content,
-                'created_at': self.created_at.isoformat(),
-                'author_id': self.author_id,
-                'author_name': self.author.name
-            }
-    
-    return User, Post
+
+from extensions import db, password_hasher
+from instrumentation import serializer
+from passwords import PasswordTooLong
+
+class User(db.Model):
+    __tablename__ = 'users'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(128), nullable=False)
+    bio = db.Column(db.Text)
+    avatar = db.Column(db.String(255), default='')
+    job_title = db.Column(db.String(100), default='')
+    location = db.Column(db.String(100), default='')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped by every UPDATE of the row, including posts_count changes; the
+    # profile's and the feeds' ETags are derived from it (see versions.py)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Maintained by create_post/delete_post; see reconcile_counters
+    posts_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Relationship with posts
+    posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan')
+    liked_posts = db.relationship('PostLike', backref='user', lazy=True, cascade='all, delete-orphan')
+
+    # GET /api/users is ordered by name; see migrations.HOT_QUERY_INDEXES
+    __table_args__ = (
+        db.Index('ix_users_name', 'name'),
+        db.Index('ix_users_updated_at', 'updated_at'),
+        # The timelines' prolific authors (posts_count over the threshold)
+        db.Index('ix_users_posts_count', 'posts_count'),
+    )
+
+    def set_password(self, password):
+        self.password_hash = password_hasher.hash(password)
+
+    def check_password(self, password):
+        # Legacy or outdated hashes are upgraded in place; the caller commits
+        matches, needs_rehash = password_hasher.verify(password, self.password_hash)
+        if matches and needs_rehash:
+            try:
+                self.password_hash = password_hasher.hash(password)
+            except PasswordTooLong:
+                pass  # can't move to bcrypt; keep the old hash
+        return matches
+
+    @serializer
+    def to_dict(self, include_counts=False, fields=None):
+        if fields is not None:
+            return {name: get(self) for name, get in USER_FIELDS.items() if name in fields}
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'email': self.email,
+            'bio': self.bio or '',
+            'avatar': self.avatar or '',
+            'job_title': self.job_title or '',
+            'location': self.location or '',
+            'created_at': self.created_at.isoformat()
+        }
+        if include_counts:
+            data['posts_count'] = self.posts_count or 0
+        return data
+
+class Post(db.Model):
+    __tablename__ = 'posts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Bumped when a like flush recounts likes_count
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Maintained by the like buffer; see reconcile_counters
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Relationship with likes
+    likes = db.relationship('PostLike', backref='post', lazy=True, cascade='all, delete-orphan')
+
+    # Composite indexes backing the (created_at, id) keyset ordering of the feeds
+    __table_args__ = (
+        db.Index('ix_posts_created_at_id', 'created_at', 'id'),
+        db.Index('ix_posts_author_id_created_at_id', 'author_id', 'created_at', 'id'),
+        db.Index('ix_posts_updated_at', 'updated_at'),
+    )
+
+    @serializer
+    def to_dict(self, current_user_id=None, liked_by_user=None, fields=None):
+        # Lists should go through serialize_posts, which passes the viewer's
+        # likes in; this fallback looks up a single like row.
+        if liked_by_user is None and (fields is None or 'liked_by_user' in fields):
+            liked_by_user = bool(current_user_id) and PostLike.query.filter_by(
+                user_id=current_user_id, post_id=self.id
+            ).first() is not None
+
+        if fields is not None:
+            data = {name: get(self) for name, get in POST_FIELDS.items() if name in fields}
+            if 'liked_by_user' in fields:
+                data['liked_by_user'] = liked_by_user
+            return data
+
+        return {
+            'id': self.id,
+            'content': self.content,
+            'created_at': self.created_at.isoformat(),
+            'author_id': self.author_id,
+            'author_name': self.author.name,
+            'author_avatar': self.author.avatar or '',
+            'author_job_title': self.author.job_title or '',
+            'likes_count': self.likes_count or 0,
+            'liked_by_user': liked_by_user
+        }
+
+class PostLike(db.Model):
+    __tablename__ = 'post_likes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Ensure a user can only like a post once
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),
+        # The unique index leads with user_id; per-post counts and deletes need this
+        db.Index('ix_post_likes_post_id', 'post_id'),
+        # Recent likes per post for the ranked feed's like velocity (see ranking.py)
+        db.Index('ix_post_likes_post_id_created_at', 'post_id', 'created_at'),
+    )
+
+class PostChange(db.Model):
+    """Append-only log behind ``GET /api/posts?since=`` and the event stream
+    (see changes.py); ``id`` is the cursor."""
+    __tablename__ = 'post_changes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, nullable=False)  # no foreign key: deletions are logged too
+    kind = db.Column(db.String(10), nullable=False)  # 'created', 'deleted' or 'likes'
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # AUTOINCREMENT: SQLite would otherwise reuse ids once old rows are pruned
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class TrendingBucket(db.Model):
+    """Net likes per post per time bucket, behind ``GET /api/posts/trending``
+    (see trending.py)."""
+    __tablename__ = 'trending_buckets'
+
+    bucket_start = db.Column(db.Integer, primary_key=True)  # unix time, a multiple of TRENDING_BUCKET_SECONDS
+    post_id = db.Column(db.Integer, primary_key=True)  # no foreign key, like post_changes
+    likes = db.Column(db.Integer, nullable=False, default=0)
+
+class Connection(db.Model):
+    """One direction of a connection between two users. Both directions are
+    stored, so either user's list is one index range (see graph.py)."""
+    __tablename__ = 'connections'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    connection_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Covering for adjacency loads: connection_id in order, no table reads
+        db.UniqueConstraint('user_id', 'connection_id', name='unique_user_connection'),
+        # Covering for the newest-first list and its keyset cursor
+        db.Index('ix_connections_user_id_created_at_id', 'user_id', 'created_at', 'id', 'connection_id'),
+    )
+
+# Field getters for ?fields= projections (see projection.py). Each returns
+# the same value as the full to_dict() and touches only the columns that
+# projection.py loads for it.
+
+USER_FIELDS = {
+    'id': lambda user: user.id,
+    'name': lambda user: user.name,
+    'email': lambda user: user.email,
+    'bio': lambda user: user.bio or '',
+    'avatar': lambda user: user.avatar or '',
+    'job_title': lambda user: user.job_title or '',
+    'location': lambda user: user.location or '',
+    'created_at': lambda user: user.created_at.isoformat(),
+    'posts_count': lambda user: user.posts_count or 0,
+}
+
+POST_FIELDS = {
+    'id': lambda post: post.id,
+    'content': lambda post: post.content,
+    'created_at': lambda post: post.created_at.isoformat(),
+    'author_id': lambda post: post.author_id,
+    'author_name': lambda post: post.author.name,
+    'author_avatar': lambda post: post.author.avatar or '',
+    'author_job_title': lambda post: post.author.job_title or '',
+    'likes_count': lambda post: post.likes_count or 0,
+}
+
+# Counter maintenance
+#
+# posts_count is adjusted with UPDATE ... SET col = col + 1 in the same
+# transaction as the row change, so concurrent requests never lose an
+# increment and a failed commit rolls the counter back too. likes_count is
+# recounted by the like buffer when it writes a batch.
+
+def adjust_posts_count(user_id, delta):
+    User.query.filter_by(id=user_id).update(
+        {User.posts_count: User.posts_count + delta}, synchronize_session=False
+    )
+
+def reconcile_counters():
+    """Recompute every counter from the source tables; returns rows fixed."""
+    like_total = db.select(db.func.count(PostLike.id)).where(
+        PostLike.post_id == Post.id
+    ).scalar_subquery()
+    post_total = db.select(db.func.count(Post.id)).where(
+        Post.author_id == User.id
+    ).scalar_subquery()
+
+    posts_fixed = Post.query.filter(Post.likes_count != like_total).update(
+        {Post.likes_count: like_total}, synchronize_session=False
+    )
+    users_fixed = User.query.filter(User.posts_count != post_total).update(
+        {User.posts_count: post_total}, synchronize_session=False
+    )
+    db.session.commit()
+    return {'posts': posts_fixed, 'users': users_fixed}
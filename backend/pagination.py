@@ -0,0 +1,84 @@
+"""Keyset (cursor) pagination helpers for the post feeds.
+
+Posts are ordered by ``(created_at DESC, id DESC)``. A cursor is the
+``(created_at, id)`` pair of the last post on a page, base64-encoded so
+clients treat it as opaque.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class PaginationError(ValueError):
+    """Raised for a malformed ``cursor`` or ``limit`` parameter."""
+
+
+def encode_cursor(created_at, post_id):
+    raw = json.dumps([created_at.isoformat(), post_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, post_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, TypeError) as e:
+        raise PaginationError('Invalid cursor') from e
+
+
+def parse_limit(value):
+    """Clamp the ``limit`` query parameter to ``1..MAX_PAGE_SIZE``."""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def is_paginated_request(args):
+    """Clients that send neither ``limit`` nor ``cursor`` get the full list."""
+    return 'limit' in args or 'cursor' in args
+
+
+def entries_page(entries, limit):
+    """Like ``keyset_page`` for ``(created_at, id)`` entries fetched with ``limit + 1``."""
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(*entries[-1])
+    return entries, next_cursor
+
+
+def keyset_filter(query, model, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Restrict a ``Query`` or ``select()`` to the page after ``cursor``.
+
+    Fetches ``limit + 1`` rows so ``split_page`` can tell whether more follow.
+    ``model`` must have ``created_at`` and ``id`` columns; the composite
+    indexes on ``posts`` serve both the range filter and the ordering.
+    """
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, last_id))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def split_page(rows, limit):
+    """Trim the extra row fetched by ``keyset_filter``; returns ``(rows, next_cursor)``."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def keyset_page(query, model, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return ``(rows, next_cursor)`` for one page of ``query``."""
+    return split_page(keyset_filter(query, model, cursor, limit).all(), limit)
@@ -0,0 +1,220 @@
+"""Pluggable password hashing.
+
+Hashes are stored as ``<algorithm>$<cost>$<salt>$<digest>`` (bcrypt keeps its
+own ``$2b$...`` format after the ``bcrypt$`` prefix), so the algorithm and
+cost of every stored hash are known and old hashes can be upgraded on the
+next successful login. Two legacy formats are still accepted:
+
+* bare 64-char hex digests: the unsalted SHA-256 of the early ``simple_app.py``
+* bare ``$2b$``/``$2a$`` strings: Flask-Bcrypt hashes of the old standalone ``app.py``
+
+``PasswordHasher`` runs the expensive work in a bounded thread pool
+(hashlib and bcrypt release the GIL), so a login storm uses at most
+``PASSWORD_HASH_WORKERS`` cores and sheds load with ``HasherBusy`` instead
+of tying up every request thread. The pool and the dummy hash used for
+unknown users are created on first use, so app startup doesn't pay for a
+full-cost hash, and a forked worker builds its own pool.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+try:
+    import bcrypt
+except ImportError:  # optional; Flask-Bcrypt pulls it in
+    bcrypt = None
+
+LEGACY_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode().rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class PasswordTooLong(ValueError):
+    """The password is longer than the algorithm hashes; the caller should answer 400."""
+
+
+class Pbkdf2Sha256:
+    name = 'pbkdf2_sha256'
+    default_cost = 600_000  # iterations
+
+    def hash(self, password, cost):
+        salt = os.urandom(16)
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, cost)
+        return f'{self.name}${cost}${_b64(salt)}${_b64(digest)}'
+
+    def verify(self, password, encoded):
+        _, cost, salt, digest = encoded.split('$')
+        candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), _unb64(salt), int(cost))
+        return hmac.compare_digest(candidate, _unb64(digest)), int(cost)
+
+
+class Scrypt:
+    name = 'scrypt'
+    default_cost = 15  # log2(N); r=8, p=1
+
+    def hash(self, password, cost):
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, cost)
+        return f'{self.name}${cost}${_b64(salt)}${_b64(digest)}'
+
+    @staticmethod
+    def _derive(password, salt, cost):
+        n = 2 ** cost
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=8, p=1, maxmem=2 * 128 * 8 * n)
+
+    def verify(self, password, encoded):
+        _, cost, salt, digest = encoded.split('$')
+        candidate = self._derive(password, _unb64(salt), int(cost))
+        return hmac.compare_digest(candidate, _unb64(digest)), int(cost)
+
+
+class Bcrypt:
+    name = 'bcrypt'
+    default_cost = 12  # log2(rounds)
+    max_bytes = 72  # the rest would be ignored (bcrypt < 5) or rejected
+
+    def hash(self, password, cost):
+        if len(password.encode()) > self.max_bytes:
+            raise PasswordTooLong(f'Passwords can be at most {self.max_bytes} bytes long')
+        return f'{self.name}$' + bcrypt.hashpw(password.encode(), bcrypt.gensalt(cost)).decode()
+
+    def verify(self, password, encoded):
+        raw = encoded[len(self.name) + 1:] if encoded.startswith(f'{self.name}$') else encoded
+        return bcrypt.checkpw(password.encode(), raw.encode()), int(raw.split('$')[2])
+
+
+class LegacySha256:
+    """Unsalted SHA-256 hex digests; verify-only, always rehashed."""
+    name = 'sha256'
+    default_cost = 0
+
+    def hash(self, password, cost):
+        raise ValueError('sha256 hashes are only accepted for upgrading')
+
+    def verify(self, password, encoded):
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(candidate, encoded), 0
+
+
+HASHERS = {hasher.name: hasher for hasher in (Pbkdf2Sha256(), Scrypt(), LegacySha256())}
+if bcrypt is not None:
+    HASHERS[Bcrypt.name] = Bcrypt()
+
+DEFAULT_ALGORITHM = Pbkdf2Sha256.name
+
+
+def identify(encoded):
+    if LEGACY_SHA256_RE.match(encoded):
+        return HASHERS['sha256']
+    if encoded.startswith(('$2a$', '$2b$', '$2y$')):
+        return HASHERS['bcrypt']
+    return HASHERS[encoded.split('$', 1)[0]]
+
+
+def hash_password(password, algorithm=DEFAULT_ALGORITHM, cost=None):
+    hasher = HASHERS[algorithm]
+    return hasher.hash(password, cost or hasher.default_cost)
+
+
+def verify_password(password, encoded, algorithm=DEFAULT_ALGORITHM, cost=None):
+    """Return ``(matches, needs_rehash)`` for a stored hash.
+
+    ``needs_rehash`` is true when the hash uses a different algorithm or cost
+    than the given (current) settings.
+    """
+    try:
+        hasher = identify(encoded)
+        matches, stored_cost = hasher.verify(password, encoded)
+    except (KeyError, ValueError, IndexError):
+        return False, False
+    wanted_cost = cost or HASHERS[algorithm].default_cost
+    return matches, hasher.name != algorithm or stored_cost != wanted_cost
+
+
+class HasherBusy(Exception):
+    """Too many hashes are queued, or one timed out; the caller should answer 503."""
+
+
+class PasswordHasher:
+    """Flask extension binding the hash settings and worker pool to an app."""
+
+    def __init__(self, app=None):
+        self._pool = None
+        self._dummy_hash = None
+        self._lock = threading.Lock()
+        # Threads don't survive fork
+        os.register_at_fork(after_in_child=self._forget_pool)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_ALGORITHM', DEFAULT_ALGORITHM)
+        app.config.setdefault('PASSWORD_HASH_COST', None)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 64)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+        self.configure(
+            app.config['PASSWORD_HASH_ALGORITHM'], app.config['PASSWORD_HASH_COST'],
+            app.config['PASSWORD_HASH_WORKERS'], app.config['PASSWORD_HASH_MAX_PENDING'],
+            app.config['PASSWORD_HASH_TIMEOUT'],
+        )
+        app.extensions['password_hasher'] = self
+
+    def configure(self, algorithm, cost=None, workers=4, max_pending=64, timeout=10):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self.algorithm = algorithm
+        self.cost = cost or HASHERS[algorithm].default_cost
+        self.timeout = timeout
+        self.workers = workers
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._dummy_hash = None
+
+    def _forget_pool(self):
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._get_pool().submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                raise HasherBusy()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.algorithm, self.cost)
+
+    def verify(self, password, encoded):
+        """Return ``(matches, needs_rehash)``; ``encoded=None`` still costs one hash."""
+        if encoded is None:
+            # Verified against when the user doesn't exist, so unknown emails
+            # take as long as wrong passwords
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash(os.urandom(8).hex())
+            self._run(verify_password, password, self._dummy_hash, self.algorithm, self.cost)
+            return False, False
+        return self._run(verify_password, password, encoded, self.algorithm, self.cost)
@@ -0,0 +1,78 @@
+"""``?fields=`` projections for the list and search endpoints.
+
+    GET /api/posts?fields=content,author_name,likes_count
+    GET /api/users?fields=name,job_title
+    GET /api/search?q=dev&user_fields=name&post_fields=content
+
+Only the columns behind the requested fields are selected (``load_only``).
+The author join is dropped when no ``author_*`` field is asked for, and the
+viewer's likes are only looked up for ``liked_by_user``. ``id`` is always
+included. Without the parameter responses are unchanged.
+"""
+from extensions import db
+from models import Post, User
+
+
+class FieldsError(ValueError):
+    pass
+
+
+# Columns each field needs, on the post and on its author
+POST_COLUMNS = {
+    'id': ((), ()),
+    'content': ((Post.content,), ()),
+    'created_at': ((), ()),
+    'author_id': ((), ()),
+    'author_name': ((), (User.name,)),
+    'author_avatar': ((), (User.avatar,)),
+    'author_job_title': ((), (User.job_title,)),
+    'likes_count': ((Post.likes_count,), ()),
+    'liked_by_user': ((), ()),
+}
+# Always loaded: feed ordering, cursors and cache tags use them
+POST_KEY_COLUMNS = (Post.id, Post.created_at, Post.author_id)
+AUTHOR_FIELDS = frozenset(name for name, (_, author) in POST_COLUMNS.items() if author)
+
+USER_COLUMNS = {
+    'id': User.id,
+    'name': User.name,
+    'email': User.email,
+    'bio': User.bio,
+    'avatar': User.avatar,
+    'job_title': User.job_title,
+    'location': User.location,
+    'created_at': User.created_at,
+    'posts_count': User.posts_count,
+}
+
+
+def parse_fields(args, allowed, param='fields'):
+    """The requested field names (plus ``id``), or ``None`` for every field."""
+    value = args.get(param)
+    if value is None:
+        return None
+    fields = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = fields - allowed.keys()
+    if unknown:
+        raise FieldsError(f"Unknown {param}: {', '.join(sorted(unknown))}. "
+                          f"Choose from: {', '.join(allowed)}")
+    return frozenset(fields | {'id'})
+
+
+def post_options(fields=None):
+    """Loader options for a ``Post`` query serialized with ``fields``."""
+    if fields is None:
+        return [db.joinedload(Post.author)]
+    columns = [*POST_KEY_COLUMNS, *(column for name in fields for column in POST_COLUMNS[name][0])]
+    author_columns = [column for name in fields for column in POST_COLUMNS[name][1]]
+    options = [db.load_only(*columns)]
+    if author_columns:
+        options.append(db.joinedload(Post.author).load_only(*author_columns))
+    return options
+
+
+def user_options(fields=None):
+    """Loader options for a ``User`` query serialized with ``fields``."""
+    if fields is None:
+        return []
+    return [db.load_only(*(USER_COLUMNS[name] for name in fields))]
@@ -0,0 +1,261 @@
+"""Ranked feed: ``GET /api/posts?sort=ranked``.
+
+The newest ``RANKED_FEED_CANDIDATES`` posts are the candidates. Three
+batched queries give their features:
+
+* ``age_hours`` and ``likes`` from the candidates query itself,
+* ``velocity``: likes in the last ``RANKED_FEED_VELOCITY_WINDOW`` seconds,
+  counted per candidate on ``ix_post_likes_post_id_created_at``,
+* ``affinity``: the share of the viewer's last ``RANKED_FEED_AFFINITY_LIKES``
+  likes that went to each author (0 for anonymous viewers).
+
+The first two are the same for every viewer, so they are computed once per
+cache bucket and shared; only ``affinity`` is queried per viewer.
+
+A scorer then turns the feature arrays into one score per candidate in a
+single NumPy batch. Scorers are registered with ``@scorer(name)`` and picked
+with ``RANKED_FEED_SCORER``; ``RANKED_FEED_WEIGHTS`` is passed to them.
+
+Rankings are cached per viewer for the current ``RANKED_FEED_CACHE_TTL``
+bucket, which is also part of the feed's ETag (see ``versions.py``), so a
+ranking and its validator change together. A cursor is a position in one
+bucket's ranking; older buckets are kept a while so paging stays on the
+ranking the first page came from, and a cursor into one that is gone
+answers 400. Posts are loaded and serialized fresh, so like counts are
+current even when the order is cached.
+
+NumPy is optional for the rest of the app; without it ``sort=ranked``
+answers 501.
+"""
+import base64
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from pagination import PaginationError
+from viewer import LRUCache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SORTS = ('recent', 'ranked')
+# Rankings outlive their bucket by this long, for cursors into them
+RANKING_GRACE = 600
+
+# Arrays of equal length, one element per candidate, newest post first
+Features = namedtuple('Features', 'post_ids author_ids age_hours likes velocity affinity')
+
+SCORERS = {}
+
+
+class SortError(ValueError):
+    """Raised for an unknown ``sort`` parameter."""
+
+
+class RankingUnavailable(Exception):
+    """``sort=ranked`` without NumPy installed."""
+
+
+def parse_sort(args):
+    sort = args.get('sort') or 'recent'
+    if sort not in SORTS:
+        raise SortError(f"sort must be one of: {', '.join(SORTS)}")
+    return sort
+
+
+def encode_rank_cursor(bucket, offset):
+    return base64.urlsafe_b64encode(f'r{bucket}:{offset}'.encode()).decode().rstrip('=')
+
+
+def decode_rank_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode((cursor + '=' * (-len(cursor) % 4)).encode()).decode()
+        if not raw.startswith('r'):
+            raise ValueError(raw)
+        bucket, offset = raw[1:].split(':')
+        return int(bucket), max(0, int(offset))
+    except ValueError as e:
+        raise PaginationError('Invalid cursor') from e
+
+
+def scorer(name):
+    """Register ``fn(features, weights) -> scores`` under ``name``."""
+    def register(fn):
+        SCORERS[name] = fn
+        return fn
+    return register
+
+
+@scorer('default')
+def decayed_engagement(features, weights):
+    """Recency decay times an engagement boost:
+
+        0.5 ** (age / half_life) * (1 + velocity * log1p(likes in window) + affinity * author share)
+
+    The decay factor is the same for every post as time passes, so the
+    order only changes when the features do.
+    """
+    decay = np.exp2(-features.age_hours / weights['half_life_hours'])
+    boost = 1 + weights['velocity'] * np.log1p(features.velocity) + weights['affinity'] * features.affinity
+    return decay * boost
+
+
+@scorer('recent')
+def recency(features, weights):
+    """Newest first, the same order as the unranked feed."""
+    return -features.age_hours
+
+
+class RankedFeed:
+    """Flask extension scoring and caching ranked feeds."""
+
+    def __init__(self, app=None, db=None, Post=None, PostLike=None):
+        if app is not None:
+            self.init_app(app, db, Post, PostLike)
+
+    def init_app(self, app, db, Post, PostLike):
+        app.config.setdefault('RANKED_FEED_CANDIDATES', 1000)
+        app.config.setdefault('RANKED_FEED_SCORER', 'default')
+        app.config.setdefault('RANKED_FEED_WEIGHTS', {'half_life_hours': 12, 'velocity': 1.0, 'affinity': 2.0})
+        app.config.setdefault('RANKED_FEED_VELOCITY_WINDOW', 6 * 3600)
+        app.config.setdefault('RANKED_FEED_AFFINITY_LIKES', 1000)
+        app.config.setdefault('RANKED_FEED_CACHE_TTL', 30)
+        app.config.setdefault('RANKED_FEED_CACHE_SIZE', 4096)
+        if app.config['RANKED_FEED_SCORER'] not in SCORERS:
+            raise ValueError(f"Unknown RANKED_FEED_SCORER {app.config['RANKED_FEED_SCORER']!r}")
+        self.db, self.Post, self.PostLike = db, Post, PostLike
+        self.config = app.config
+        self.rankings = LRUCache(app.config['RANKED_FEED_CACHE_SIZE'])
+        # Bucket -> the viewer-independent features of its candidates
+        self.shared = LRUCache(2)
+        app.extensions['ranked_feed'] = self
+
+    # Features
+
+    def features(self, session, viewer_id, now, candidates=None):
+        """The candidates' features for ``viewer_id``; ``candidates`` is a
+        result of ``candidates(session, now)`` to reuse."""
+        if candidates is None:
+            candidates = self.candidates(session, now)
+        return candidates._replace(affinity=self.affinity(session, viewer_id, candidates.author_ids))
+
+    def candidates(self, session, now):
+        """Features of the candidates with ``affinity`` left at 0."""
+        Post, PostLike = self.Post, self.PostLike
+        rows = session.execute(
+            select(Post.id, Post.author_id, Post.created_at, Post.likes_count).order_by(
+                Post.created_at.desc(), Post.id.desc()
+            ).limit(self.config['RANKED_FEED_CANDIDATES'])
+        ).all()
+        count = len(rows)
+        post_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+        author_ids = np.fromiter((row[1] for row in rows), dtype=np.int64, count=count)
+        age_seconds = np.fromiter(((now - row[2]).total_seconds() for row in rows), dtype=np.float64, count=count)
+        age_hours = np.maximum(age_seconds / 3600, 0)
+        likes = np.fromiter((row[3] or 0 for row in rows), dtype=np.float64, count=count)
+
+        velocity = np.zeros(count)
+        if count:
+            cutoff = now - timedelta(seconds=self.config['RANKED_FEED_VELOCITY_WINDOW'])
+            # One short range of the covering (post_id, created_at) index per
+            # candidate; likes of older posts are never read
+            recent = session.execute(
+                select(PostLike.post_id, func.count()).where(
+                    PostLike.post_id.in_(post_ids.tolist()), PostLike.created_at >= cutoff
+                ).group_by(PostLike.post_id)
+            ).all()
+            if recent:
+                velocity = lookup(post_ids, *np.array(recent, dtype=np.int64).T)
+
+        return Features(post_ids, author_ids, age_hours, likes, velocity, np.zeros(count))
+
+    def affinity(self, session, viewer_id, author_ids):
+        """The share of the viewer's recent likes that went to each of ``author_ids``."""
+        if not len(author_ids) or not viewer_id:
+            return np.zeros(len(author_ids))
+        Post, PostLike = self.Post, self.PostLike
+        recent = select(PostLike.post_id).where(PostLike.user_id == viewer_id).order_by(
+            PostLike.created_at.desc()
+        ).limit(self.config['RANKED_FEED_AFFINITY_LIKES']).subquery()
+        by_author = session.execute(
+            select(Post.author_id, func.count()).join(recent, recent.c.post_id == Post.id).group_by(Post.author_id)
+        ).all()
+        if not by_author:
+            return np.zeros(len(author_ids))
+        authors, liked = np.array(by_author, dtype=np.int64).T
+        return lookup(author_ids, authors, liked) / liked.sum()
+
+    # Ranking
+
+    def score(self, features):
+        return SCORERS[self.config['RANKED_FEED_SCORER']](features, self.config['RANKED_FEED_WEIGHTS'])
+
+    def rank(self, session, viewer_id, now=None, candidates=None):
+        """Candidate post ids, best first."""
+        features = self.features(session, viewer_id, now or datetime.utcnow(), candidates)
+        scores = self.score(features)
+        # Stable on ties: the newer post (earlier candidate) first
+        return features.post_ids[np.argsort(-scores, kind='stable')].tolist()
+
+    def bucket(self):
+        return int(time.time() // self.config['RANKED_FEED_CACHE_TTL'])
+
+    def ranking(self, session, viewer_id, bucket=None):
+        """``(bucket, post ids)``: the cached ranking of ``bucket`` (default:
+        the current one), else a new ranking for the current bucket.
+
+        Raises ``PaginationError`` for an older bucket no longer cached: its
+        offsets don't apply to a new ranking.
+        """
+        if np is None:
+            raise RankingUnavailable('sort=ranked needs NumPy on the server')
+        current = self.bucket()
+        if bucket is None:
+            bucket = current
+        ranked = self.rankings.get((viewer_id, bucket))
+        if ranked is not None:
+            return bucket, ranked
+        if bucket != current:
+            raise PaginationError('Cursor has expired; reload the feed')
+        ends_at = (current + 1) * self.config['RANKED_FEED_CACHE_TTL']
+        candidates = self.shared.get(current)
+        if candidates is None:
+            candidates = self.candidates(session, datetime.utcnow())
+            self.shared.set(current, candidates, ends_at)
+        ranked = self.rank(session, viewer_id, candidates=candidates)
+        self.rankings.set((viewer_id, current), ranked, ends_at + RANKING_GRACE)
+        return current, ranked
+
+    def page(self, session, viewer_id, cursor=None, limit=None):
+        """``(post ids, next_cursor)``; every candidate when ``limit`` is None."""
+        bucket, offset = decode_rank_cursor(cursor) if cursor else (None, 0)
+        bucket, ranked = self.ranking(session, viewer_id, bucket)
+        if limit is None:
+            return ranked, None
+        end = offset + limit
+        return ranked[offset:end], encode_rank_cursor(bucket, end) if end < len(ranked) else None
+
+    def forget(self, viewer_id):
+        """Drop the viewer's current ranking, e.g. after they post. The shared
+        candidates go too, so theirs includes the new post."""
+        bucket = self.bucket()
+        self.rankings.pop((viewer_id, bucket))
+        self.shared.pop(bucket)
+
+    def clear(self):
+        self.rankings.clear()
+        self.shared.clear()
+
+
+def lookup(keys, known_keys, counts):
+    """``counts`` (one per ``known_keys``) as an array aligned with ``keys``; 0 where missing."""
+    if not len(known_keys):
+        return np.zeros(len(keys))
+    order = np.argsort(known_keys)
+    known_keys, counts = known_keys[order], counts[order].astype(np.float64)
+    index = np.minimum(np.searchsorted(known_keys, keys), len(known_keys) - 1)
+    return np.where(known_keys[index] == keys, counts[index], 0.0)
@@ -0,0 +1,248 @@
+"""Per-client rate limits and admission control.
+
+Rate limits are token buckets, one per budget and client:
+
+    @rate_limiter.limit('search')
+
+``RATE_LIMITS`` maps each budget to ``(capacity, period)``: a client may
+burst ``capacity`` requests and is then refilled at ``capacity`` per
+``period`` seconds. The client is the bearer token's user
+(``user:<id>``), or the remote address for anonymous requests
+(``ip:<addr>``; put the app behind ``ProxyFix`` if a proxy forwards
+them). A request over budget gets 429 with ``Retry-After``, the seconds
+until a token is back.
+
+Buckets live in a store chosen with ``RATE_LIMIT_BACKEND``:
+
+* ``memory``: a dict per worker process, so each worker enforces the
+  budget separately.
+* ``sqlite``: one SQLite file (``RATE_LIMIT_SQLITE_PATH``) that every
+  worker on the host shares. It is not the app's database, so limiting
+  adds no load there.
+
+Admission control caps the requests one worker has in flight at
+``ADMISSION_MAX_IN_FLIGHT`` (0 turns it off). Past the cap, requests are
+answered 503 with ``Retry-After`` at once instead of queueing for threads
+and pool connections. Under gunicorn's threaded worker only ``threads``
+requests reach the app at once, so ``RecyclingThreadWorker``
+(gunicorn_workers.py) applies the cap to the requests it has queued
+instead; the check here covers servers that hand the app every request,
+such as uvicorn.
+"""
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from flask import g, jsonify, request
+
+BUCKET_STORES = {}
+# The memory store drops idle buckets once it holds this many keys
+MEMORY_STORE_MAX_KEYS = 100_000
+# The SQLite store deletes idle rows once every this many takes
+SQLITE_PRUNE_EVERY = 10_000
+
+
+def bucket_store(name):
+    """Register a store class under ``name`` for ``RATE_LIMIT_BACKEND``."""
+    def register(cls):
+        BUCKET_STORES[name] = cls
+        return cls
+    return register
+
+
+def client_key(viewer_id, remote_addr):
+    return f'user:{viewer_id}' if viewer_id else f'ip:{remote_addr}'
+
+
+def retry_after(seconds):
+    """``Retry-After`` value: whole seconds, at least 1."""
+    return str(max(1, math.ceil(seconds)))
+
+
+def refill(tokens, updated, now, capacity, rate):
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+@bucket_store('memory')
+class MemoryBucketStore:
+    """Buckets in a dict; per process."""
+
+    def __init__(self, config):
+        self.max_period = max(period for _, period in config['RATE_LIMITS'].values())
+        self._buckets = {}  # key -> (tokens, updated)
+        self._prune_at = MEMORY_STORE_MAX_KEYS
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        """Spend a token from ``key``'s bucket; returns 0, or the seconds
+        until a token is available."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated, now, capacity, rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            if len(self._buckets) > self._prune_at:
+                self._prune(now)
+            return wait
+
+    def _prune(self, now):
+        # A bucket idle for a whole period is full again, the same as a missing one
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= self.max_period]:
+            del self._buckets[key]
+        self._prune_at = max(MEMORY_STORE_MAX_KEYS, 2 * len(self._buckets))
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+@bucket_store('sqlite')
+class SQLiteBucketStore:
+    """Buckets in a SQLite file shared by the workers on one host."""
+
+    def __init__(self, config):
+        self.path = config['RATE_LIMIT_SQLITE_PATH']
+        self.max_period = max(period for _, period in config['RATE_LIMITS'].values())
+        self._local = threading.local()
+        self._takes = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # One connection per thread, and new ones after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Losing the last few buckets in a crash only forgives some requests
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit_buckets '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, rate, now):
+        conn = self._connection()
+        # IMMEDIATE: the write lock from the start, so two workers can't both
+        # spend the last token
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)).fetchone()
+            tokens = refill(*row, now, capacity, rate) if row else capacity
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            conn.execute(
+                'INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                (key, tokens - 1 if not wait else tokens, now)
+            )
+            with self._lock:
+                self._takes += 1
+                prune = self._takes % SQLITE_PRUNE_EVERY == 0
+            if prune:
+                conn.execute('DELETE FROM rate_limit_buckets WHERE updated < ?', (now - self.max_period,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def clear(self):
+        self._connection().execute('DELETE FROM rate_limit_buckets')
+
+
+class RateLimiter:
+    """Flask extension for per-client token buckets and the in-flight cap."""
+
+    def __init__(self, app=None):
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMITS', {
+            'login': (10, 60),
+            'register': (5, 3600),
+            'create_post': (30, 60),
+            'toggle_like': (120, 60),
+            'search': (60, 60),
+        })
+        app.config.setdefault('RATE_LIMIT_BACKEND', 'memory')
+        app.config.setdefault('RATE_LIMIT_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'rate_limits.db'))
+        app.config.setdefault('ADMISSION_MAX_IN_FLIGHT', 64)
+        app.config.setdefault('ADMISSION_RETRY_AFTER', 1)
+        if app.config['RATE_LIMIT_BACKEND'] not in BUCKET_STORES:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND {app.config['RATE_LIMIT_BACKEND']!r}")
+        self.config = app.config
+        self.store = BUCKET_STORES[app.config['RATE_LIMIT_BACKEND']](app.config)
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+        app.extensions['rate_limiter'] = self
+
+    def _reset(self):
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    # Rate limits
+
+    def check(self, budget, client):
+        """Spend one request of ``budget`` for ``client``; returns 0, or the
+        seconds to wait when it is spent."""
+        if not self.config['RATE_LIMIT_ENABLED']:
+            return 0
+        capacity, period = self.config['RATE_LIMITS'][budget]
+        return self.store.take(f'{budget}:{client}', capacity, capacity / period, time.time())
+
+    def limit(self, budget):
+        """Decorate a view to spend from ``budget``, a key of ``RATE_LIMITS``."""
+        def decorate(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                wait = self.check(budget, client_key(g.get('viewer_id'), request.remote_addr))
+                if wait:
+                    return jsonify({'message': 'Too many requests, please retry later'}), 429, {
+                        'Retry-After': retry_after(wait)
+                    }
+                return view(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def clear(self):
+        self.store.clear()
+
+    # Admission control
+
+    def enter(self):
+        """Count a request in; False when the worker is at its cap."""
+        limit = self.config['ADMISSION_MAX_IN_FLIGHT']
+        with self._lock:
+            if limit and self._in_flight >= limit:
+                return False
+            self._in_flight += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def in_flight(self):
+        return self._in_flight
+
+    def _admit(self):
+        if request.method == 'OPTIONS':
+            return None
+        if not self.enter():
+            return jsonify({'message': 'Server busy, please retry'}), 503, {
+                'Retry-After': retry_after(self.config['ADMISSION_RETRY_AFTER'])
+            }
+        g.admitted = True
+
+    def _release(self, exc=None):
+        if g.pop('admitted', False):
+            self.leave()
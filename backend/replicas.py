@@ -0,0 +1,237 @@
+"""Read replicas: GET views read from replicas, writes go to the primary.
+
+Views that only read are marked, directly under the route:
+
+    @posts_bp.route('', methods=['GET'])
+    @read_replicas.read_only
+    @conditional_requests.conditional(versions.feed)
+
+``db.session`` (``RoutingSession``) sends their statements to one of
+``READ_REPLICA_URIS``, taken round-robin among the healthy ones. Every other
+request, and anything a read-only view flushes or writes, uses
+``SQLALCHEMY_DATABASE_URI``. Without replicas everything reads the primary.
+
+A thread probes each replica every ``READ_REPLICA_HEALTH_INTERVAL`` seconds.
+It checks that the replica is reachable and has every schema migration this
+code expects. A replica that fails, or whose connection errors during a
+request, gets no reads until a probe passes again. With none healthy, reads
+go to the primary.
+
+Read-your-writes: responses of views decorated with ``@read_replicas.writes``
+carry an ``X-Read-Your-Writes`` header, a pin signed with ``SECRET_KEY``
+that names the user and expires after ``READ_REPLICA_PIN_SECONDS``. A client
+that sends it back reads from the primary until then, on any worker,
+skipping the replicas (which may not have the write yet) and the response
+cache (which may hold a copy read from one). The window is also taken as the
+longest replication lag: responses read from a replica are not cached while
+one of their tags was invalidated within it.
+
+Views can keep some requests on the primary, e.g. ``?since=`` deltas, whose
+cursors must not run ahead of the database they are checked against:
+
+    @read_replicas.read_only(primary_when=lambda args: 'since' in args)
+
+SQLite file copies stand in for replicas locally:
+
+    cp linkedin_clone.db replica1.db
+    DATABASE_REPLICA_URLS=sqlite:////abs/path/replica1.db python app.py
+"""
+import itertools
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, make_response, request
+from flask_sqlalchemy.session import Session
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import create_engine, event, func, make_url, select
+from sqlalchemy.exc import OperationalError
+
+from migrations import MIGRATIONS, version_table
+
+# Response header carrying the read-your-writes pin; clients send it back
+PIN_HEADER = 'X-Read-Your-Writes'
+
+
+class RoutingSession(Session):
+    """``db.session`` class; statements of a read-only request go to its replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = g.get('read_replica') if has_app_context() else None
+        # Flushes and INSERT/UPDATE/DELETE always go to the primary
+        if replica is not None and bind is None and not self._flushing and not getattr(clause, 'is_dml', False):
+            return current_app.extensions['read_replicas'].engine(replica)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReadReplicas:
+    """Flask extension routing read-only views to replica databases."""
+
+    def __init__(self, app=None):
+        # Wall clock: pins are checked by every worker, not just the one that signed them
+        self.clock = time.time
+        self._reset()
+        # A forked worker opens its own replica connections and health thread
+        os.register_at_fork(after_in_child=self._reset)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('READ_REPLICA_URIS', [])
+        app.config.setdefault('READ_REPLICA_HEALTH_INTERVAL', 5)
+        app.config.setdefault('READ_REPLICA_PIN_SECONDS', 5)
+        self.app, self.config = app, app.config
+        self.signer = URLSafeSerializer(app.config['SECRET_KEY'], salt='read-your-writes')
+        app.extensions['read_replicas'] = self
+
+    def _reset(self):
+        engines = getattr(self, '_engines', None) or []
+        for engine in engines:
+            engine.dispose(close=False)
+        self._engines = None  # built from READ_REPLICA_URIS on first use
+        self._healthy = []
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # Engines
+
+    def engines(self):
+        if self._engines is None:
+            with self._lock:
+                if self._engines is None:
+                    engines = [self._make_engine(index, uri)
+                               for index, uri in enumerate(self.config['READ_REPLICA_URIS'])]
+                    # Up until the first probe says otherwise
+                    self._healthy = list(range(len(engines)))
+                    self._engines = engines
+        return self._engines
+
+    def engine(self, index):
+        return self.engines()[index]
+
+    def _make_engine(self, index, uri):
+        url = make_url(uri)
+        if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:' \
+                and not os.path.isabs(url.database):
+            # Relative to instance/, like Flask-SQLAlchemy does for the primary
+            url = url.set(database=os.path.join(self.app.instance_path, url.database))
+        engine = create_engine(url, **self.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+
+        @event.listens_for(engine, 'handle_error')
+        def failed(context):
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+                self._mark_down(index, context.original_exception)
+        return engine
+
+    # Health
+
+    def check(self):
+        """Probe every replica now; returns the indexes of the healthy ones."""
+        expected = MIGRATIONS[-1].version if MIGRATIONS else 0
+        healthy = []
+        for index, engine in enumerate(self.engines()):
+            try:
+                with engine.connect() as conn:
+                    version = conn.execute(select(func.max(version_table.c.version))).scalar()
+            except Exception as e:
+                self._mark_down(index, e)
+                continue
+            if (version or 0) < expected:
+                self._mark_down(index, f'schema at {version}, expected {expected}')
+                continue
+            if index not in self._healthy:
+                print(f"Read replica {index} is back")
+            healthy.append(index)
+        self._healthy = healthy
+        return healthy
+
+    def _mark_down(self, index, reason):
+        with self._lock:
+            if index in self._healthy:
+                print(f"Read replica {index} unavailable: {reason}")
+                self._healthy = [i for i in self._healthy if i != index]
+
+    def healthy(self):
+        return list(self._healthy)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='replica-health', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.config['READ_REPLICA_HEALTH_INTERVAL'])
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Read replica check error: {e}")
+
+    # Routing
+
+    def pick(self):
+        """The next healthy replica's index; None for the primary."""
+        if not self.config['READ_REPLICA_URIS']:
+            return None
+        self.engines()
+        self._ensure_thread()
+        healthy = self._healthy
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def pin(self, user_id):
+        """A signed pin keeping ``user_id``'s reads on the primary for
+        ``READ_REPLICA_PIN_SECONDS``."""
+        return self.signer.dumps({'user': user_id, 'until': self.clock() + self.config['READ_REPLICA_PIN_SECONDS']})
+
+    def pinned(self, user_id, pin):
+        """Whether ``pin`` (the header value) still holds for ``user_id``."""
+        if not user_id or not pin:
+            return False
+        try:
+            pin = self.signer.loads(pin)
+        except BadSignature:
+            return False
+        return pin.get('user') == user_id and pin.get('until', 0) > self.clock()
+
+    def read_only(self, view=None, primary_when=None):
+        """Decorate a GET view whose queries may read a replica; requests for
+        which ``primary_when(request.args)`` is true stay on the primary."""
+        def decorate(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.pinned(g.get('viewer_id'), request.headers.get(PIN_HEADER)):
+                    g.read_your_writes = True
+                elif primary_when is None or not primary_when(request.args):
+                    g.read_replica = self.pick()
+                return view(*args, **kwargs)
+            return wrapper
+        return decorate(view) if view is not None else decorate
+
+    def writes(self, view):
+        """Decorate a write view; its response pins the user to the primary."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            rv = view(*args, **kwargs)
+            user_id = g.get('viewer_id')
+            if not user_id or not self.config['READ_REPLICA_URIS']:
+                return rv
+            response = make_response(rv)
+            if response.status_code < 400:
+                response.headers[PIN_HEADER] = self.pin(user_id)
+            return response
+        return wrapper
+
+    def clear(self):
+        """Drop the replica engines; the next read rebuilds them from config."""
+        with self._lock:
+            engines, self._engines = self._engines or [], None
+            self._healthy = []
+            self._turn = itertools.count()
+        for engine in engines:
+            engine.dispose()
@@ -0,0 +1,201 @@
+"""In-process cache for public GET responses.
+
+Entries are keyed by path + query string + viewer (or ``anon`` for views
+that don't depend on who is asking) and bounded three ways: a TTL, an LRU
+entry count and a total byte budget.
+
+Invalidation is tag-based. While a cached view runs, it (and the serializers
+it calls) attach tags describing what the response shows, e.g. ``post:12``
+or ``profile:3``. Write paths then invalidate exactly those tags:
+
+    response_cache.invalidate(f'post:{post_id}')
+
+With read replicas, a response read from one is not stored while any of its
+tags was invalidated within ``READ_REPLICA_PIN_SECONDS``: the replica may not
+have the write yet, and the entry would outlive the lag.
+
+Each worker process has its own cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, make_response, request
+
+from viewer import current_viewer_id
+
+
+class CacheEntry:
+    __slots__ = ('body', 'status', 'mimetype', 'expires_at', 'tags', 'version')
+
+    def __init__(self, body, status, mimetype, expires_at, tags, version=None):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.expires_at = expires_at
+        self.tags = tags
+        self.version = version  # conditional.Version the body was built from
+
+
+class ResponseCache:
+    """Flask extension; decorate views with ``@response_cache.cached()``."""
+
+    def __init__(self, app=None, viewer_loader=current_viewer_id):
+        self.viewer_loader = viewer_loader
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._generation = 0
+        self._invalidated = {}  # tag -> monotonic() of its last invalidation, with replicas
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 30)
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRY_BYTES', 1024 * 1024)
+        self.config = app.config
+        app.extensions['response_cache'] = self
+
+    # Tagging and invalidation
+
+    def tag(self, *tags):
+        """Attach tags to the response the current request is building."""
+        if 'cache_tags' in g:
+            g.cache_tags.update(tags)
+
+    def skip(self):
+        """Don't cache the response the current request is building."""
+        g.pop('cache_tags', None)
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self._generation += 1
+            if self.config.get('READ_REPLICA_URIS'):
+                now = time.monotonic()
+                if len(self._invalidated) > self.config['RESPONSE_CACHE_MAX_ENTRIES']:
+                    lag = self.config['READ_REPLICA_PIN_SECONDS']
+                    self._invalidated = {tag: at for tag, at in self._invalidated.items() if now - at < lag}
+                self._invalidated.update((tag, now) for tag in tags)
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._invalidated.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    # Lookup and storage
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry.expires_at < time.monotonic():
+                self._remove(key)
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def _set(self, key, entry, generation):
+        with self._lock:
+            if generation != self._generation:
+                return  # a write landed while this response was being built
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._entries and (len(self._entries) > self.config['RESPONSE_CACHE_MAX_ENTRIES']
+                                     or self._bytes > self.config['RESPONSE_CACHE_MAX_BYTES']):
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def _replica_may_lag(self, tags):
+        """Whether a replica may not have seen the last invalidation of ``tags`` yet."""
+        lag = self.config['READ_REPLICA_PIN_SECONDS']
+        now = time.monotonic()
+        return any(now - self._invalidated.get(tag, -lag) < lag for tag in tags)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes)
+
+    # Decorator
+
+    def cached(self, per_viewer=True, tags=()):
+        """Cache a JSON GET view's 200 responses.
+
+        ``per_viewer`` keys entries by the caller's user id; leave it off for
+        views whose output is the same for everyone. ``tags`` are added to
+        every entry; the view can add more with ``tag()``.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.config['RESPONSE_CACHE_ENABLED']:
+                    return view(*args, **kwargs)
+
+                viewer = self.viewer_loader() if per_viewer else None
+                key = (request.path, request.query_string, viewer or 'anon')
+                # A user who just wrote skips entries that may have been read
+                # from a lagging replica (replicas.py); the fresh result is stored
+                entry = None if g.get('read_your_writes') else self._get(key)
+                if entry is not None:
+                    response = Response(entry.body, status=entry.status, mimetype=entry.mimetype)
+                    response.headers['X-Cache'] = 'HIT'
+                    if entry.version is not None:
+                        # May be older than the database; the ETag must match the body
+                        g.response_version = entry.version
+                    return response
+
+                generation = self._generation
+                g.cache_tags = set(tag.format(**kwargs) for tag in tags)
+                rv = view(*args, **kwargs)
+                response = make_response(rv)
+                if response.is_streamed:
+                    # Never buffered, so never cached; stop collecting tags
+                    self.skip()
+                if 'cache_tags' not in g:
+                    return response
+                response.headers['X-Cache'] = 'MISS'
+
+                if g.get('read_replica') is not None and self._replica_may_lag(g.cache_tags):
+                    return response
+                body = response.get_data()
+                if response.status_code == 200 and len(body) <= self.config['RESPONSE_CACHE_MAX_ENTRY_BYTES']:
+                    self._set(key, CacheEntry(
+                        body, response.status_code, response.mimetype,
+                        time.monotonic() + self.config['RESPONSE_CACHE_TTL'], frozenset(g.cache_tags),
+                        g.get('response_version')
+                    ), generation)
+                return response
+            return wrapper
+        return decorator
@@ -0,0 +1,18 @@
+"""API blueprints.
+
+The view modules are imported by ``register_blueprints``, so importing
+``routes`` (or ``app``) doesn't load them.
+"""
+
+def register_blueprints(app):
+    from routes.auth import auth_bp
+    from routes.connections import connections_bp
+    from routes.posts import posts_bp
+    from routes.search import search_bp
+    from routes.users import users_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(posts_bp, url_prefix='/api/posts')
+    app.register_blueprint(users_bp, url_prefix='/api/users')
+    app.register_blueprint(connections_bp, url_prefix='/api/connections')
+    app.register_blueprint(search_bp, url_prefix='/api')
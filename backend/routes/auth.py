@@ -1,10 +1,18 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-import app
+from flask_jwt_extended import create_access_token
+
+import versions
+from extensions import (
+    db, password_hasher, rate_limiter, read_replicas, response_cache, search_index, viewer_resolver
+)
+from models import User
+from passwords import HasherBusy, PasswordTooLong
+from viewer import current_viewer_id, viewer_required
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limiter.limit('register')
 def register():
     try:
         data = request.get_json()
@@ -14,33 +22,48 @@ def register():
             return jsonify({'message': 'Missing required fields'}), 400
         
         # Check if user already exists
-        existing_user = app.User.query.filter_by(email=data['email']).first()
+        existing_user = User.query.filter_by(email=data['email']).first()
         if existing_user:
             return jsonify({'message': 'Email already registered'}), 400
         
         # Create new user
-        user = app.User(
+        user = User(
             name=data['name'],
             email=data['email'],
-            bio=data.get('bio', '')
+            bio=data.get('bio', ''),
+            job_title=data.get('job_title', ''),
+            location=data.get('location', ''),
+            avatar=data.get('avatar', '')
         )
         user.set_password(data['password'])
         
-        app.db.session.add(user)
-        app.db.session.commit()
+        db.session.add(user)
+        db.session.flush()
+        search_index.update_user(user)
+        db.session.commit()
+        response_cache.invalidate('users')
         
         # Create access token
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=str(user.id))
         
         return jsonify({
             'token': access_token,
-            'user': user.to_dict()
+            'user': user.to_dict(include_counts=True)
         }), 201
         
+    except PasswordTooLong as e:
+        return jsonify({'message': str(e)}), 400
+    except HasherBusy:
+        return jsonify({'message': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
     except Exception as e:
-        return jsonify({'message': 'Registration failed'}), 500
+        print(f"Registration error: {e}")
+        import traceback
+        traceback.print_exc()
+        db.session.rollback()
+        return jsonify({'message': f'Registration failed: {str(e)}'}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limiter.limit('login')
 def login():
     try:
         data = request.get_json()
@@ -50,31 +73,81 @@ def login():
             return jsonify({'message': 'Email and password required'}), 400
         
         # Find user
-        user = app.User.query.filter_by(email=data['email']).first()
+        user = User.query.filter_by(email=data['email']).first()
         
-        if user and user.check_password(data['password']):
-            access_token = create_access_token(identity=user.id)
+        if user is None:
+            # Hash anyway so unknown emails can't be told apart by timing
+            password_hasher.verify(data['password'], None)
+        elif user.check_password(data['password']):
+            db.session.commit()  # persists an upgraded hash, if any
+            access_token = create_access_token(identity=str(user.id))
             return jsonify({
                 'token': access_token,
-                'user': user.to_dict()
+                'user': user.to_dict(include_counts=True)
             }), 200
         
         return jsonify({'message': 'Invalid credentials'}), 401
         
+    except HasherBusy:
+        return jsonify({'message': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
     except Exception as e:
+        print(f"Login error: {e}")
         return jsonify({'message': 'Login failed'}), 500
 
 @auth_bp.route('/profile', methods=['GET'])
-@jwt_required()
+@viewer_required
 def get_profile():
     try:
-        user_id = get_jwt_identity()
-        user = app.User.query.get(user_id)
+        user_id = current_viewer_id()
+        # Checked every time: another worker may have changed the profile
+        row = db.session.execute(versions.profile_statement(user_id)).first()
+        if row is None:
+            return jsonify({'message': 'User not found'}), 404
+        profile = viewer_resolver.profile(user_id, row.updated_at)
+        
+        if profile is None:
+            user = db.session.get(User, user_id)
+            profile = viewer_resolver.remember_profile(user_id, user.updated_at, user.to_dict(include_counts=True))
+        
+        return jsonify(profile), 200
+        
+    except Exception as e:
+        print(f"Profile error: {e}")
+        return jsonify({'message': 'Failed to get profile'}), 500
+
+@auth_bp.route('/profile', methods=['PUT'])
+@viewer_required
+@read_replicas.writes
+def update_profile():
+    try:
+        user_id = current_viewer_id()
+        user = User.query.get(user_id)
         
         if not user:
             return jsonify({'message': 'User not found'}), 404
         
-        return jsonify(user.to_dict()), 200
+        data = request.get_json()
+        
+        # Update allowed fields
+        if 'name' in data:
+            user.name = data['name']
+        if 'bio' in data:
+            user.bio = data['bio']
+        if 'job_title' in data:
+            user.job_title = data['job_title']
+        if 'location' in data:
+            user.location = data['location']
+        if 'avatar' in data:
+            user.avatar = data['avatar']
+        
+        if 'name' in data or 'job_title' in data:
+            search_index.update_user(user)
+        db.session.commit()
+        viewer_resolver.forget_user(user_id)
+        response_cache.invalidate(f'profile:{user_id}', f'author:{user_id}', 'users')
+        
+        return jsonify(user.to_dict(include_counts=True)), 200
         
     except Exception as e:
-        return jsonify({'message': 'Failed to get profile'}), 500
+        print(f"Update profile error: {e}")
+        return jsonify({'message': 'Failed to update profile'}), 500
@@ -0,0 +1,59 @@
+"""Helpers shared by the blueprints."""
+from extensions import db, like_buffer, response_cache
+from models import PostLike, User
+from projection import AUTHOR_FIELDS, POST_COLUMNS, parse_fields
+from ranking import parse_sort
+from timeline import FeedError, parse_feed
+
+# Batched serialization
+#
+# List endpoints serialize many rows at once. Calling to_dict per row lazily
+# loads each author and looks up each like (N+1 queries), so these helpers
+# fetch the same data with a fixed number of queries per list. With a
+# ``fields`` projection they skip the lookups no requested field needs.
+
+def serialize_posts(posts, current_user_id=None, fields=None):
+    if not posts:
+        return []
+    post_ids = [post.id for post in posts]
+    response_cache.tag(*(f'post:{post_id}' for post_id in post_ids),
+                       *(f'author:{post.author_id}' for post in posts))
+    
+    # Authors: one IN query; post.author then resolves from the identity map
+    if fields is None or fields & AUTHOR_FIELDS:
+        missing_authors = {post.author_id for post in posts if 'author' in db.inspect(post).unloaded}
+        if missing_authors:
+            User.query.filter(User.id.in_(missing_authors)).all()
+    
+    # Like counts are columns; only the viewer's likes need a lookup
+    liked_ids = set()
+    if current_user_id and (fields is None or 'liked_by_user' in fields):
+        liked_ids = {post_id for (post_id,) in db.session.query(PostLike.post_id).filter(
+            PostLike.user_id == current_user_id, PostLike.post_id.in_(post_ids)
+        )}
+    
+    result = [post.to_dict(current_user_id, post.id in liked_ids, fields) for post in posts]
+    # Toggles not yet written by the like buffer
+    return like_buffer.overlay(result, current_user_id)
+
+def serialize_users(users, fields=None):
+    response_cache.tag(*(f'profile:{user.id}' for user in users))
+    # posts_count is a maintained column, so no per-user query is needed
+    return [user.to_dict(include_counts=True, fields=fields) for user in users]
+
+def load_in_order(query, model, ids):
+    """Fetch rows by id with one IN query, keeping the order of ``ids``."""
+    if not ids:
+        return []
+    rows = {row.id: row for row in query.filter(model.id.in_(ids)).all()}
+    return [rows[row_id] for row_id in ids if row_id in rows]
+
+def feed_options(args):
+    """``GET /api/posts`` options, shared with async_api.py: ``(fields,
+    network, ranked)``."""
+    fields = parse_fields(args, POST_COLUMNS)
+    network = parse_feed(args) == 'network'
+    ranked = parse_sort(args) == 'ranked'
+    if network and ranked:
+        raise FeedError('feed=network cannot be combined with sort=ranked')
+    return fields, network, ranked
@@ -0,0 +1,172 @@
+from flask import Blueprint, request, jsonify
+from sqlalchemy.exc import IntegrityError
+
+from extensions import connection_graph, db, response_cache, timelines
+from models import Connection, User
+from pagination import PaginationError, is_paginated_request, keyset_page, parse_limit
+from projection import USER_COLUMNS, FieldsError, parse_fields, user_options
+from routes.common import load_in_order, serialize_users
+from viewer import current_viewer_id, viewer_required
+
+connections_bp = Blueprint('connections', __name__)
+
+# Users per GET /api/connections/mutual-counts request
+MAX_MUTUAL_COUNT_IDS = 100
+
+def parse_ids(value):
+    try:
+        ids = [int(part) for part in (value or '').split(',') if part.strip()]
+    except ValueError:
+        raise PaginationError('ids must be comma-separated integers')
+    if len(ids) > MAX_MUTUAL_COUNT_IDS:
+        raise PaginationError(f'At most {MAX_MUTUAL_COUNT_IDS} ids per request')
+    return ids
+
+@connections_bp.route('/<int:user_id>', methods=['GET'])
+def get_connections(user_id):
+    try:
+        if not db.session.get(User, user_id):
+            return jsonify({'message': 'User not found'}), 404
+        fields = parse_fields(request.args, USER_COLUMNS)
+        
+        # Newest first, read from the covering (user_id, created_at, id, connection_id) index
+        query = db.session.query(Connection.id, Connection.created_at, Connection.connection_id).filter(
+            Connection.user_id == user_id
+        )
+        users_query = User.query.options(*user_options(fields))
+        
+        if not is_paginated_request(request.args):
+            rows = query.order_by(Connection.created_at.desc(), Connection.id.desc()).all()
+            users = load_in_order(users_query, User, [row.connection_id for row in rows])
+            return jsonify(serialize_users(users, fields)), 200
+        
+        rows, next_cursor = keyset_page(query, Connection, request.args.get('cursor'),
+                                        parse_limit(request.args.get('limit')))
+        users = load_in_order(users_query, User, [row.connection_id for row in rows])
+        return jsonify({
+            'connections': serialize_users(users, fields),
+            'next_cursor': next_cursor
+        }), 200
+    except (PaginationError, FieldsError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Get connections error: {e}")
+        return jsonify({'message': 'Failed to fetch connections'}), 500
+
+@connections_bp.route('/<int:user_id>', methods=['POST'])
+@viewer_required
+def connect(user_id):
+    try:
+        viewer_id = current_viewer_id()
+        
+        if user_id == viewer_id:
+            return jsonify({'message': 'Cannot connect to yourself'}), 400
+        if not db.session.get(User, user_id):
+            return jsonify({'message': 'User not found'}), 404
+        
+        if Connection.query.filter_by(user_id=viewer_id, connection_id=user_id).first():
+            return jsonify({'connected': True}), 200
+        
+        # Both directions, so either user's list is one index range
+        db.session.add_all([
+            Connection(user_id=viewer_id, connection_id=user_id),
+            Connection(user_id=user_id, connection_id=viewer_id)
+        ])
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request connected them between the check and the insert
+            db.session.rollback()
+            return jsonify({'connected': True}), 200
+        connection_graph.connected(viewer_id, user_id)
+        timelines.network_changed(viewer_id, user_id)
+        response_cache.invalidate(f'network:{viewer_id}', f'network:{user_id}')
+        
+        return jsonify({'connected': True}), 201
+        
+    except Exception as e:
+        print(f"Connect error: {e}")
+        db.session.rollback()
+        return jsonify({'message': 'Failed to connect'}), 500
+
+@connections_bp.route('/<int:user_id>', methods=['DELETE'])
+@viewer_required
+def disconnect(user_id):
+    try:
+        viewer_id = current_viewer_id()
+        
+        deleted = Connection.query.filter(db.or_(
+            db.and_(Connection.user_id == viewer_id, Connection.connection_id == user_id),
+            db.and_(Connection.user_id == user_id, Connection.connection_id == viewer_id)
+        )).delete(synchronize_session=False)
+        db.session.commit()
+        connection_graph.disconnected(viewer_id, user_id)
+        if deleted:
+            timelines.network_changed(viewer_id, user_id)
+            response_cache.invalidate(f'network:{viewer_id}', f'network:{user_id}')
+        
+        if not deleted:
+            return jsonify({'message': 'Not connected'}), 404
+        return jsonify({'connected': False}), 200
+        
+    except Exception as e:
+        print(f"Disconnect error: {e}")
+        db.session.rollback()
+        return jsonify({'message': 'Failed to disconnect'}), 500
+
+@connections_bp.route('/<int:user_id>/mutual', methods=['GET'])
+@viewer_required
+def get_mutual_connections(user_id):
+    try:
+        fields = parse_fields(request.args, USER_COLUMNS)
+        limit = parse_limit(request.args.get('limit'))
+        if not db.session.get(User, user_id):
+            return jsonify({'message': 'User not found'}), 404
+        
+        mutual = connection_graph.mutual(current_viewer_id(), user_id)
+        users = load_in_order(User.query.options(*user_options(fields)), User, mutual[:limit])
+        
+        return jsonify({'count': len(mutual), 'users': serialize_users(users, fields)}), 200
+        
+    except (PaginationError, FieldsError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Get mutual connections error: {e}")
+        return jsonify({'message': 'Failed to fetch mutual connections'}), 500
+
+@connections_bp.route('/mutual-counts', methods=['GET'])
+@viewer_required
+def get_mutual_counts():
+    try:
+        ids = parse_ids(request.args.get('ids'))
+        counts = connection_graph.mutual_counts(current_viewer_id(), ids)
+        return jsonify({'counts': {str(user_id): count for user_id, count in counts.items()}}), 200
+    except PaginationError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Get mutual counts error: {e}")
+        return jsonify({'message': 'Failed to count mutual connections'}), 500
+
+@connections_bp.route('/suggestions', methods=['GET'])
+@viewer_required
+def get_suggestions():
+    """People you may know: 2nd-degree connections, most shared connections first."""
+    try:
+        fields = parse_fields(request.args, USER_COLUMNS)
+        limit = parse_limit(request.args.get('limit'))
+        
+        suggestions = connection_graph.suggestions(current_viewer_id(), limit)
+        shared = dict(suggestions)
+        users = load_in_order(User.query.options(*user_options(fields)), User,
+                              [user_id for user_id, _ in suggestions])
+        
+        result = serialize_users(users, fields)
+        for user in result:
+            user['mutual_connections'] = shared[user['id']]
+        return jsonify({'suggestions': result}), 200
+        
+    except (PaginationError, FieldsError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Get suggestions error: {e}")
+        return jsonify({'message': 'Failed to fetch suggestions'}), 500
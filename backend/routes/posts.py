@@ -1,48 +1,335 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
-from sqlalchemy import desc
+
+import versions
+from changes import LIKES_FIELDS, ChangesExpired, delta, fold
+from extensions import (
+    change_log, conditional_requests, db, like_buffer, ranked_feed, rate_limiter, read_replicas,
+    response_cache, search_index, timelines, trending, viewer_resolver
+)
+from models import Connection, Post, PostLike, adjust_posts_count
+from pagination import (
+    PaginationError, decode_cursor, entries_page, is_paginated_request, keyset_page, parse_limit
+)
+from projection import POST_COLUMNS, FieldsError, parse_fields, post_options
+from ranking import RankingUnavailable, SortError
+from routes.common import feed_options, load_in_order, serialize_posts
+from streaming import StreamFormatError, stream_format, streamed_response
+from timeline import FeedError, in_network
+from trending import TrendingWindowError
+from viewer import current_viewer_id, viewer_required
 
 posts_bp = Blueprint('posts', __name__)
 
+def changes_since(since, current_user_id):
+    """The ``?since=`` delta (see changes.py)."""
+    after, changes, has_more = change_log.read(since)
+    created, deleted, liked = fold(changes)
+    posts = Post.query.options(*post_options()).filter(Post.id.in_(created)).order_by(
+        Post.created_at.desc(), Post.id.desc()
+    ).all()
+    likes = load_in_order(Post.query.options(*post_options(LIKES_FIELDS)), Post, liked)
+    return delta(
+        serialize_posts(posts, current_user_id),
+        deleted,
+        serialize_posts(likes, current_user_id, LIKES_FIELDS),
+        changes[-1].id if changes else after,
+        has_more
+    )
+
+def ranked_posts(current_user_id, fields):
+    """The ``?sort=ranked`` list or page (see ranking.py)."""
+    limit = parse_limit(request.args.get('limit')) if is_paginated_request(request.args) else None
+    post_ids, next_cursor = ranked_feed.page(db.session, current_user_id, request.args.get('cursor'), limit)
+    posts = serialize_posts(
+        load_in_order(Post.query.options(*post_options(fields)), Post, post_ids), current_user_id, fields
+    )
+    if limit is None:
+        return posts
+    return {'posts': posts, 'next_cursor': next_cursor}
+
 @posts_bp.route('', methods=['GET'])
+# Deltas read the primary: a cursor from it may be ahead of a replica
+@read_replicas.read_only(primary_when=lambda args: 'since' in args)
+@conditional_requests.conditional(versions.feed)
+@response_cache.cached()
 def get_all_posts():
-    from app import Post  # Lazy import
     try:
-        posts = Post.query.order_by(desc(Post.created_at)).all()
-        return jsonify([post.to_dict() for post in posts]), 200
+        current_user_id = current_viewer_id()
+        since = request.args.get('since')
+        if since is not None:
+            # Deltas are small and per cursor; not worth caching
+            response_cache.skip()
+            return jsonify(changes_since(since, current_user_id)), 200
+        
+        fields, network, ranked = feed_options(request.args)
+        if network and not current_user_id:
+            return jsonify({'message': 'Log in to see your network feed'}), 401
+        if ranked:
+            # Cached per viewer by the ranked feed itself
+            response_cache.skip()
+            return jsonify(ranked_posts(current_user_id, fields)), 200
+        
+        query = Post.query.options(*post_options(fields))
+        if network:
+            query = query.filter(in_network(Post, Connection, current_user_id))
+            # Connecting and disconnecting change whose posts it shows
+            response_cache.tag(f'network:{current_user_id}')
+        if request.args.get('cursor'):
+            # Few requests share a cursor, so these would only push the
+            # first pages out of the cache
+            response_cache.skip()
+        else:
+            # New posts land at the head
+            response_cache.tag('feed')
+        
+        if not is_paginated_request(request.args):
+            # Compatibility mode: clients that don't page get the full list
+            query = query.order_by(Post.created_at.desc(), Post.id.desc())
+            stream = stream_format(request.args)
+            if stream:
+                return streamed_response(
+                    query, lambda posts: serialize_posts(posts, current_user_id, fields), stream
+                )
+            return jsonify(serialize_posts(query.all(), current_user_id, fields)), 200
+        
+        cursor = request.args.get('cursor')
+        limit = parse_limit(request.args.get('limit'))
+        before = decode_cursor(cursor) if cursor else None
+        if network:
+            entries = timelines.home(current_user_id, before, limit + 1)
+        else:
+            entries = timelines.public(before, limit + 1)
+        if entries is None:
+            # Paged past the materialized window; fall back to the index scan
+            posts, next_cursor = keyset_page(query, Post, cursor, limit)
+        else:
+            entries, next_cursor = entries_page(entries, limit)
+            posts = load_in_order(query, Post, [post_id for _, post_id in entries])
+        return jsonify({
+            'posts': serialize_posts(posts, current_user_id, fields),
+            'next_cursor': next_cursor
+        }), 200
+    except (PaginationError, StreamFormatError, FieldsError, SortError, FeedError) as e:
+        return jsonify({'message': str(e)}), 400
+    except ChangesExpired as e:
+        return jsonify({'message': str(e)}), 410
+    except RankingUnavailable as e:
+        return jsonify({'message': str(e)}), 501
     except Exception as e:
+        print(f"Get posts error: {e}")
         return jsonify({'message': 'Failed to fetch posts'}), 500
 
 @posts_bp.route('', methods=['POST'])
-@jwt_required()
+@viewer_required
+@rate_limiter.limit('create_post')
+@read_replicas.writes
 def create_post():
-    from app import Post  # Lazy import
     try:
         data = request.get_json()
-        user_id = get_jwt_identity()
-
+        # Get user ID from JWT token
+        user_id = current_viewer_id()
+        
         if not data.get('content'):
             return jsonify({'message': 'Content is required'}), 400
-
+        
         post = Post(
             content=data['content'],
             author_id=user_id
         )
-
+        
         db.session.add(post)
+        db.session.flush()
+        search_index.add_post(post)
+        adjust_posts_count(user_id, 1)
+        change_log.record('created', [post.id])
         db.session.commit()
+        
+        timelines.post_created(post)
+        ranked_feed.forget(user_id)
+        viewer_resolver.forget_user(user_id)
+        response_cache.invalidate('feed', f'feed:{user_id}', f'profile:{user_id}')
+        
+        return jsonify(post.to_dict(user_id, liked_by_user=False)), 201
+        
+    except Exception as e:
+        print(f"Create post error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'message': f'Failed to create post: {str(e)}'}), 500
 
-        return jsonify(post.to_dict()), 201
+@posts_bp.route('/trending', methods=['GET'])
+def get_trending_posts():
+    """Most liked posts over the last hour or day (see trending.py)."""
+    try:
+        current_user_id = current_viewer_id()
+        window = trending.parse_window(request.args)
+        fields = parse_fields(request.args, POST_COLUMNS)
+        limit = parse_limit(request.args.get('limit'))
+        
+        ranked = trending.top(window)
+        likes = dict(ranked)
+        post_ids = [post_id for post_id, _ in ranked]
+        query = Post.query.options(*post_options(fields))
+        # Deleted posts keep their persisted counts until the buckets age
+        # out, so skip past them
+        posts = []
+        while post_ids and len(posts) < limit:
+            batch, post_ids = post_ids[:limit - len(posts)], post_ids[limit - len(posts):]
+            posts += load_in_order(query, Post, batch)
+        
+        result = serialize_posts(posts, current_user_id, fields)
+        for post in result:
+            post['trending_likes'] = likes[post['id']]
+        return jsonify({'window': window, 'posts': result}), 200
+        
+    except (PaginationError, FieldsError, TrendingWindowError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Get trending posts error: {e}")
+        return jsonify({'message': 'Failed to fetch trending posts'}), 500
 
+@posts_bp.route('/<int:post_id>/like', methods=['POST'])
+@viewer_required
+@rate_limiter.limit('toggle_like')
+@read_replicas.writes
+def toggle_like_post(post_id):
+    try:
+        # Get user ID from JWT token
+        user_id = current_viewer_id()
+        post = Post.query.get(post_id)
+        
+        if not post:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        # Buffered: coalesced with other toggles and written in a batch
+        liked = like_buffer.toggle(user_id, post_id)
+        response_cache.invalidate(f'post:{post_id}')
+        
+        # Stored likes_count plus whatever is still pending (an inline flush
+        # commits this session, so the post is reloaded)
+        updated_post = like_buffer.overlay([post.to_dict(user_id, liked_by_user=liked)], user_id)[0]
+        
+        return jsonify({
+            'post': updated_post,
+            'liked': liked,
+            'likes_count': updated_post.get('likes_count', 0),
+            'liked_by_user': updated_post.get('liked_by_user', False)
+        }), 200
+        
     except Exception as e:
-        return jsonify({'message': 'Failed to create post'}), 500
+        print(f"Toggle like error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'message': f'Failed to toggle like: {str(e)}'}), 500
 
 @posts_bp.route('/user/<int:user_id>', methods=['GET'])
+@read_replicas.read_only
+@conditional_requests.conditional(versions.author_feed)
+@response_cache.cached()
 def get_user_posts(user_id):
-    from app import Post  # Lazy import
     try:
-        posts = Post.query.filter_by(author_id=user_id).order_by(desc(Post.created_at)).all()
-        return jsonify([post.to_dict() for post in posts]), 200
+        current_user_id = current_viewer_id()
+        fields = parse_fields(request.args, POST_COLUMNS)
+        
+        query = Post.query.options(*post_options(fields)).filter_by(author_id=user_id)
+        if request.args.get('cursor'):
+            response_cache.skip()
+        else:
+            response_cache.tag(f'feed:{user_id}')
+        
+        if not is_paginated_request(request.args):
+            # Compatibility mode: clients that don't page get the full list
+            query = query.order_by(Post.created_at.desc(), Post.id.desc())
+            stream = stream_format(request.args)
+            if stream:
+                return streamed_response(
+                    query, lambda posts: serialize_posts(posts, current_user_id, fields), stream
+                )
+            return jsonify(serialize_posts(query.all(), current_user_id, fields)), 200
+        
+        cursor = request.args.get('cursor')
+        limit = parse_limit(request.args.get('limit'))
+        entries = timelines.author(user_id, decode_cursor(cursor) if cursor else None, limit + 1)
+        if entries is None:
+            # Paged past the materialized window; fall back to the index scan
+            posts, next_cursor = keyset_page(query, Post, cursor, limit)
+        else:
+            entries, next_cursor = entries_page(entries, limit)
+            posts = load_in_order(query, Post, [post_id for _, post_id in entries])
+        return jsonify({
+            'posts': serialize_posts(posts, current_user_id, fields),
+            'next_cursor': next_cursor
+        }), 200
+    except (PaginationError, StreamFormatError, FieldsError) as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
+        print(f"Get user posts error: {e}")
         return jsonify({'message': 'Failed to fetch user posts'}), 500
+
+@posts_bp.route('/<int:post_id>', methods=['DELETE'])
+@viewer_required
+@read_replicas.writes
+def delete_post(post_id):
+    try:
+        user_id = current_viewer_id()
+        post = Post.query.get(post_id)
+        
+        if not post:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        if post.author_id != user_id:
+            return jsonify({'message': 'Not authorized to delete this post'}), 403
+        
+        created_at = post.created_at
+        
+        # Bulk-delete likes instead of letting the ORM cascade load them all
+        PostLike.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+        like_buffer.discard_post(post_id)
+        trending.discard_post(post_id)
+        db.session.delete(post)
+        search_index.remove_post(post_id)
+        adjust_posts_count(user_id, -1)
+        change_log.record('deleted', [post_id])
+        db.session.commit()
+        
+        timelines.post_deleted(post_id, user_id, created_at)
+        viewer_resolver.forget_user(user_id)
+        response_cache.invalidate(f'post:{post_id}', f'profile:{user_id}')
+        
+        return jsonify({'message': 'Post deleted successfully'}), 200
+        
+    except Exception as e:
+        print(f"Delete post error: {e}")
+        return jsonify({'message': 'Failed to delete post'}), 500
+
+@posts_bp.route('/search', methods=['GET'])
+@read_replicas.read_only
+@rate_limiter.limit('search')
+def search_posts():
+    try:
+        query = request.args.get('q', '').strip()
+        
+        if not query:
+            return jsonify({'message': 'Search query is required'}), 400
+        
+        fields = parse_fields(request.args, POST_COLUMNS)
+        
+        # Search posts by content or author name, ranked by relevance then recency
+        post_ids = search_index.post_ids(query, limit=20)
+        posts = load_in_order(Post.query.options(*post_options(fields)), Post, post_ids)
+        
+        current_user_id = current_viewer_id()
+        
+        return jsonify({
+            'posts': serialize_posts(posts, current_user_id, fields),
+            'query': query,
+            'count': len(posts)
+        }), 200
+        
+    except FieldsError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Search error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'message': f'Search failed: {str(e)}'}), 500
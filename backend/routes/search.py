@@ -0,0 +1,38 @@
+from flask import Blueprint, request, jsonify
+
+from extensions import rate_limiter, read_replicas, search_index
+from models import Post, User
+from projection import POST_COLUMNS, USER_COLUMNS, FieldsError, parse_fields, post_options, user_options
+from routes.common import load_in_order, serialize_posts, serialize_users
+
+search_bp = Blueprint('search', __name__)
+
+@search_bp.route('/search', methods=['GET'])
+@read_replicas.read_only
+@rate_limiter.limit('search')
+def search():
+    try:
+        query = request.args.get('q', '').strip()
+        user_fields = parse_fields(request.args, USER_COLUMNS, 'user_fields')
+        post_fields = parse_fields(request.args, POST_COLUMNS, 'post_fields')
+        if not query:
+            return jsonify({'users': [], 'posts': []}), 200
+        
+        # Search users by name or job title
+        users = load_in_order(User.query.options(*user_options(user_fields)), User,
+                              search_index.user_ids(query, limit=10))
+        
+        # Search posts by content
+        post_ids = search_index.post_ids(query, limit=10, match_author=False)
+        posts = load_in_order(Post.query.options(*post_options(post_fields)), Post, post_ids)
+        
+        return jsonify({
+            'users': serialize_users(users, user_fields),
+            'posts': serialize_posts(posts, fields=post_fields)
+        }), 200
+        
+    except FieldsError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Search error: {e}")
+        return jsonify({'message': 'Search failed'}), 500
@@ -1,16 +1,45 @@
-from flask import Blueprint, jsonify
-from app import db
+from flask import Blueprint, request, jsonify
+
+import versions
+from extensions import conditional_requests, read_replicas, response_cache
+from models import User
+from projection import USER_COLUMNS, FieldsError, parse_fields, user_options
+from routes.common import serialize_users
+from streaming import StreamFormatError, stream_format, streamed_response
 
 users_bp = Blueprint('users', __name__)
 
 @users_bp.route('/<int:user_id>', methods=['GET'])
+@read_replicas.read_only
+@conditional_requests.conditional(versions.profile, per_viewer=False)
+@response_cache.cached(per_viewer=False, tags=('profile:{user_id}',))
 def get_user(user_id):
-    from app import User  # Lazy import
     try:
         user = User.query.get(user_id)
+        
         if not user:
             return jsonify({'message': 'User not found'}), 404
-        return jsonify(user.to_dict()), 200
+        
+        return jsonify(user.to_dict(include_counts=True)), 200
+        
     except Exception as e:
+        print(f"Get user error: {e}")
         return jsonify({'message': 'Failed to fetch user'}), 500
 
+@users_bp.route('', methods=['GET'])
+@read_replicas.read_only
+@conditional_requests.conditional(versions.users, per_viewer=False)
+@response_cache.cached(per_viewer=False, tags=('users',))
+def get_all_users():
+    try:
+        fields = parse_fields(request.args, USER_COLUMNS)
+        query = User.query.options(*user_options(fields)).order_by(User.name)
+        stream = stream_format(request.args)
+        if stream:
+            return streamed_response(query, lambda users: serialize_users(users, fields), stream)
+        return jsonify(serialize_users(query.all(), fields)), 200
+    except (StreamFormatError, FieldsError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        print(f"Get users error: {e}")
+        return jsonify({'message': 'Failed to fetch users'}), 500
@@ -0,0 +1,312 @@
+"""Full-text search over posts and users.
+
+Replaces the leading-wildcard ``ILIKE '%q%'`` scans with an index that can
+serve the search endpoints directly:
+
+* SQLite: FTS5 virtual tables ``posts_fts(content, author_name)`` and
+  ``users_fts(name, job_title)``, keyed by rowid = ``posts.id`` / ``users.id``
+  and kept in sync from the write paths (same transaction).
+* PostgreSQL: generated ``tsvector`` columns with GIN indexes, which the
+  database keeps in sync on its own.
+
+Queries match word prefixes (``"dev"`` finds "developer") and results are
+ordered by relevance, then by recency. If FTS5 is missing from the SQLite
+build the old ILIKE path is used instead.
+"""
+import re
+
+from flask import current_app
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Only the newest CANDIDATE_LIMIT matches are ranked (per index on Postgres).
+# Without a bound a very common word makes bm25()/ts_rank() score hundreds of
+# thousands of rows per query.
+CANDIDATE_LIMIT = 1000
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+class LikeBackend:
+    """The original ILIKE scans; used as a fallback and as a benchmark baseline."""
+    name = 'like'
+    # (name, table, columns, method) of indexes ``setup`` leaves to a
+    # non-transactional migration, which builds them without blocking writes
+    indexes = ()
+
+    def setup(self, conn):
+        pass
+
+    def teardown(self, conn):
+        pass
+
+    def rebuild(self, conn):
+        pass
+
+    def add_post(self, conn, post_id, content, author_name):
+        pass
+
+    def remove_post(self, conn, post_id):
+        pass
+
+    def update_user(self, conn, user_id, name, job_title):
+        pass
+
+    def post_ids(self, conn, query, limit, match_author=True):
+        pattern = f'%{query}%'
+        where = 'lower(p.content) LIKE lower(:pattern)'
+        if match_author:
+            where += ' OR lower(u.name) LIKE lower(:pattern)'
+        rows = conn.execute(text(
+            'SELECT p.id FROM posts p JOIN users u ON u.id = p.author_id '
+            f'WHERE {where} ORDER BY p.created_at DESC, p.id DESC LIMIT :limit'
+        ), {'pattern': pattern, 'limit': limit})
+        return [row[0] for row in rows]
+
+    def user_ids(self, conn, query, limit):
+        pattern = f'%{query}%'
+        rows = conn.execute(text(
+            'SELECT id FROM users WHERE lower(name) LIKE lower(:pattern) '
+            'OR lower(job_title) LIKE lower(:pattern) '
+            'ORDER BY created_at DESC, id DESC LIMIT :limit'
+        ), {'pattern': pattern, 'limit': limit})
+        return [row[0] for row in rows]
+
+
+class SqliteFtsBackend(LikeBackend):
+    name = 'sqlite-fts5'
+
+    def setup(self, conn):
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'"
+        )).first()
+        conn.execute(text(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(content, author_name)'
+        ))
+        conn.execute(text(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(name, job_title)'
+        ))
+        if not exists:
+            self.rebuild(conn)
+
+    def teardown(self, conn):
+        conn.execute(text('DROP TABLE IF EXISTS posts_fts'))
+        conn.execute(text('DROP TABLE IF EXISTS users_fts'))
+
+    def rebuild(self, conn):
+        conn.execute(text('DELETE FROM posts_fts'))
+        conn.execute(text('DELETE FROM users_fts'))
+        conn.execute(text(
+            'INSERT INTO posts_fts (rowid, content, author_name) '
+            'SELECT p.id, p.content, u.name FROM posts p JOIN users u ON u.id = p.author_id'
+        ))
+        conn.execute(text(
+            "INSERT INTO users_fts (rowid, name, job_title) "
+            "SELECT id, name, COALESCE(job_title, '') FROM users"
+        ))
+
+    def add_post(self, conn, post_id, content, author_name):
+        conn.execute(text(
+            'INSERT INTO posts_fts (rowid, content, author_name) VALUES (:id, :content, :author_name)'
+        ), {'id': post_id, 'content': content, 'author_name': author_name})
+
+    def remove_post(self, conn, post_id):
+        conn.execute(text('DELETE FROM posts_fts WHERE rowid = :id'), {'id': post_id})
+
+    def update_user(self, conn, user_id, name, job_title):
+        conn.execute(text('DELETE FROM users_fts WHERE rowid = :id'), {'id': user_id})
+        conn.execute(text(
+            'INSERT INTO users_fts (rowid, name, job_title) VALUES (:id, :name, :job_title)'
+        ), {'id': user_id, 'name': name, 'job_title': job_title or ''})
+        conn.execute(text(
+            'UPDATE posts_fts SET author_name = :name '
+            'WHERE rowid IN (SELECT id FROM posts WHERE author_id = :id)'
+        ), {'id': user_id, 'name': name})
+
+    @staticmethod
+    def match_expression(tokens, column=None):
+        prefix = f'{column} : ' if column else ''
+        return ' AND '.join(f'{prefix}"{token}"*' for token in tokens)
+
+    def post_ids(self, conn, query, limit, match_author=True):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        expression = self.match_expression(tokens, None if match_author else 'content')
+        rows = conn.execute(text(
+            'SELECT hits.id FROM ('
+            'SELECT rowid AS id, bm25(posts_fts) AS score FROM posts_fts '
+            'WHERE posts_fts MATCH :expression ORDER BY rowid DESC LIMIT :candidates'
+            ') hits JOIN posts ON posts.id = hits.id '
+            'ORDER BY hits.score, posts.created_at DESC, posts.id DESC LIMIT :limit'
+        ), {'expression': expression, 'candidates': CANDIDATE_LIMIT, 'limit': limit})
+        return [row[0] for row in rows]
+
+    def user_ids(self, conn, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        rows = conn.execute(text(
+            'SELECT hits.id FROM ('
+            'SELECT rowid AS id, bm25(users_fts) AS score FROM users_fts '
+            'WHERE users_fts MATCH :expression ORDER BY rowid DESC LIMIT :candidates'
+            ') hits JOIN users ON users.id = hits.id '
+            'ORDER BY hits.score, users.created_at DESC, users.id DESC LIMIT :limit'
+        ), {'expression': self.match_expression(tokens), 'candidates': CANDIDATE_LIMIT,
+            'limit': limit})
+        return [row[0] for row in rows]
+
+
+class PostgresFtsBackend(LikeBackend):
+    """Generated tsvector columns + GIN; Postgres keeps them in sync itself."""
+    name = 'postgres'
+    indexes = (
+        ('ix_posts_search_vector', 'posts', 'search_vector', 'gin'),
+        ('ix_users_search_vector', 'users', 'search_vector', 'gin'),
+    )
+
+    def setup(self, conn):
+        conn.execute(text(
+            'ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector '
+            "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED"
+        ))
+        conn.execute(text(
+            'ALTER TABLE users ADD COLUMN IF NOT EXISTS search_vector tsvector '
+            "GENERATED ALWAYS AS (setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(job_title, '')), 'B')) STORED"
+        ))
+
+    @staticmethod
+    def tsquery(tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def post_ids(self, conn, query, limit, match_author=True):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Each branch is served by its own GIN index and, like FTS5, ranks
+        # only its newest CANDIDATE_LIMIT matches; ranks are summed per post
+        author_hits = ''
+        if match_author:
+            author_hits = (
+                'UNION ALL ('
+                'SELECT p.id, ts_rank(u.search_vector, q.q) FROM q, users u '
+                'JOIN posts p ON p.author_id = u.id WHERE u.search_vector @@ q.q '
+                'ORDER BY p.id DESC LIMIT :candidates) '
+            )
+        rows = conn.execute(text(
+            "WITH q AS (SELECT to_tsquery('simple', :tsquery) AS q), hits AS (("
+            'SELECT p.id, ts_rank(p.search_vector, q.q) AS rank FROM q, posts p '
+            'WHERE p.search_vector @@ q.q ORDER BY p.id DESC LIMIT :candidates) '
+            f'{author_hits}) '
+            'SELECT hits.id FROM hits JOIN posts p ON p.id = hits.id '
+            'GROUP BY hits.id, p.created_at '
+            'ORDER BY sum(hits.rank) DESC, p.created_at DESC, hits.id DESC LIMIT :limit'
+        ), {'tsquery': self.tsquery(tokens), 'candidates': CANDIDATE_LIMIT, 'limit': limit})
+        return [row[0] for row in rows]
+
+    def user_ids(self, conn, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        rows = conn.execute(text(
+            'SELECT hits.id FROM ('
+            "SELECT u.id, u.created_at, ts_rank(u.search_vector, q) AS rank FROM users u, "
+            "to_tsquery('simple', :tsquery) q WHERE u.search_vector @@ q "
+            'ORDER BY u.id DESC LIMIT :candidates'
+            ') hits ORDER BY hits.rank DESC, hits.created_at DESC, hits.id DESC LIMIT :limit'
+        ), {'tsquery': self.tsquery(tokens), 'candidates': CANDIDATE_LIMIT, 'limit': limit})
+        return [row[0] for row in rows]
+
+
+BACKENDS = {backend.name: backend for backend in (LikeBackend, SqliteFtsBackend, PostgresFtsBackend)}
+DIALECT_BACKENDS = {'sqlite': 'sqlite-fts5', 'postgresql': 'postgres'}
+
+
+class FullTextSearch:
+    """Flask extension wiring a search backend to the app's database.
+
+    ``SEARCH_BACKEND`` selects ``sqlite-fts5``, ``postgres`` or ``like``;
+    the default ``auto`` picks one from the database dialect. The index
+    is created (and backfilled) by a schema migration and whenever
+    ``db.create_all()`` runs.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.db = None
+        self._unavailable = set()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        app.config.setdefault('SEARCH_BACKEND', 'auto')
+        app.extensions['full_text_search'] = self
+        if not event.contains(db.metadata, 'after_create', self._after_create):
+            event.listen(db.metadata, 'after_create', self._after_create)
+            event.listen(db.metadata, 'before_drop', self._before_drop)
+
+    def backend_for(self, dialect_name):
+        name = current_app.config['SEARCH_BACKEND']
+        if name == 'auto':
+            name = DIALECT_BACKENDS.get(dialect_name, 'like')
+        if name in self._unavailable:
+            name = 'like'
+        return BACKENDS[name]()
+
+    @property
+    def backend(self):
+        return self.backend_for(self.db.engine.dialect.name)
+
+    def _after_create(self, metadata, conn, **kw):
+        # A create_all() before the models are imported has nothing to index
+        if 'posts' not in metadata.tables or 'users' not in metadata.tables:
+            return
+        self.setup(conn)
+        # New tables are empty, so building in the transaction blocks nothing
+        for name, table, columns, method in self.indexes(conn.dialect.name):
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING {method} ({columns})'))
+
+    def indexes(self, dialect_name):
+        """Indexes the backend for ``dialect_name`` needs beyond ``setup``."""
+        return self.backend_for(dialect_name).indexes
+
+    def setup(self, conn):
+        """Create the index tables or columns if missing; also a schema migration."""
+        backend = self.backend_for(conn.dialect.name)
+        try:
+            backend.setup(conn)
+        except OperationalError as e:
+            # e.g. an SQLite build without FTS5
+            print(f"Search backend {backend.name} unavailable, falling back to LIKE: {e}")
+            self._unavailable.add(backend.name)
+
+    def _before_drop(self, metadata, conn, **kw):
+        self.backend_for(conn.dialect.name).teardown(conn)
+
+    # Index maintenance; call before the commit so it shares the transaction
+
+    def add_post(self, post):
+        self.backend.add_post(self.db.session, post.id, post.content, post.author.name)
+
+    def remove_post(self, post_id):
+        self.backend.remove_post(self.db.session, post_id)
+
+    def update_user(self, user):
+        self.backend.update_user(self.db.session, user.id, user.name, user.job_title)
+
+    def rebuild(self):
+        self.backend.rebuild(self.db.session)
+        self.db.session.commit()
+
+    # Queries; both return ids in rank order
+
+    def post_ids(self, query, limit, match_author=True):
+        return self.backend.post_ids(self.db.session, query, limit, match_author)
+
+    def user_ids(self, query, limit):
+        return self.backend.user_ids(self.db.session, query, limit)
@@ -0,0 +1,89 @@
+"""Streamed bodies for the full-list endpoints.
+
+    GET /api/posts?stream=json        the same JSON array, sent in chunks
+    GET /api/users?stream=ndjson      one JSON object per line
+
+Rows are fetched ``STREAM_BATCH_SIZE`` at a time with ``yield_per`` (a
+server-side cursor on Postgres), each batch is serialized and sent as one
+chunk, and nothing keeps a reference to it afterwards. Memory stays flat
+however many rows there are, and the first bytes go out after one batch
+instead of after the whole list.
+
+Once the first chunk is sent the status can't change, so an error halfway
+through ends the body early; a JSON array is then left unterminated and
+fails to parse instead of looking complete. Streamed responses aren't cached.
+"""
+from functools import partial
+
+from flask import Response, current_app, stream_with_context
+
+STREAM_MIMETYPES = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+STREAM_BATCH_SIZE = 1000
+
+
+class StreamFormatError(ValueError):
+    pass
+
+
+def stream_format(args):
+    """``'json'``, ``'ndjson'`` or ``None`` (a buffered response) from ``?stream=``."""
+    fmt = args.get('stream')
+    if fmt is None:
+        return None
+    if fmt not in STREAM_MIMETYPES:
+        raise StreamFormatError(f"stream must be one of: {', '.join(STREAM_MIMETYPES)}")
+    return fmt
+
+
+def compact_dumps(provider):
+    """``provider.dumps`` without whitespace (the orjson provider is always compact)."""
+    return partial(provider.dumps, separators=(',', ':'))
+
+
+def encode_items(items, fmt, first, dumps):
+    """One chunk: ``items`` as NDJSON lines, or as JSON array elements (the
+    first chunk opens the array)."""
+    if fmt == 'ndjson':
+        return ''.join(f'{dumps(item)}\n' for item in items)
+    return ('[' if first else ',') + ','.join(dumps(item) for item in items)
+
+
+def close_stream(fmt, first):
+    """The last chunk: closes the JSON array (``[]`` if nothing was sent)."""
+    if fmt == 'ndjson':
+        return ''
+    return '[]' if first else ']'
+
+
+def encode_stream(batches, fmt, dumps):
+    """Body chunks for an iterable of serialized batches."""
+    first = True
+    for items in batches:
+        if items:
+            yield encode_items(items, fmt, first, dumps)
+            first = False
+    if closing := close_stream(fmt, first):
+        yield closing
+
+
+def iter_batches(query, size):
+    """The rows of a ``Query`` in lists of ``size``, fetched ``size`` at a time."""
+    batch = []
+    for row in query.yield_per(size):
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def streamed_response(query, serialize, fmt, batch_size=None):
+    """Stream ``serialize(rows)`` for every batch of ``query``.
+
+    The request (and its database session) stays open until the last chunk
+    is sent.
+    """
+    batches = (serialize(rows) for rows in iter_batches(query, batch_size or STREAM_BATCH_SIZE))
+    body = encode_stream(batches, fmt, compact_dumps(current_app.json))
+    return Response(stream_with_context(body), mimetype=STREAM_MIMETYPES[fmt])
@@ -0,0 +1,101 @@
+"""The async read path answers like the Flask views it stands in for."""
+import asyncio
+import sqlite3
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.testclient import TestClient
+
+import async_api
+from extensions import db, rate_limiter
+
+
+@pytest.fixture
+def async_client(client, tmp_path, monkeypatch):
+    """``async_client()`` snapshots the in-memory database, which aiosqlite
+    can't open, and serves the async handlers from the copy."""
+    def _async_client():
+        path = tmp_path / 'snapshot.db'
+        with client.application.app_context():
+            conn = db.engine.raw_connection()
+            try:
+                with sqlite3.connect(path) as target:
+                    conn.driver_connection.backup(target)
+            finally:
+                conn.close()
+        monkeypatch.setattr(async_api, 'sessions', async_sessionmaker(
+            create_async_engine(f'sqlite+aiosqlite:///{path}'), expire_on_commit=False
+        ))
+        return TestClient(async_api.app)
+    return _async_client
+
+
+def assert_same(client, async_client, url, headers=None):
+    expected = client.get(url, headers=headers)
+    actual = async_client.get(url, headers=headers)
+    assert (actual.status_code, actual.json()) == (expected.status_code, expected.get_json()), url
+    assert actual.headers.get('ETag') == expected.headers.get('ETag'), url
+    return actual.json()
+
+
+def test_feeds_profiles_and_search_match_the_flask_views(client, make_user, auth_headers, seed_posts,
+                                                         async_client):
+    alice, bob = make_user('Alice', job_title='Engineer'), make_user('Bob')
+    seed_posts([alice, bob], 3, liker_ids=[alice])
+    headers = auth_headers(bob)
+    client.post(f'/api/connections/{alice}', headers=headers)
+    served = async_client()
+
+    first = assert_same(client, served, '/api/posts?limit=4', headers)
+    urls = [
+        '/api/posts',
+        f'/api/posts?limit=4&cursor={first["next_cursor"]}',
+        '/api/posts?fields=id,content,likes_count',
+        '/api/posts?feed=network&limit=2',
+        '/api/posts?sort=ranked&limit=3',
+        '/api/posts?since=now',
+        f'/api/posts/user/{alice}?limit=2',
+        f'/api/users/{alice}',
+        '/api/search?q=Post',
+        '/api/search?q=Engineer&user_fields=id,name',
+    ]
+    for url in urls:
+        assert_same(client, served, url, headers)
+        assert_same(client, served, url)
+
+
+def test_errors_match_the_flask_views(client, make_user, auth_headers, async_client):
+    headers = auth_headers(make_user('Alice'))
+    served = async_client()
+    for url, status in [
+        ('/api/posts?feed=network', 401),
+        ('/api/posts?feed=everyone', 400),
+        ('/api/posts?feed=network&sort=ranked', 400),
+        ('/api/posts?sort=newest', 400),
+        ('/api/posts?limit=2&cursor=not-a-cursor', 400),
+        ('/api/posts?fields=id,password_hash', 400),
+        ('/api/posts?since=not-a-cursor', 400),
+        ('/api/posts/user/1?stream=xml', 400),
+        ('/api/users/999', 404),
+        ('/api/search?q=a&user_fields=nope', 400),
+    ]:
+        authorized = headers if 'feed=network&' in url else None
+        assert client.get(url, headers=authorized).status_code == status, url
+        assert assert_same(client, served, url, authorized)['message']
+
+
+def test_rate_limits_are_checked_off_the_event_loop(client, async_client, monkeypatch):
+    served = async_client()
+    on_loop = []
+
+    def check(budget, client):
+        try:
+            on_loop.append(asyncio.get_running_loop() is not None)
+        except RuntimeError:
+            on_loop.append(False)
+        return 30
+
+    monkeypatch.setattr(rate_limiter, 'check', check)
+    response = served.get('/api/search?q=a')
+    assert (response.status_code, response.headers['Retry-After']) == (429, '30')
+    assert on_loop == [False]
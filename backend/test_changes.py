@@ -0,0 +1,82 @@
+"""The post_changes log: ?since= deltas and the event broadcaster."""
+import asyncio
+
+from changes import encode_change_cursor
+from events import Broadcaster, format_event
+from extensions import change_log, db, like_buffer
+
+
+def since(client, cursor, headers=None):
+    return client.get(f'/api/posts?since={cursor}', headers=headers)
+
+
+def test_delta_folds_creates_likes_and_deletes(client, make_user, seed_posts, auth_headers):
+    author, other = make_user('Author'), make_user('Other')
+    [old_post] = seed_posts([author], 1)
+    headers = auth_headers(author)
+    cursor = since(client, 'now', headers).get_json()['next_cursor']
+
+    kept = client.post('/api/posts', json={'content': 'kept'}, headers=headers).get_json()['id']
+    gone = client.post('/api/posts', json={'content': 'gone'}, headers=headers).get_json()['id']
+    client.post(f'/api/posts/{old_post}/like', headers=auth_headers(other))
+    like_buffer.flush()
+    client.delete(f'/api/posts/{gone}', headers=headers)
+
+    delta = since(client, cursor, headers).get_json()
+    assert [post['id'] for post in delta['posts']] == [kept]
+    assert delta['deleted'] == [gone]
+    assert delta['likes'] == [{'id': old_post, 'likes_count': 1, 'liked_by_user': False}]
+    assert not delta['has_more']
+    # Nothing new after the returned cursor
+    assert since(client, delta['next_cursor'], headers).get_json()['posts'] == []
+
+
+def test_invalid_and_expired_cursors(client, make_user, auth_headers):
+    headers = auth_headers(make_user('Author'))
+    cursor = since(client, 'now').get_json()['next_cursor']
+    client.post('/api/posts', json={'content': 'first'}, headers=headers)
+    client.post('/api/posts', json={'content': 'second'}, headers=headers)
+
+    assert since(client, 'not-a-cursor').status_code == 400
+    assert since(client, encode_change_cursor(10 ** 6)).status_code == 410  # another database
+    app = client.application
+    retention = app.config['CHANGE_LOG_RETENTION']
+    app.config['CHANGE_LOG_RETENTION'] = -1
+    try:
+        with app.app_context():
+            assert change_log.prune() == 1  # the newest row stays as the head
+            db.session.commit()
+    finally:
+        app.config['CHANGE_LOG_RETENTION'] = retention
+    assert since(client, cursor).status_code == 410
+
+
+def test_broadcaster_replays_from_memory_and_catches_up():
+    log = list(range(1, 11))
+
+    async def fetch(after):
+        if after is None:
+            return log[-1], None, False
+        newer = [change for change in log if change > after][:2]
+        if not newer:
+            return after, None, False
+        return newer[-1], format_event(newer, newer[-1]), newer[-1] < log[-1]
+
+    async def first_messages(stream, count):
+        messages = [await stream.__anext__() for _ in range(count)]
+        await stream.aclose()
+        return messages
+
+    async def scenario():
+        broadcaster = Broadcaster(fetch, interval=0.01, backlog=2, hello=lambda cursor: f'ready {cursor}')
+        live = broadcaster.subscribe()
+        assert await live.__anext__() == 'ready 10'
+        log.extend([11, 12, 13])
+        live_messages = await first_messages(live, 2)
+        # Older than the two remembered events: caught up through fetch
+        behind = await first_messages(broadcaster.subscribe(after=4), 6)
+        return live_messages, behind
+
+    live_messages, behind = asyncio.run(scenario())
+    assert live_messages == [format_event([11, 12], 12), format_event([13], 13)]
+    assert behind == ['ready 4'] + [format_event(ids, ids[-1]) for ids in ([5, 6], [7, 8], [9, 10], [11, 12], [13])]
@@ -0,0 +1,67 @@
+"""ETag/Last-Modified revalidation and response compression."""
+import gzip
+
+from extensions import like_buffer
+from test_query_counts import count_queries
+
+
+def revalidate(client, url, etag, headers=None):
+    return client.get(url, headers={**(headers or {}), 'If-None-Match': etag}).status_code
+
+
+def test_unchanged_feed_is_a_304_without_serializing(client, make_user, seed_posts, auth_headers):
+    author = make_user('Author')
+    seed_posts([author], 5)
+    headers = auth_headers(author)
+    response = client.get('/api/posts', headers=headers)
+    etag = response.headers['ETag']
+
+    with count_queries(client.application) as statements:
+        not_modified = client.get('/api/posts', headers={**headers, 'If-None-Match': etag})
+
+    assert not_modified.status_code == 304 and not_modified.data == b''
+    assert not_modified.headers['ETag'] == etag
+    assert len(statements) == 1  # the version lookup
+    since = {**headers, 'If-Modified-Since': response.headers['Last-Modified']}
+    assert client.get('/api/posts', headers=since).status_code == 304
+    # The ETag is per viewer: liked_by_user differs
+    assert revalidate(client, '/api/posts', etag) == 200
+
+
+def test_writes_change_the_etags(client, make_user, seed_posts, auth_headers):
+    author, other = make_user('Author'), make_user('Other')
+    [post_id] = seed_posts([author], 1)
+    headers = auth_headers(author)
+    urls = ['/api/posts', f'/api/posts/user/{author}', f'/api/users/{author}']
+
+    def etags():
+        return [client.get(url, headers=headers).headers['ETag'] for url in urls]
+
+    before = etags()
+    client.put('/api/auth/profile', json={'job_title': 'CTO'}, headers=headers)
+    after_edit = etags()
+    assert all(revalidate(client, url, etag, headers) == 200 for url, etag in zip(urls, before))
+
+    client.post(f'/api/posts/{post_id}/like', headers=auth_headers(other))
+    pending = etags()
+    like_buffer.flush()
+    flushed = etags()
+    # Likes change the feeds, not the profile
+    assert pending[:2] != after_edit[:2] and flushed[:2] != pending[:2]
+    assert pending[2] == flushed[2] == after_edit[2]
+    assert revalidate(client, f'/api/users/{other}', client.get(f'/api/users/{other}').headers['ETag']) == 304
+
+
+def test_large_bodies_are_compressed(client, make_user, seed_posts):
+    seed_posts([make_user('Author')], 30)
+    plain = client.get('/api/posts').data
+    compressed = client.get('/api/posts', headers={'Accept-Encoding': 'gzip'})
+    streamed = client.get('/api/posts?stream=ndjson', headers={'Accept-Encoding': 'gzip'})
+    # Read each body before the next request; a streamed one keeps its context open
+    encoding, body = streamed.headers.get('Content-Encoding'), streamed.data
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain
+    assert encoding == 'gzip' and gzip.decompress(body) == client.get('/api/posts?stream=ndjson').data
+    small = client.get('/api/users/1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers and 'Accept-Encoding' in small.headers['Vary']
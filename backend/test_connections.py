@@ -0,0 +1,67 @@
+"""Connections: the edge table, the in-memory adjacency and the graph queries."""
+import pytest
+
+import graph
+from extensions import connection_graph, db
+from models import Connection
+
+
+@pytest.fixture
+def network(client, make_user, auth_headers):
+    """``me`` knows a and b; a and b both know c, b also knows d."""
+    users = {name: make_user(name.upper()) for name in ('me', 'a', 'b', 'c', 'd')}
+    for left, right in [('me', 'a'), ('me', 'b'), ('a', 'c'), ('b', 'c'), ('b', 'd')]:
+        response = client.post(f'/api/connections/{users[right]}', headers=auth_headers(users[left]))
+        assert response.status_code == 201
+    return users
+
+
+def suggested(client, headers):
+    return [(user['id'], user['mutual_connections'])
+            for user in client.get('/api/connections/suggestions', headers=headers).get_json()['suggestions']]
+
+
+def test_lists_and_mutual_connections(client, network, auth_headers):
+    me, a, b, c = network['me'], network['a'], network['b'], network['c']
+    headers = auth_headers(me)
+
+    assert [user['id'] for user in client.get(f'/api/connections/{b}').get_json()] == [network['d'], c, me]
+    first = client.get(f'/api/connections/{b}?limit=2').get_json()
+    rest = client.get(f'/api/connections/{b}?limit=2&cursor={first["next_cursor"]}').get_json()
+    assert [user['id'] for user in first['connections'] + rest['connections']] == [network['d'], c, me]
+
+    mutual = client.get(f'/api/connections/{c}/mutual?fields=name', headers=headers).get_json()
+    assert mutual == {'count': 2, 'users': [{'id': a, 'name': 'A'}, {'id': b, 'name': 'B'}]}
+    counts = client.get(f'/api/connections/mutual-counts?ids={c},{network["d"]},{a}', headers=headers)
+    assert counts.get_json() == {'counts': {str(c): 2, str(network['d']): 1, str(a): 0}}
+    # Connecting twice or to yourself changes nothing
+    assert client.post(f'/api/connections/{a}', headers=headers).status_code == 200
+    assert client.post(f'/api/connections/{me}', headers=headers).status_code == 400
+    assert client.get('/api/connections/999/mutual', headers=headers).status_code == 404
+
+
+def test_connecting_twice_at_once_is_not_an_error(client, make_user, auth_headers):
+    me, other = make_user('Me'), make_user('Other')
+    # The other direction, as written by a concurrent connect after this one's check
+    with client.application.app_context():
+        db.session.add(Connection(user_id=other, connection_id=me))
+        db.session.commit()
+    response = client.post(f'/api/connections/{other}', headers=auth_headers(me))
+    assert (response.status_code, response.get_json()) == (200, {'connected': True})
+
+
+@pytest.mark.parametrize('vectorized', [True, False])
+def test_suggestions_follow_connects_and_disconnects(client, network, auth_headers, monkeypatch, vectorized):
+    if not vectorized:
+        monkeypatch.setattr(graph, 'np', None)
+    me, b, c, d = network['me'], network['b'], network['c'], network['d']
+    headers = auth_headers(me)
+
+    assert suggested(client, headers) == [(c, 2), (d, 1)]
+    # Applied to the loaded lists, not reloaded
+    client.post(f'/api/connections/{c}', headers=headers)
+    assert suggested(client, headers) == [(d, 1)]
+    client.delete(f'/api/connections/{b}', headers=headers)
+    assert suggested(client, headers) == [(b, 1)]  # through c now
+    connection_graph.clear()
+    assert suggested(client, headers) == [(b, 1)]
@@ -0,0 +1,70 @@
+"""likes_count and posts_count follow likes, unlikes, creates and deletes."""
+import pytest
+
+from extensions import db, like_buffer
+from models import Post, User, reconcile_counters
+
+
+def counts(client, post_id, user_id):
+    with client.application.app_context():
+        return db.session.get(Post, post_id).likes_count, db.session.get(User, user_id).posts_count
+
+
+def set_counts(client, post_id, user_id, likes, posts):
+    """Write the counters directly, as another worker would."""
+    with client.application.app_context():
+        db.session.execute(db.update(Post).where(Post.id == post_id).values(likes_count=likes))
+        db.session.execute(db.update(User).where(User.id == user_id).values(posts_count=posts))
+        db.session.commit()
+
+
+@pytest.mark.parametrize('write_behind', [True, False])
+def test_likes_and_unlikes_keep_likes_count(client, make_user, seed_posts, auth_headers, monkeypatch, write_behind):
+    monkeypatch.setattr(like_buffer, 'enabled', write_behind)
+    author = make_user('Author')
+    fans = [auth_headers(make_user(f'Fan {i}')) for i in range(3)]
+    [post_id] = seed_posts([author], 1)
+
+    for headers in fans:
+        client.post(f'/api/posts/{post_id}/like', headers=headers)
+    response = client.post(f'/api/posts/{post_id}/like', headers=fans[0]).get_json()
+    assert (response['liked'], response['likes_count']) == (False, 2)
+
+    like_buffer.flush()
+    assert counts(client, post_id, author)[0] == 2
+    with client.application.app_context():
+        assert reconcile_counters() == {'posts': 0, 'users': 0}
+
+
+def test_creates_and_deletes_adjust_posts_count(client, make_user, auth_headers):
+    author, fan = make_user('Author'), make_user('Fan')
+    headers = auth_headers(author)
+    post_id = client.post('/api/posts', json={'content': 'first'}, headers=headers).get_json()['id']
+    client.post(f'/api/posts/{post_id}/like', headers=auth_headers(fan))
+    like_buffer.flush()
+    assert counts(client, post_id, author) == (1, 1)
+
+    second = client.post('/api/posts', json={'content': 'second'}, headers=headers).get_json()['id']
+    assert counts(client, second, author) == (0, 2)
+    client.delete(f'/api/posts/{post_id}', headers=headers)
+    with client.application.app_context():
+        assert db.session.get(Post, post_id) is None
+        assert reconcile_counters() == {'posts': 0, 'users': 0}
+    assert counts(client, second, author) == (0, 1)
+
+
+def test_counters_are_updated_in_sql_not_read_and_written_back(client, make_user, seed_posts, auth_headers):
+    author, fan = make_user('Author'), make_user('Fan')
+    [post_id] = seed_posts([author], 1)
+    headers = auth_headers(author)
+
+    # posts_count is incremented where it stands; likes_count is recounted
+    # from post_likes, so a drifted value is corrected rather than built on
+    set_counts(client, post_id, author, likes=5, posts=10)
+    created = client.post('/api/posts', json={'content': 'more'}, headers=headers).get_json()['id']
+    client.post(f'/api/posts/{post_id}/like', headers=auth_headers(fan))
+    like_buffer.flush()
+    assert counts(client, post_id, author) == (1, 11)
+
+    client.delete(f'/api/posts/{created}', headers=headers)
+    assert counts(client, post_id, author) == (1, 10)
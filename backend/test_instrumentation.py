@@ -0,0 +1,58 @@
+"""Request metrics: the Prometheus histograms, the slow-request log and their token."""
+import re
+
+import pytest
+
+TOKEN = {'Authorization': 'Bearer metrics-secret'}
+
+
+@pytest.fixture
+def metrics(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'METRICS_TOKEN', 'metrics-secret')
+    return client
+
+
+def samples(client, name):
+    """``{labels: value}`` of one metric in the /metrics output."""
+    text = client.get('/metrics', headers=TOKEN).get_data(as_text=True)
+    return {labels: float(value) for labels, value in re.findall(rf'^{name}{{(.*)}} (\S+)$', text, re.M)}
+
+
+def test_endpoints_need_the_token(client, monkeypatch):
+    for url in ('/metrics', '/api/metrics/slow-requests'):
+        assert client.get(url, headers=TOKEN).status_code == 404
+    monkeypatch.setitem(client.application.config, 'METRICS_TOKEN', 'metrics-secret')
+    for url in ('/metrics', '/api/metrics/slow-requests'):
+        assert client.get(url).status_code == 401
+        assert client.get(url, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        assert client.get(url, headers=TOKEN).status_code == 200
+
+
+def test_latency_histogram_and_counters(metrics, make_user, seed_posts):
+    seed_posts([make_user('Author')], 3)
+    for _ in range(3):
+        metrics.get('/api/posts')
+    metrics.get('/api/posts?limit=many')
+
+    labels = 'method="GET",route="/api/posts"'
+    buckets = [(labels_, count) for labels_, count in samples(metrics, 'http_request_duration_seconds_bucket').items()
+               if labels_.startswith(labels)]
+    counts = [count for _, count in buckets]
+    assert counts == sorted(counts) and buckets[-1] == (f'{labels},le="+Inf"', 4)
+    assert samples(metrics, 'http_request_duration_seconds_count')[labels] == 4
+    statuses = {key: count for key, count in samples(metrics, 'http_requests_total').items() if key.startswith(labels)}
+    assert statuses == {f'{labels},status="200"': 3, f'{labels},status="400"': 1}
+    assert samples(metrics, 'sql_queries_total')[labels] > 0
+    assert samples(metrics, 'http_response_bytes_total')[labels] > 0
+
+
+def test_slow_requests_are_logged_without_query_values(metrics, monkeypatch):
+    metrics.get('/api/search?q=secret')
+    assert metrics.get('/api/metrics/slow-requests', headers=TOKEN).get_json()['requests'] == []
+
+    monkeypatch.setitem(metrics.application.config, 'SLOW_REQUEST_THRESHOLD_MS', 0)
+    metrics.get('/api/search?q=secret&post_fields=id')
+    [logged] = metrics.get('/api/metrics/slow-requests', headers=TOKEN).get_json()['requests']
+    assert logged['path'] == '/api/search?q=<redacted>&post_fields=<redacted>'
+    assert (logged['route'], logged['status']) == ('/api/search', 200)
+    assert logged['queries'] and all('secret' not in query['sql'] for query in logged['queries'])
@@ -0,0 +1,101 @@
+"""Like toggles: coalesced per (user, post) and written in batches."""
+from sqlalchemy import event
+
+from extensions import db, like_buffer
+from models import Post, PostLike
+
+
+def stored_count(client, post_id):
+    with client.application.app_context():
+        return db.session.get(Post, post_id).likes_count
+
+
+def stored_likes(client):
+    with client.application.app_context():
+        return set(db.session.query(PostLike.user_id, PostLike.post_id))
+
+
+def toggle(client, post_id, headers):
+    return client.post(f'/api/posts/{post_id}/like', headers=headers).get_json()
+
+
+def test_toggles_coalesce_and_are_written_in_one_batch(client, make_user, seed_posts, auth_headers):
+    author, alice, bob, carol = (make_user(name) for name in ('Author', 'Alice', 'Bob', 'Carol'))
+    [post_id] = seed_posts([author], 1)
+    alice_headers = auth_headers(alice)
+
+    # Liked and flushed on another worker: this toggle starts from the row
+    with client.application.app_context():
+        db.session.add(PostLike(user_id=carol, post_id=post_id))
+        db.session.get(Post, post_id).likes_count = 1
+        db.session.commit()
+
+    # Holding the flush lock keeps the flush thread out
+    with like_buffer._flush_lock:
+        assert toggle(client, post_id, auth_headers(carol))['liked'] is False
+        assert [toggle(client, post_id, alice_headers)['liked'] for _ in range(3)] == [True, False, True]
+        assert toggle(client, post_id, auth_headers(bob))['likes_count'] == 2
+        # One pending state per pair; nothing written yet
+        assert {key: entry.liked for key, entry in like_buffer._pending.items()} == {
+            (carol, post_id): False, (alice, post_id): True, (bob, post_id): True
+        }
+        assert stored_likes(client) == {(carol, post_id)}
+        assert stored_count(client, post_id) == 1
+
+        [post] = client.get('/api/posts', headers=alice_headers).get_json()
+        assert (post['likes_count'], post['liked_by_user']) == (2, True)
+        [post] = client.get('/api/posts', headers=auth_headers(carol)).get_json()
+        assert (post['likes_count'], post['liked_by_user']) == (2, False)
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if 'post_likes' in statement.split('WHERE')[0]:
+            statements.append(statement.split()[0])
+
+    with client.application.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        assert like_buffer.flush() == 3
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert statements.count('INSERT') == 1 and statements.count('DELETE') == 1
+    assert stored_likes(client) == {(alice, post_id), (bob, post_id)}
+    assert stored_count(client, post_id) == 2
+    assert like_buffer.likes_delta(post_id) == 0
+
+
+def test_toggling_back_cancels_the_write(client, make_user, seed_posts, auth_headers):
+    author, alice = make_user('Author'), make_user('Alice')
+    [post_id] = seed_posts([author], 1)
+    headers = auth_headers(alice)
+
+    with like_buffer._flush_lock:
+        assert [toggle(client, post_id, headers)['liked'] for _ in range(2)] == [True, False]
+        assert like_buffer._pending == {} and like_buffer.likes_delta(post_id) == 0
+    assert like_buffer.flush() == 0
+    assert stored_likes(client) == set()
+
+
+def test_failed_flush_is_retried_without_deleted_posts(client, make_user, seed_posts, auth_headers, monkeypatch):
+    author, alice = make_user('Author'), make_user('Alice')
+    kept, gone = seed_posts([author], 2)
+    headers = auth_headers(alice)
+
+    def failing(batch, post_ids):
+        like_buffer.discard_post(gone)  # deleted while the batch was being written
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(like_buffer, 'enabled', False)
+    monkeypatch.setattr(like_buffer, '_write_batch', failing)
+    assert toggle(client, kept, headers)['likes_count'] == 1
+    toggle(client, gone, headers)
+    assert list(like_buffer._pending) == [(alice, kept)]
+    assert like_buffer._deltas == {kept: 1}
+
+    monkeypatch.undo()
+    like_buffer.flush()
+    assert stored_likes(client) == {(alice, kept)}
+    assert stored_count(client, kept) == 1
+    assert like_buffer._deltas == {}
@@ -0,0 +1,84 @@
+"""Keyset pagination: cursors, ties on created_at and the last page."""
+import base64
+from datetime import datetime
+
+import pytest
+
+from extensions import db, timelines
+from models import Post
+from pagination import PaginationError, decode_cursor, encode_cursor
+
+
+def opaque(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def pages(client, url):
+    """Every page of ``url``, following ``next_cursor``."""
+    result, cursor = [], None
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200, response.get_json()
+        page = response.get_json()
+        result.append([post['id'] for post in page['posts']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return result
+
+
+@pytest.fixture
+def tied(client, make_user):
+    """Five posts, the middle three created at the same instant."""
+    author = make_user('Author')
+    instants = [datetime(2024, 1, 1, 9), datetime(2024, 1, 1, 10), datetime(2024, 1, 1, 10),
+                datetime(2024, 1, 1, 10), datetime(2024, 1, 1, 11)]
+    with client.application.app_context():
+        posts = [Post(content=f'post {i}', author_id=author, created_at=at) for i, at in enumerate(instants)]
+        db.session.add_all(posts)
+        db.session.commit()
+        timelines.rebuild()
+        # Newest first; ties by id descending
+        return author, [post.id for post in sorted(posts, key=lambda post: (post.created_at, post.id), reverse=True)]
+
+
+@pytest.mark.parametrize('url', ['/api/posts?limit=2', '/api/posts/user/{author}?limit=2'])
+def test_ties_on_created_at_are_paged_once_each(client, tied, monkeypatch, url):
+    author, expected = tied
+    assert sum(pages(client, url.format(author=author)), []) == expected
+    # And past the materialized window, from the posts table
+    with client.application.app_context():
+        timelines.rebuild()
+    monkeypatch.setattr(timelines, 'max_length', 2)
+    monkeypatch.setattr(timelines.store, 'max_length', 2)
+    assert sum(pages(client, url.format(author=author)), []) == expected
+
+
+def test_the_last_page_has_no_cursor(client, tied):
+    author, expected = tied
+    assert pages(client, '/api/posts?limit=5') == [expected]
+    assert pages(client, '/api/posts?limit=1') == [[post_id] for post_id in expected]
+    assert client.get('/api/posts?limit=100').get_json()['next_cursor'] is None
+    # Past the last post: an empty page
+    last = encode_cursor(datetime(2024, 1, 1, 9), expected[-1])
+    assert client.get(f'/api/posts?limit=2&cursor={last}').get_json() == {'posts': [], 'next_cursor': None}
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    '%%%',
+    opaque('[]'),
+    opaque('null'),
+    opaque('{"created_at": "2024-01-01"}'),
+    opaque('["2024-01-01T10:00:00", 1, 2]'),
+    opaque('["yesterday", 1]'),
+    opaque('["2024-01-01T10:00:00", "one"]'),
+    opaque('["2024-01-01T10:00:00", null]'),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+])
+def test_invalid_cursors_are_rejected(client, tied, cursor):
+    author, _ = tied
+    with pytest.raises(PaginationError):
+        decode_cursor(cursor)
+    for url in ('/api/posts', f'/api/posts/user/{author}', f'/api/connections/{author}'):
+        response = client.get(f'{url}?limit=2&cursor={cursor}')
+        assert (response.status_code, response.get_json()) == (400, {'message': 'Invalid cursor'}), url
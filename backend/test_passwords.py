@@ -0,0 +1,75 @@
+"""Password hashing: upgrades on login, legacy hashes, bcrypt's length limit and load shedding."""
+import hashlib
+import threading
+import time
+
+import pytest
+
+import passwords
+from extensions import db, password_hasher
+from models import User
+
+
+def login(client, email, password='password123'):
+    return client.post('/api/auth/login', json={'email': email, 'password': password})
+
+
+def stored_hash(client, user_id):
+    with client.application.app_context():
+        return db.session.get(User, user_id).password_hash
+
+
+def set_hash(client, user_id, encoded):
+    with client.application.app_context():
+        db.session.get(User, user_id).password_hash = encoded
+        db.session.commit()
+
+
+def test_legacy_and_outdated_hashes_are_upgraded_on_login(client, make_user, monkeypatch):
+    alice = make_user('Alice')
+    legacy = hashlib.sha256(b'password123').hexdigest()
+    set_hash(client, alice, legacy)
+
+    assert login(client, 'alice@example.com', 'wrong').status_code == 401
+    assert stored_hash(client, alice) == legacy
+    assert login(client, 'alice@example.com').status_code == 200
+    assert stored_hash(client, alice).startswith(f'pbkdf2_sha256${password_hasher.cost}$')
+
+    # A raised cost upgrades the hash on the next login too
+    monkeypatch.setattr(password_hasher, 'cost', password_hasher.cost + 1)
+    assert login(client, 'alice@example.com').status_code == 200
+    assert stored_hash(client, alice).startswith(f'pbkdf2_sha256${password_hasher.cost}$')
+
+
+@pytest.mark.skipif(passwords.bcrypt is None, reason='bcrypt not installed')
+def test_bcrypt_rejects_passwords_over_72_bytes(client, make_user, monkeypatch):
+    monkeypatch.setattr(password_hasher, 'algorithm', 'bcrypt')
+    monkeypatch.setattr(password_hasher, 'cost', 4)
+
+    def register(name, password):
+        return client.post('/api/auth/register', json={
+            'name': name, 'email': f'{name}@example.com', 'password': password
+        })
+    assert register('long', 'é' * 37).status_code == 400
+    assert register('limit', 'x' * 72).status_code == 201
+    assert login(client, 'limit@example.com', 'x' * 72).status_code == 200
+
+    # An older hash of a longer password still logs in; it just isn't moved to bcrypt
+    alice = make_user('Alice')
+    set_hash(client, alice, hashlib.sha256(b'y' * 100).hexdigest())
+    assert login(client, 'alice@example.com', 'y' * 100).status_code == 200
+    assert len(stored_hash(client, alice)) == 64
+
+
+def test_busy_and_slow_hashers_answer_503(client, make_user, monkeypatch):
+    make_user('Alice')
+    monkeypatch.setattr(password_hasher, '_slots', threading.BoundedSemaphore(1))
+    assert password_hasher._slots.acquire(blocking=False)
+    response = login(client, 'alice@example.com')
+    assert (response.status_code, response.headers['Retry-After']) == (503, '1')
+    password_hasher._slots.release()
+
+    monkeypatch.setattr(password_hasher, 'timeout', 0.01)
+    monkeypatch.setattr(passwords, 'verify_password', lambda *args: time.sleep(0.1) or (True, False))
+    assert login(client, 'alice@example.com').status_code == 503
+    assert password_hasher._slots.acquire(blocking=False)  # given back after the timeout
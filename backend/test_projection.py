@@ -0,0 +1,29 @@
+"""``?fields=`` returns a subset of each full item."""
+import pytest
+
+
+@pytest.mark.parametrize('url, fields', [
+    ('/api/posts', 'content,author_name,liked_by_user'),
+    ('/api/posts?page=1&per_page=5', 'likes_count'),
+    ('/api/posts/user/1', 'author_avatar,created_at'),
+    ('/api/users', 'name,job_title'),
+])
+def test_projection_is_a_subset_of_the_full_item(client, make_user, seed_posts, auth_headers, url, fields):
+    authors = [make_user(f'Author {i}') for i in range(3)]
+    viewer = make_user('Viewer')
+    seed_posts(authors, 4, liker_ids=[viewer])
+    headers = auth_headers(viewer)
+    separator = '&' if '?' in url else '?'
+
+    full = client.get(url, headers=headers).get_json()
+    projected = client.get(f'{url}{separator}fields={fields}', headers=headers).get_json()
+    if isinstance(full, dict):
+        full, projected = full['posts'], projected['posts']
+
+    requested = set(fields.split(',')) | {'id'}
+    assert projected == [{key: item[key] for key in requested} for item in full]
+
+
+def test_unknown_fields_are_rejected(client):
+    assert client.get('/api/posts?fields=content,password_hash').status_code == 400
+    assert client.get('/api/search?q=a&user_fields=email,nope').status_code == 400
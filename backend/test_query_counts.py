@@ -0,0 +1,77 @@
+"""Regression tests: list endpoints must not issue a query per row."""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db, response_cache
+from models import Post
+
+
+@contextmanager
+def count_queries(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def queries_for(client, url, headers=None):
+    with count_queries(client.application) as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
+
+
+def seeded_counts(client, make_user, seed_posts, auth_headers, posts_per_author, url):
+    authors = [make_user(f'Author {i}') for i in range(posts_per_author)]
+    viewer = make_user('Viewer')
+    seed_posts(authors, posts_per_author, liker_ids=[viewer, authors[0]])
+    # Loads the timelines outside the counted request; then drop the cached copy
+    client.get(url, headers=auth_headers(viewer))
+    response_cache.clear()
+    return queries_for(client, url, auth_headers(viewer))
+
+
+@pytest.mark.parametrize('url', [
+    '/api/posts',
+    '/api/posts?limit=50',
+    '/api/posts/user/1',
+    '/api/posts/search?q=Post',
+    '/api/search?q=Author',
+    '/api/users',
+])
+def test_query_count_is_constant(client, make_user, seed_posts, auth_headers, url):
+    small = seeded_counts(client, make_user, seed_posts, auth_headers, 2, url)
+
+    with client.application.app_context():
+        db.drop_all()
+        db.create_all()
+    large = seeded_counts(client, make_user, seed_posts, auth_headers, 6, url)
+
+    assert small == large
+    # Page + likes + the conditional GET's version
+    assert large <= 4
+
+
+def test_batched_feed_matches_per_post_serialization(client, make_user, seed_posts, auth_headers):
+    author = make_user('Author')
+    viewer = make_user('Viewer')
+    seed_posts([author], 3, liker_ids=[viewer])
+    seed_posts([author], 2)
+
+    feed = client.get('/api/posts', headers=auth_headers(viewer)).get_json()
+
+    with client.application.app_context():
+        expected = [db.session.get(Post, item['id']).to_dict(viewer) for item in feed]
+    assert feed == expected
+    assert [item['likes_count'] for item in feed] == [0, 0, 1, 1, 1]
+    assert [item['liked_by_user'] for item in feed] == [False, False, True, True, True]
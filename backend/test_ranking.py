@@ -0,0 +1,99 @@
+"""Ranked feed: the features move posts, and pages come from one ranking."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from extensions import db, like_buffer, ranked_feed
+from models import Post, PostLike, reconcile_counters
+
+
+@pytest.fixture
+def feed(client, make_user):
+    """a0 is old and liked by the viewer, a1 is by the same author; b1 and b2 are newer."""
+    users = {name: make_user(name.upper()) for name in ('a', 'b', 'viewer', 'fan')}
+    now = datetime.utcnow()
+    with client.application.app_context():
+        posts = {
+            name: Post(content=name, author_id=users[name[0]], created_at=now - timedelta(hours=hours))
+            for name, hours in [('a0', 30), ('a1', 2), ('b1', 1), ('b2', 0)]
+        }
+        db.session.add_all(posts.values())
+        db.session.flush()
+        db.session.add(PostLike(user_id=users['viewer'], post_id=posts['a0'].id, created_at=now - timedelta(hours=29)))
+        db.session.commit()
+        reconcile_counters()
+        return {name: post.id for name, post in posts.items()}, users
+
+
+def ranked(client, headers=None, url='/api/posts?sort=ranked'):
+    return [post['id'] for post in client.get(url, headers=headers).get_json()]
+
+
+def test_affinity_and_velocity_move_posts(client, feed, auth_headers):
+    posts, users = feed
+    viewer = auth_headers(users['viewer'])
+
+    assert ranked(client) == [posts[name] for name in ('b2', 'b1', 'a1', 'a0')]
+    # The viewer liked an earlier post by a
+    assert ranked(client, viewer) == [posts[name] for name in ('a1', 'b2', 'b1', 'a0')]
+
+    client.post(f'/api/posts/{posts["b1"]}/like', headers=auth_headers(users['fan']))
+    with client.application.app_context():
+        like_buffer.flush()
+    assert ranked(client) == [posts[name] for name in ('b2', 'b1', 'a1', 'a0')]  # cached
+    ranked_feed.clear()
+    assert ranked(client) == [posts[name] for name in ('b1', 'b2', 'a1', 'a0')]
+
+
+def test_pages_and_etags(client, feed, auth_headers):
+    posts, users = feed
+    headers = auth_headers(users['viewer'])
+    first = client.get('/api/posts?sort=ranked&limit=3', headers=headers).get_json()
+    rest = client.get(f'/api/posts?sort=ranked&limit=3&cursor={first["next_cursor"]}', headers=headers).get_json()
+    assert [post['id'] for post in first['posts'] + rest['posts']] == ranked(client, headers)
+    assert rest['next_cursor'] is None
+
+    # Past RANKING_GRACE the first page's ranking is gone; its offsets would
+    # skip or repeat posts in a new one
+    later = ranked_feed.bucket() + 1
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(ranked_feed, 'bucket', lambda: later)
+        ranked_feed.rankings.clear()
+        response = client.get(f'/api/posts?sort=ranked&limit=3&cursor={first["next_cursor"]}', headers=headers)
+        assert response.status_code == 400
+
+    assert client.get('/api/posts?sort=top').status_code == 400
+    assert client.get('/api/posts?sort=ranked&cursor=bm9wZQ').status_code == 400
+    # The ranking's cache bucket is part of the ETag
+    etag = client.get('/api/posts?sort=ranked', headers=headers).headers['ETag']
+    assert etag != client.get('/api/posts', headers=headers).headers['ETag']
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(ranked_feed, 'bucket', lambda: later)
+        assert client.get('/api/posts?sort=ranked', headers={**headers, 'If-None-Match': etag}).status_code == 200
+
+
+def test_candidates_are_shared_and_affinity_is_bounded(client, feed, auth_headers, monkeypatch):
+    posts, users = feed
+    bucket = ranked_feed.bucket()
+    monkeypatch.setattr(ranked_feed, 'bucket', lambda: bucket)
+    calls = []
+    candidates = ranked_feed.candidates
+    monkeypatch.setattr(ranked_feed, 'candidates', lambda *args: calls.append(args) or candidates(*args))
+    assert ranked(client, auth_headers(users['viewer']))[0] == posts['a1']
+    assert ranked(client, auth_headers(users['fan'])) == ranked(client)
+    assert len(calls) == 1
+
+    # Posting makes the poster's ranking, and so the candidates, current again
+    new = client.post('/api/posts', json={'content': 'new'}, headers=auth_headers(users['viewer'])).get_json()
+    assert new['id'] in ranked(client, auth_headers(users['viewer']))
+    assert len(calls) == 2
+
+    with client.application.app_context():
+        db.session.add(PostLike(user_id=users['viewer'], post_id=posts['b1'], created_at=datetime.utcnow()))
+        db.session.commit()
+        authors = np.array([users['a'], users['b']])
+        assert ranked_feed.affinity(db.session, users['viewer'], authors).tolist() == [0.5, 0.5]
+        # Only the viewer's latest like counts
+        monkeypatch.setitem(client.application.config, 'RANKED_FEED_AFFINITY_LIKES', 1)
+        assert ranked_feed.affinity(db.session, users['viewer'], authors).tolist() == [0, 1]
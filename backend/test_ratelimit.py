@@ -0,0 +1,92 @@
+"""Rate limits per client and the in-flight cap."""
+import socket
+from collections import deque
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+from gunicorn.workers.gthread import TConn, ThreadWorker
+
+from extensions import rate_limiter
+from gunicorn_workers import RecyclingThreadWorker
+from ratelimit import BUCKET_STORES
+
+
+@pytest.fixture
+def budgets(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'RATE_LIMITS',
+                        {**client.application.config['RATE_LIMITS'], 'login': (2, 60), 'search': (3, 60)})
+
+
+def test_budgets_are_per_route_and_client(client, make_user, auth_headers, budgets):
+    make_user('Alice')
+    login = {'email': 'alice@example.com', 'password': 'wrong'}
+    assert [client.post('/api/auth/login', json=login).status_code for _ in range(3)] == [401, 401, 429]
+    limited = client.post('/api/auth/login', json=login)
+    assert limited.headers['Retry-After'] == '30'  # 2 per minute: one back every 30s
+
+    # Search has its own budget, shared by both search endpoints, per user
+    alice, bob = auth_headers(make_user('Alice 2')), auth_headers(make_user('Bob'))
+    statuses = [client.get(url, headers=alice).status_code
+                for url in ['/api/search?q=a', '/api/posts/search?q=a', '/api/search?q=a', '/api/posts/search?q=a']]
+    assert statuses == [200, 200, 200, 429]
+    assert client.get('/api/search?q=a', headers=bob).status_code == 200
+
+    client.application.config['RATE_LIMIT_ENABLED'] = False
+    try:
+        assert client.get('/api/search?q=a', headers=alice).status_code == 200
+    finally:
+        client.application.config['RATE_LIMIT_ENABLED'] = True
+
+
+@pytest.mark.parametrize('backend', sorted(BUCKET_STORES))
+def test_stores_refill_and_share_buckets(client, tmp_path, backend):
+    config = {**client.application.config, 'RATE_LIMIT_SQLITE_PATH': str(tmp_path / 'buckets.db')}
+    store = BUCKET_STORES[backend](config)
+    # Two per second, burst of two
+    assert [store.take('k', 2, 2.0, 100.0) for _ in range(3)] == [0, 0, pytest.approx(0.5)]
+    assert store.take('k', 2, 2.0, 100.25) == pytest.approx(0.25)
+    assert store.take('k', 2, 2.0, 100.5) == 0
+    assert store.take('other', 2, 2.0, 100.5) == 0
+    if backend == 'sqlite':
+        # Another worker's store sees the same bucket
+        assert BUCKET_STORES[backend](config).take('k', 2, 2.0, 100.5) == pytest.approx(0.5)
+
+
+def test_requests_over_the_in_flight_cap_are_shed(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'ADMISSION_MAX_IN_FLIGHT', 1)
+    assert rate_limiter.enter()  # a request still running
+    try:
+        shed = client.get('/api/users')
+        assert shed.status_code == 503 and shed.headers['Retry-After'] == '1'
+    finally:
+        rate_limiter.leave()
+    assert client.get('/api/users').status_code == 200
+    assert rate_limiter.in_flight() == 0
+
+
+def test_threaded_worker_sheds_requests_queued_past_the_cap(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'ADMISSION_MAX_IN_FLIGHT', 2)
+    queued = []
+    monkeypatch.setattr(ThreadWorker, 'enqueue_req', lambda worker, conn: queued.append(conn))
+    # The parts of a running worker that queueing looks at
+    worker = RecyclingThreadWorker.__new__(RecyclingThreadWorker)
+    worker.cfg, worker.wsgi = SimpleNamespace(is_ssl=False), client.application
+    worker.futures, worker.nr_conns = deque([Future()]), 2
+    done = Future()
+    done.set_result(None)
+    worker.futures.append(done)  # finished, not yet collected by the loop
+
+    ours, theirs = socket.socketpair()
+    theirs.sendall(b'GET /api/users HTTP/1.1\r\nHost: x\r\n\r\n')
+    conn = TConn(worker.cfg, ours, None, None)
+    worker.enqueue_req(conn)
+    assert queued == [conn]
+
+    worker.futures.append(Future())  # two running or waiting for a thread
+    ours, theirs = socket.socketpair()
+    theirs.sendall(b'GET /api/users HTTP/1.1\r\nHost: x\r\n\r\n')
+    worker.enqueue_req(TConn(worker.cfg, ours, None, None))
+    response = theirs.makefile('rb').read()
+    assert response.startswith(b'HTTP/1.1 503 ') and b'Retry-After: 1\r\n' in response
+    assert queued == [conn] and worker.nr_conns == 1
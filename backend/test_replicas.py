@@ -0,0 +1,115 @@
+"""Read replicas: routing, health checks and read-your-writes."""
+import sqlite3
+
+import pytest
+
+from changes import encode_change_cursor
+from extensions import db, read_replicas
+from models import PostChange
+from replicas import PIN_HEADER
+
+
+@pytest.fixture
+def replicas(client, tmp_path, monkeypatch):
+    """Snapshot the in-memory primary into SQLite files and read from them."""
+    def _replicas(count):
+        paths = [str(tmp_path / f'replica{index}.db') for index in range(count)]
+        with client.application.app_context():
+            conn = db.engine.raw_connection()
+            try:
+                for index, path in enumerate(paths):
+                    with sqlite3.connect(path) as target:
+                        conn.driver_connection.backup(target)
+                        # Tell the copies apart
+                        target.execute('UPDATE users SET job_title = ?', (f'replica {index}',))
+            finally:
+                conn.close()
+        monkeypatch.setitem(client.application.config, 'READ_REPLICA_URIS', [f'sqlite:///{path}' for path in paths])
+        read_replicas.clear()
+        return paths
+    return _replicas
+
+
+def job_title(client, user_id, headers=None):
+    return client.get(f'/api/users/{user_id}', headers=headers).get_json()['job_title']
+
+
+def test_reads_rotate_and_writers_read_the_primary(client, make_user, auth_headers, replicas, monkeypatch):
+    alice, bob = make_user('Alice'), make_user('Bob')
+    replicas(2)
+
+    monkeypatch.setitem(client.application.config, 'RESPONSE_CACHE_ENABLED', False)
+    assert [job_title(client, alice) for _ in range(4)] == ['replica 0', 'replica 1'] * 2
+    monkeypatch.setitem(client.application.config, 'RESPONSE_CACHE_ENABLED', True)
+
+    # The write goes to the primary; the replicas don't have it
+    bob_headers = auth_headers(bob)
+    response = client.put('/api/auth/profile', json={'job_title': 'Engineer'}, headers=bob_headers)
+    pin = response.headers[PIN_HEADER]
+    post_id = client.post('/api/posts', json={'content': 'hello'}, headers=bob_headers).get_json()['id']
+    assert job_title(client, bob, auth_headers(alice)).startswith('replica')
+    assert post_id not in [post['id'] for post in client.get('/api/posts').get_json()]
+
+    # Bob sends the pin back and reads his own writes, on any worker
+    pinned_headers = {**bob_headers, PIN_HEADER: pin}
+    assert job_title(client, bob, pinned_headers) == 'Engineer'
+    assert post_id in [post['id'] for post in client.get('/api/posts', headers=pinned_headers).get_json()]
+
+    # ...and his fresh copy is what gets cached
+    assert job_title(client, bob, auth_headers(alice)) == 'Engineer'
+
+    # Only for him, only with a valid signature, only for READ_REPLICA_PIN_SECONDS
+    assert not read_replicas.pinned(alice, pin)
+    assert not read_replicas.pinned(bob, pin[:-2] + 'xx')
+    clock = read_replicas.clock
+    monkeypatch.setattr(read_replicas, 'clock', lambda: clock() + client.application.config['READ_REPLICA_PIN_SECONDS'])
+    assert not read_replicas.pinned(bob, pin)
+
+
+def test_replica_reads_are_not_cached_right_after_a_write(client, make_user, auth_headers, replicas):
+    alice, bob = make_user('Alice'), make_user('Bob')
+    replicas(1)
+    assert job_title(client, bob) == 'replica 0'
+    client.put('/api/auth/profile', json={'job_title': 'Engineer'}, headers=auth_headers(bob))
+
+    # The lagging copy is served but not stored, so it can't outlive the lag
+    response = client.get(f'/api/users/{bob}', headers=auth_headers(alice))
+    assert response.get_json()['job_title'] == 'replica 0'
+    assert response.headers['X-Cache'] == 'MISS'
+    assert client.get(f'/api/users/{bob}', headers=auth_headers(alice)).headers['X-Cache'] == 'MISS'
+
+    # Tags nobody wrote to are cached as usual
+    assert job_title(client, alice) == 'replica 0'
+    assert client.get(f'/api/users/{alice}').headers['X-Cache'] == 'HIT'
+
+
+def test_change_cursors_are_checked_against_the_primary(client, make_user, auth_headers, replicas):
+    alice = make_user('Alice')
+    replicas(1)
+    client.post('/api/posts', json={'content': 'hello'}, headers=auth_headers(alice))
+
+    # Issued by the primary, past the replica's log: a replica would call it expired
+    with client.application.app_context():
+        cursor = encode_change_cursor(db.session.query(db.func.max(PostChange.id)).scalar())
+    response = client.get(f'/api/posts?since={cursor}')
+    assert response.status_code == 200
+    assert response.get_json()['posts'] == []
+
+
+def test_unhealthy_replicas_get_no_reads(client, make_user, replicas):
+    alice = make_user('Alice')
+    client.application.config['RESPONSE_CACHE_ENABLED'] = False
+    try:
+        first, second = replicas(2)
+        with sqlite3.connect(second) as conn:
+            conn.execute('DELETE FROM schema_migrations WHERE version = (SELECT max(version) FROM schema_migrations)')
+        assert read_replicas.check() == [0]
+        assert {job_title(client, alice) for _ in range(3)} == {'replica 0'}
+
+        # None left: the primary serves the reads
+        with sqlite3.connect(first) as conn:
+            conn.execute('DROP TABLE schema_migrations')
+        assert read_replicas.check() == []
+        assert not job_title(client, alice)
+    finally:
+        client.application.config['RESPONSE_CACHE_ENABLED'] = True
@@ -0,0 +1,44 @@
+"""Response cache: hits, tag invalidation by the write paths, and what is never stored."""
+import pytest
+
+from extensions import response_cache
+
+
+def cache(client, url, headers=None):
+    return client.get(url, headers=headers).headers.get('X-Cache')
+
+
+def test_writes_invalidate_the_feed(client, make_user, auth_headers, seed_posts):
+    author = make_user('Author')
+    headers = auth_headers(author)
+    seed_posts([author], 3)
+    for url in ('/api/posts?limit=2', f'/api/posts/user/{author}?limit=2'):
+        assert [cache(client, url), cache(client, url)] == ['MISS', 'HIT']
+
+    post_id = client.post('/api/posts', json={'content': 'new'}, headers=headers).get_json()['id']
+    for url in ('/api/posts?limit=2', f'/api/posts/user/{author}?limit=2'):
+        assert cache(client, url) == 'MISS'
+        assert client.get(url).get_json()['posts'][0]['id'] == post_id
+
+    client.delete(f'/api/posts/{post_id}', headers=headers)
+    assert post_id not in [post['id'] for post in client.get('/api/posts?limit=2').get_json()['posts']]
+    assert response_cache.snapshot()['invalidations'] > 0
+
+
+def test_cursor_pages_and_deltas_are_not_cached(client, make_user, seed_posts):
+    author = make_user('Author')
+    seed_posts([author], 3)
+    for url in ('/api/posts?limit=2', f'/api/posts/user/{author}?limit=2'):
+        cursor = client.get(url).get_json()['next_cursor']
+        assert [cache(client, f'{url}&cursor={cursor}') for _ in range(2)] == [None, None]
+    assert cache(client, '/api/posts?since=now') is None
+    assert response_cache.snapshot()['entries'] == 2
+
+
+@pytest.mark.parametrize('token, status', [(None, 404), ('stats-secret', 200)])
+def test_stats_need_the_metrics_token(client, monkeypatch, token, status):
+    monkeypatch.setitem(client.application.config, 'METRICS_TOKEN', token)
+    headers = {'Authorization': 'Bearer stats-secret'}
+    assert client.get('/api/cache/stats', headers=headers).status_code == status
+    if token:
+        assert client.get('/api/cache/stats').status_code == 401
@@ -0,0 +1,215 @@
+"""Schema tests: migrations upgrade old databases, and the hot queries are
+served by indexes rather than full table scans."""
+import re
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, inspect, text
+
+from extensions import db, like_buffer, schema_migrations
+from migrations import HOT_QUERY_INDEXES, MIGRATIONS, VERSION_INDEXES, version_table
+from models import Connection, Post
+from pagination import encode_cursor, keyset_page
+from timeline import DatabaseTimelineStore, in_network
+
+# "SCAN posts" reads the whole table; "SCAN posts USING INDEX ..." walks an
+# index in order and "SEARCH ..." seeks into one
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+
+# The schema db.create_all() produced before the counter columns and indexes
+LEGACY_SCHEMA = [
+    'CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, '
+    'email VARCHAR(120) NOT NULL UNIQUE, password_hash VARCHAR(128) NOT NULL, bio TEXT, '
+    'avatar VARCHAR(255), job_title VARCHAR(100), location VARCHAR(100), created_at DATETIME)',
+    'CREATE TABLE posts (id INTEGER PRIMARY KEY, content TEXT NOT NULL, created_at DATETIME, '
+    'author_id INTEGER NOT NULL REFERENCES users (id))',
+    'CREATE TABLE post_likes (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), '
+    'post_id INTEGER NOT NULL REFERENCES posts (id), created_at DATETIME, '
+    'CONSTRAINT unique_user_post_like UNIQUE (user_id, post_id))',
+]
+
+
+@contextmanager
+def recorded_statements(app):
+    """Collects the (statement, parameters) of every read, update and delete."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def full_scans(app, statements):
+    scans = []
+    with app.app_context():
+        with db.engine.connect() as conn:
+            for statement, parameters in statements:
+                for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters):
+                    match = FULL_SCAN_RE.match(row.detail)
+                    if match and match.group(1) in db.metadata.tables:
+                        scans.append(f'{row.detail}: {statement}')
+    return scans
+
+
+@pytest.fixture
+def seeded(client, make_user, seed_posts, auth_headers):
+    authors = [make_user(f'Author {i}') for i in range(3)]
+    viewer = make_user('Viewer')
+    post_ids = seed_posts(authors, 4, liker_ids=[viewer])
+    for user_id, other_id in [(viewer, authors[0]), (authors[0], authors[1])]:
+        client.post(f'/api/connections/{other_id}', headers=auth_headers(user_id))
+    # Warm the timelines outside the recorded requests
+    client.get('/api/posts?limit=5')
+    return {'author': authors[0], 'post': post_ids[0], 'headers': auth_headers(viewer),
+            'author_headers': auth_headers(authors[0])}
+
+
+@pytest.mark.parametrize('method, url', [
+    ('GET', '/api/posts'),
+    ('GET', '/api/posts?limit=5'),
+    ('GET', '/api/posts?feed=network&limit=5'),
+    ('GET', '/api/posts?sort=ranked&limit=5'),
+    ('GET', '/api/posts/trending'),
+    ('GET', '/api/posts/user/{author}'),
+    ('GET', '/api/posts/user/{author}?limit=5'),
+    ('GET', '/api/users'),
+    ('GET', '/api/users/{author}'),
+    ('GET', '/api/search?q=Author'),
+    ('GET', '/api/posts/search?q=Post'),
+    ('GET', '/api/connections/{author}'),
+    ('GET', '/api/connections/{author}?limit=5'),
+    ('GET', '/api/connections/{author}/mutual'),
+    ('GET', '/api/connections/suggestions'),
+    ('POST', '/api/posts/{post}/like'),
+    ('DELETE', '/api/posts/{post}'),
+])
+def test_hot_requests_use_indexes(client, seeded, method, url):
+    app = client.application
+    # Only the author may delete a post
+    headers = seeded['author_headers' if method == 'DELETE' else 'headers']
+
+    with recorded_statements(app) as statements:
+        response = client.open(url.format(**seeded), method=method, headers=headers)
+        with app.app_context():
+            like_buffer.flush()
+
+    assert response.status_code == 200, response.get_json()
+    assert statements
+    assert full_scans(app, statements) == []
+
+
+def test_keyset_fallback_uses_indexes(client, seeded):
+    # Pages past the materialized timelines are read straight from posts
+    app = client.application
+    with recorded_statements(app) as statements:
+        with app.app_context():
+            newest = db.session.get(Post, seeded['post'])
+            cursor = encode_cursor(newest.created_at, newest.id)
+            keyset_page(Post.query.filter_by(author_id=seeded['author']), Post, cursor, 5)
+            keyset_page(Post.query, Post, cursor, 5)
+            keyset_page(Post.query.filter(in_network(Post, Connection, seeded['author'])), Post, cursor, 5)
+
+    assert full_scans(app, statements) == []
+
+
+def test_plan_check_catches_a_missing_index(client, seeded):
+    app = client.application
+    with app.app_context():
+        db.session.execute(text('DROP INDEX ix_users_name'))
+        db.session.commit()
+
+    with recorded_statements(app) as statements:
+        client.get('/api/users')
+
+    assert any(scan.startswith('SCAN users') for scan in full_scans(app, statements))
+
+
+def test_upgrade_brings_a_legacy_database_up_to_date(client):
+    app = client.application
+    with app.app_context():
+        db.drop_all()
+        with db.engine.begin() as conn:
+            version_table.drop(conn, checkfirst=True)
+            for statement in LEGACY_SCHEMA:
+                conn.exec_driver_sql(statement)
+            conn.exec_driver_sql(
+                "INSERT INTO users (id, name, email, password_hash, created_at) VALUES "
+                "(1, 'Ada', 'ada@example.com', 'x', '2024-01-01'), "
+                "(2, 'Grace', 'grace@example.com', 'x', '2024-01-01')"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO posts (id, content, created_at, author_id) VALUES "
+                "(1, 'first', '2024-01-02', 1), (2, 'second', '2024-01-03', 1)"
+            )
+            conn.exec_driver_sql("INSERT INTO post_likes (user_id, post_id) VALUES (1, 1), (2, 1)")
+
+        applied = schema_migrations.upgrade()
+
+        assert [step.version for step in applied] == [step.version for step in MIGRATIONS]
+        inspector = inspect(db.engine)
+        indexes = {index['name'] for table in ('users', 'posts', 'post_likes')
+                   for index in inspector.get_indexes(table)}
+        assert {name for name, _, _ in HOT_QUERY_INDEXES + VERSION_INDEXES} <= indexes
+        with db.engine.connect() as conn:
+            assert conn.execute(text('SELECT id, likes_count FROM posts ORDER BY id')).all() == [(1, 2), (2, 0)]
+            assert conn.execute(text('SELECT id, posts_count FROM users ORDER BY id')).all() == [(1, 2), (2, 0)]
+            assert conn.execute(text('SELECT count(*) FROM posts WHERE updated_at = created_at')).scalar() == 2
+        # Everything is recorded, so a second run has nothing to do
+        assert schema_migrations.upgrade() == []
+
+
+def test_upgrade_of_an_empty_database_matches_the_models(client):
+    app = client.application
+    with app.app_context():
+        # Puts timeline_entries in db.metadata
+        DatabaseTimelineStore(10, db)
+        db.drop_all()
+        with db.engine.begin() as conn:
+            version_table.drop(conn, checkfirst=True)
+        schema_migrations.upgrade()
+
+        inspector = inspect(db.engine)
+        for table in db.metadata.sorted_tables:
+            assert {column['name'] for column in inspector.get_columns(table.name)} == set(table.columns.keys())
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            assert {index.name for index in table.indexes} <= indexes, table.name
+        assert {'posts_fts', 'users_fts'} <= set(inspector.get_table_names())
+
+
+class RecordingConnection:
+    """Just enough of a Postgres connection to record what a step runs."""
+    dialect = SimpleNamespace(name='postgresql')
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, parameters=None):
+        self.statements.append(str(statement))
+        return SimpleNamespace(first=lambda: None)
+
+
+def test_postgres_search_indexes_are_built_without_blocking_writes(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'SEARCH_BACKEND', 'auto')
+    steps = {step.name: step for step in MIGRATIONS}
+    columns, indexes = RecordingConnection(), RecordingConnection()
+    with client.application.app_context():
+        steps['search_index'].apply(columns, db.metadata)
+        steps['search_gin_indexes'].apply(indexes, db.metadata)
+
+    assert steps['search_index'].transactional and not steps['search_gin_indexes'].transactional
+    assert [statement.split(' search_vector')[0] for statement in columns.statements] == [
+        'ALTER TABLE posts ADD COLUMN IF NOT EXISTS', 'ALTER TABLE users ADD COLUMN IF NOT EXISTS'
+    ]
+    assert [statement for statement in indexes.statements if statement.startswith('CREATE')] == [
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_search_vector ON posts USING gin (search_vector)',
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_search_vector ON users USING gin (search_vector)',
+    ]
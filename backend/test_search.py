@@ -0,0 +1,39 @@
+"""Full-text search: the index follows posts and profiles, and only recent matches are ranked."""
+import search
+
+
+def post_search(client, query):
+    return [post['id'] for post in client.get(f'/api/posts/search?q={query}').get_json()['posts']]
+
+
+def user_search(client, query):
+    return [user['id'] for user in client.get(f'/api/search?q={query}').get_json()['users']]
+
+
+def test_index_follows_creates_deletes_and_renames(client, make_user, auth_headers):
+    alice = make_user('Alice', job_title='Engineer')
+    headers = auth_headers(alice)
+    post_id = client.post('/api/posts', json={'content': 'Shipping the compiler'}, headers=headers).get_json()['id']
+    assert post_search(client, 'compil') == [post_id]
+    assert post_search(client, 'alice') == [post_id]
+
+    client.put('/api/auth/profile', json={'name': 'Alicia', 'job_title': 'Designer'}, headers=headers)
+    assert user_search(client, 'alicia') == user_search(client, 'designer') == [alice]
+    assert user_search(client, 'engineer') == []
+    # Posts match their author's current name
+    assert post_search(client, 'alicia') == [post_id]
+    assert post_search(client, 'alice') == []
+
+    client.delete(f'/api/posts/{post_id}', headers=headers)
+    assert post_search(client, 'compil') == post_search(client, 'alicia') == []
+
+
+def test_only_the_newest_candidates_are_ranked(client, make_user, auth_headers, monkeypatch):
+    monkeypatch.setattr(search, 'CANDIDATE_LIMIT', 2)
+    headers = auth_headers(make_user('Author'))
+    oldest, *newer = [
+        client.post('/api/posts', json={'content': content}, headers=headers).get_json()['id']
+        for content in ('launch launch launch', 'launch day', 'launch party')
+    ]
+    # The best match is past the candidate window
+    assert sorted(post_search(client, 'launch')) == newer
@@ -0,0 +1,32 @@
+"""Streamed list responses carry the same rows as the buffered ones."""
+import json
+
+import pytest
+
+import streaming
+
+
+@pytest.mark.parametrize('url', ['/api/posts', '/api/posts/user/1', '/api/users'])
+def test_streamed_lists_match_buffered(client, make_user, seed_posts, auth_headers, monkeypatch, url):
+    # Several batches, including a short last one
+    monkeypatch.setattr(streaming, 'STREAM_BATCH_SIZE', 4)
+    authors = [make_user(f'Author {i}') for i in range(3)]
+    viewer = make_user('Viewer')
+    seed_posts(authors, 5, liker_ids=[viewer])
+    headers = auth_headers(viewer)
+
+    buffered = client.get(url, headers=headers).get_json()
+    # Read each body before the next request; a streamed one keeps its context open
+    array = json.loads(client.get(f'{url}?stream=json', headers=headers).data)
+    lines = client.get(f'{url}?stream=ndjson', headers=headers)
+    mimetype, body = lines.mimetype, lines.data
+
+    assert array == buffered
+    assert [json.loads(line) for line in body.decode().splitlines()] == buffered
+    assert mimetype == 'application/x-ndjson'
+    assert client.get(f'{url}?stream=xml').status_code == 400
+
+
+def test_streaming_an_empty_list(client):
+    assert client.get('/api/posts?stream=json').get_json() == []
+    assert client.get('/api/posts?stream=ndjson').data == b''
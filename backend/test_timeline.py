@@ -0,0 +1,178 @@
+"""Materialized timelines: fan-out, retraction, prolific merges and the capped window."""
+import copy
+import threading
+from collections import OrderedDict
+
+import pytest
+
+import routes.posts
+from extensions import connection_graph, db, timelines
+from timeline import PUBLIC, DatabaseTimelineStore, MemoryTimelineStore, home_key
+
+
+@pytest.fixture(params=['memory', 'database'])
+def store(request, client, monkeypatch):
+    """Run a test against each store; ``store(max_length)`` swaps one in."""
+    def _store(max_length=800):
+        with client.application.app_context():
+            if request.param == 'memory':
+                new = MemoryTimelineStore(max_length)
+            else:
+                new = DatabaseTimelineStore(max_length, db)
+                new.table.create(db.engine, checkfirst=True)
+                new.clear()
+        monkeypatch.setattr(timelines, 'store', new)
+        monkeypatch.setattr(timelines, 'max_length', max_length)
+        return new
+    return _store
+
+
+@pytest.fixture
+def other_worker(monkeypatch):
+    """Timelines of a second worker: the same store, its own prolific
+    authors and connection lists. ``other_worker(True)`` also makes it the
+    one serving the post routes."""
+    def _other_worker(serves_posts=False):
+        graph = copy.copy(connection_graph)
+        graph._lists, graph._size, graph._lock = OrderedDict(), 0, threading.Lock()
+        other = copy.copy(timelines)
+        other.graph, other._prolific = graph, None
+        monkeypatch.setattr(routes.posts, 'timelines', other if serves_posts else timelines)
+        return other
+    return _other_worker
+
+
+def post(client, headers, content='hello'):
+    return client.post('/api/posts', json={'content': content}, headers=headers).get_json()['id']
+
+
+def feed_ids(client, url, headers=None):
+    """Post ids of every page of a feed, following the cursors."""
+    ids, cursor = [], None
+    while True:
+        page = client.get(url + (f'&cursor={cursor}' if cursor else ''), headers=headers).get_json()
+        ids += [item['id'] for item in page['posts']]
+        cursor = page['next_cursor']
+        if not cursor:
+            return ids
+
+
+def stored_ids(client, key):
+    with client.application.app_context():
+        entries, _ = timelines.store.slice(key, None, 100)
+    return [post_id for _, post_id in entries]
+
+
+def test_posts_fan_out_to_connections_and_are_retracted(client, make_user, auth_headers, store):
+    store()
+    author, reader, stranger = make_user('Author'), make_user('Reader'), make_user('Stranger')
+    author_headers, reader_headers = auth_headers(author), auth_headers(reader)
+    client.post(f'/api/connections/{author}', headers=reader_headers)
+    for user_headers in (reader_headers, auth_headers(stranger)):
+        # Loads the home timelines, so the post below is fanned out, not read
+        assert feed_ids(client, '/api/posts?feed=network&limit=5', user_headers) == []
+
+    post_id = post(client, author_headers)
+    assert stored_ids(client, home_key(reader)) == [post_id]
+    assert stored_ids(client, home_key(stranger)) == []
+    assert feed_ids(client, '/api/posts?feed=network&limit=5', reader_headers) == [post_id]
+    assert feed_ids(client, '/api/posts?limit=5') == [post_id]
+
+    client.delete(f'/api/posts/{post_id}', headers=author_headers)
+    assert stored_ids(client, home_key(reader)) == []
+    assert stored_ids(client, PUBLIC) == []
+    assert feed_ids(client, '/api/posts?feed=network&limit=5', reader_headers) == []
+
+    # Disconnecting drops the reader's home timeline; it reloads without the author
+    kept = post(client, author_headers)
+    client.delete(f'/api/connections/{author}', headers=reader_headers)
+    assert feed_ids(client, '/api/posts?feed=network&limit=5', reader_headers) == []
+    assert feed_ids(client, '/api/posts?feed=network&limit=5', author_headers) == [kept]
+    assert client.get('/api/posts?feed=network&limit=5').status_code == 401
+
+
+def test_prolific_authors_are_merged_on_read(client, make_user, auth_headers, seed_posts, store, monkeypatch):
+    store()
+    monkeypatch.setattr(timelines, 'prolific_threshold', 3)
+    prolific, regular, reader = make_user('Prolific'), make_user('Regular'), make_user('Reader')
+    seeded = seed_posts([prolific], 3)
+    client.post(f'/api/connections/{prolific}', headers=auth_headers(reader))
+    assert feed_ids(client, '/api/posts?limit=2') == seeded[::-1]
+
+    newest = [post(client, auth_headers(user), f'by {user}') for user in (prolific, regular, prolific)]
+    # Not fanned out: read from the author's own timeline instead
+    assert stored_ids(client, PUBLIC) == [newest[1]]
+    assert feed_ids(client, '/api/posts?limit=2')[:3] == newest[::-1]
+    assert feed_ids(client, '/api/posts?feed=network&limit=2', auth_headers(reader))[:2] == [newest[2], newest[0]]
+
+
+def test_pages_past_the_capped_window_read_the_posts_table(client, make_user, auth_headers, seed_posts, store):
+    store(max_length=3)
+    author = make_user('Author')
+    seeded = seed_posts([author], 4)
+    newer = [post(client, auth_headers(author), f'new {i}') for i in range(2)]
+
+    expected = newer[::-1] + seeded[::-1]
+    assert stored_ids(client, PUBLIC) == []  # loaded by the first read
+    assert feed_ids(client, '/api/posts?limit=2') == expected
+    assert stored_ids(client, PUBLIC) == expected[:3]
+    assert feed_ids(client, f'/api/posts/user/{author}?limit=4') == expected
+
+
+def test_posts_created_during_a_load_are_kept(client, make_user, auth_headers, store, monkeypatch):
+    store()
+    author = make_user('Author')
+    headers = auth_headers(author)
+    first = post(client, headers)
+
+    # Another request creates a post between the load's query and its write
+    load = timelines.store.load
+
+    def racing_load(key, entries):
+        monkeypatch.setattr(timelines.store, 'load', load)
+        later.append(post(client, headers))
+        load(key, entries)
+
+    later = []
+    monkeypatch.setattr(timelines.store, 'load', racing_load)
+    assert feed_ids(client, '/api/posts?limit=5') == later + [first]
+    assert stored_ids(client, PUBLIC) == later + [first]
+
+
+def test_workers_agree_on_prolific_authors(client, make_user, auth_headers, store, other_worker, monkeypatch):
+    store()
+    monkeypatch.setattr(timelines, 'prolific_threshold', 3)
+    author = make_user('Author')
+    headers = auth_headers(author)
+    other = other_worker()
+
+    def other_ids():
+        # Read once its prolific authors have expired; until then it may
+        # show the feed as it was when it last read them
+        other._prolific_at -= other.prolific_ttl
+        with client.application.app_context():
+            return [post_id for _, post_id in other.public(None, 10)]
+
+    assert other_ids() == []
+    created = [post(client, headers, f'post {i}') for i in range(5)]
+    assert feed_ids(client, '/api/posts?limit=10') == other_ids() == created[::-1]
+
+    # Back under the threshold: the posts made while prolific stay visible
+    for post_id in created[:3]:
+        client.delete(f'/api/posts/{post_id}', headers=headers)
+    assert feed_ids(client, '/api/posts?limit=10') == other_ids() == created[:2:-1]
+
+
+def test_fan_out_reaches_connections_made_on_another_worker(client, make_user, auth_headers, store, other_worker):
+    store()
+    author, reader = make_user('Author'), make_user('Reader')
+    reader_headers = auth_headers(reader)
+    other = other_worker(serves_posts=True)
+    first = post(client, auth_headers(author))
+    with client.application.app_context():
+        assert list(other.graph.connections_of(author)) == []  # cached before the connect
+
+    client.post(f'/api/connections/{author}', headers=reader_headers)
+    assert feed_ids(client, '/api/posts?feed=network&limit=5', reader_headers) == [first]
+    second = post(client, auth_headers(author))
+    assert feed_ids(client, '/api/posts?feed=network&limit=5', reader_headers) == [second, first]
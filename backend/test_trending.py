@@ -0,0 +1,130 @@
+"""Trending posts: bucketed counters, the incremental top K and snapshots."""
+import random
+from collections import Counter
+
+import pytest
+
+from extensions import db, like_buffer, trending
+from models import TrendingBucket
+from trending import Window
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(trending, 'clock', lambda: now[0])
+    return now
+
+
+def like(client, auth_headers, post_id, *user_ids):
+    for user_id in user_ids:
+        assert client.post(f'/api/posts/{post_id}/like', headers=auth_headers(user_id)).status_code == 200
+
+
+def trending_posts(client, window='1h'):
+    response = client.get(f'/api/posts/trending?window={window}&fields=content')
+    assert response.status_code == 200, response.get_json()
+    return [(post['id'], post['trending_likes']) for post in response.get_json()['posts']]
+
+
+def test_windows_slide_and_survive_a_restart(client, make_user, seed_posts, auth_headers, clock):
+    users = [make_user(f'User {i}') for i in range(3)]
+    first, second, third = seed_posts(users[:1], 3)
+
+    like(client, auth_headers, first, *users)
+    clock[0] += 2 * 3600
+    like(client, auth_headers, second, *users[:2])
+    like(client, auth_headers, third, users[0])
+    like(client, auth_headers, third, users[0])  # unliked again
+    assert trending_posts(client) == [(second, 2)]
+    assert trending_posts(client, '24h') == [(first, 3), (second, 2)]
+
+    # Flushed in the likes' transaction, so a fresh process reloads the same window
+    with client.application.app_context():
+        like_buffer.flush()
+    trending.clear()
+    assert trending_posts(client, '24h') == [(first, 3), (second, 2)]
+    clock[0] += 23 * 3600
+    assert trending_posts(client, '24h') == [(second, 2)]
+
+    # Another worker's flush shows up at the next refresh
+    with client.application.app_context():
+        bucket_start = int(clock[0] // trending.bucket_seconds) * trending.bucket_seconds
+        db.session.add(TrendingBucket(bucket_start=bucket_start, post_id=third, likes=5))
+        db.session.commit()
+    assert trending_posts(client) == []
+    clock[0] += client.application.config['TRENDING_REFRESH_INTERVAL']
+    assert trending_posts(client) == [(third, 5)]
+
+    client.delete(f'/api/posts/{third}', headers=auth_headers(users[0]))
+    assert trending_posts(client, '24h') == [(second, 2)]
+    assert client.get('/api/posts/trending?window=1w').status_code == 400
+
+
+def test_incremental_top_k_matches_a_full_sort():
+    rng = random.Random(0)
+    window, exact = Window(span=12, k=10), Counter()
+    for _ in range(5000):
+        post_id = int(rng.paretovariate(1.2)) % 500
+        window.add(post_id, 1)
+        exact[post_id] += 1
+        assert len(window.heap) <= 4 * window.k + 1
+    expected = sorted(exact.items(), key=lambda item: (-item[1], -item[0]))[:10]
+    assert window.top(10) == expected
+    # Unlikes are exact again after the next rollover
+    for post_id, _ in expected[:3]:
+        window.add(post_id, -exact[post_id])
+        del exact[post_id]
+    window.rebuild()
+    assert window.top(10) == sorted(exact.items(), key=lambda item: (-item[1], -item[0]))[:10]
+
+
+def test_refreshes_overlapping_a_flush_count_each_like_once(client, make_user, seed_posts, auth_headers, clock,
+                                                            monkeypatch):
+    monkeypatch.setattr(like_buffer, 'enabled', False)  # every toggle flushes before responding
+    users = [make_user(f'User {i}') for i in range(3)]
+    [post_id] = seed_posts(users[:1], 1)
+    assert trending_posts(client) == []
+
+    # Read after the flush committed, before it marked the counts saved
+    hooks = like_buffer.after_flush
+    monkeypatch.setattr(like_buffer, 'after_flush', [lambda post_ids: trending.refresh(), *hooks])
+    like(client, auth_headers, post_id, users[0])
+    assert trending_posts(client) == [(post_id, 1)]
+    monkeypatch.setattr(like_buffer, 'after_flush', hooks)
+
+    # Read before another flush committed, merged after it marked them saved
+    read = trending._read
+
+    def racing_read(first):
+        monkeypatch.setattr(trending, '_read', read)
+        result = read(first)
+        like(client, auth_headers, post_id, users[1])
+        return result
+
+    clock[0] += client.application.config['TRENDING_REFRESH_INTERVAL']
+    monkeypatch.setattr(trending, '_read', racing_read)
+    assert trending_posts(client) == [(post_id, 1)]  # a flush behind, and read again
+    assert trending_posts(client) == [(post_id, 2)]
+    clock[0] += client.application.config['TRENDING_REFRESH_INTERVAL']
+    assert trending_posts(client) == [(post_id, 2)]
+
+
+def test_a_failed_flush_leaves_its_counts_unsaved(client, make_user, seed_posts, auth_headers, clock, monkeypatch):
+    monkeypatch.setattr(like_buffer, 'enabled', False)
+    user = make_user('User')
+    [post_id] = seed_posts([user], 1)
+
+    def failing(post_ids):
+        raise RuntimeError('database is locked')
+
+    hooks = like_buffer.before_commit
+    monkeypatch.setattr(like_buffer, 'before_commit', [*hooks, failing])
+    like(client, auth_headers, post_id, user)
+    assert trending_posts(client) == [(post_id, 1)]
+
+    monkeypatch.setattr(like_buffer, 'before_commit', hooks)
+    with client.application.app_context():
+        like_buffer.flush()
+    clock[0] += client.application.config['TRENDING_REFRESH_INTERVAL']
+    assert trending_posts(client) == [(post_id, 1)]
@@ -0,0 +1,64 @@
+"""The viewer resolver: token checks, the token LRU and the cached profile."""
+from datetime import timedelta
+
+from flask_jwt_extended import create_access_token, create_refresh_token
+
+from extensions import db, viewer_resolver
+from models import User
+from viewer import LRUCache
+
+
+def profile(client, headers):
+    return client.get('/api/auth/profile', headers=headers)
+
+
+def test_tokens_resolve_once_and_bad_ones_are_rejected(client, make_user, auth_headers):
+    alice = make_user('Alice')
+    headers = auth_headers(alice)
+    [token] = [value.split(' ', 1)[1] for value in headers.values()]
+
+    assert profile(client, headers).get_json()['id'] == alice
+    assert viewer_resolver.tokens.get(token) == alice
+
+    with client.application.app_context():
+        refresh = create_refresh_token(identity=str(alice))
+        not_a_user = create_access_token(identity='alice')
+        expired = create_access_token(identity=str(alice), expires_delta=timedelta(seconds=-1))
+    for bad in (refresh, not_a_user, expired):
+        response = profile(client, {'Authorization': f'Bearer {bad}'})
+        assert response.status_code == 401, response.get_json()
+    assert profile(client, {'Authorization': 'Bearer not-a-jwt'}).status_code == 422
+    assert profile(client, {'Authorization': f'Token {token}'}).status_code == 422
+
+
+def test_profile_edits_on_another_worker_show_at_once(client, make_user, auth_headers):
+    alice = make_user('Alice')
+    headers = auth_headers(alice)
+    assert profile(client, headers).get_json()['job_title'] == ''
+    assert viewer_resolver.profiles.get(alice) is not None
+
+    # Written by another process: this worker's copy is never dropped
+    with client.application.app_context():
+        db.session.get(User, alice).job_title = 'Engineer'
+        db.session.commit()
+    assert profile(client, headers).get_json()['job_title'] == 'Engineer'
+
+    client.post('/api/posts', json={'content': 'hello'}, headers=headers)
+    assert profile(client, headers).get_json()['posts_count'] == 1
+
+
+def test_lru_evicts_least_recently_used_and_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('viewer.time.time', lambda: now[0])
+    cache = LRUCache(2)
+    cache.set('a', 1, now[0] + 10)
+    cache.set('b', 2, now[0] + 10)
+    assert cache.get('a') == 1  # now the most recently used
+    cache.set('c', 3, now[0] + 10)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+    now[0] += 10
+    assert cache.get('a') is None
+    cache.set('d', 4, now[0] + 10)
+    cache.pop('d')
+    assert cache.get('d') is None
@@ -0,0 +1,458 @@
+"""Materialized public, home and author timelines.
+
+Each timeline is a list of ``(created_at, post_id)`` entries, newest first,
+capped at ``TIMELINE_MAX_LENGTH``, so reading a feed page is a bounded slice
+instead of a sort over the whole ``posts`` table.
+
+* ``public``: every post, for ``GET /api/posts``.
+* ``home:<id>``: posts by the user and their connections, for
+  ``GET /api/posts?feed=network``.
+* ``author:<id>``: one author's posts.
+
+* Fan-out-on-write: ``post_created`` pushes the post into the author's
+  timeline and into every timeline returned by ``Timelines.fanout_keys``:
+  the public one and the home timelines of the author and their
+  connections (read fresh from the connections table, so a connect made
+  by another worker is not missed).
+* Fan-out-on-read: authors with at least ``TIMELINE_PROLIFIC_THRESHOLD``
+  posts are not fanned out; their author timelines are merged in when a
+  public or home timeline is read.
+
+Timelines are loaded from ``posts`` when first read, key by key, and only
+loaded timelines receive fan-out writes. A post created while its timeline
+is being loaded is kept: the store records writes from the start of the
+load. Connecting or disconnecting drops both users' home timelines, which
+then reload.
+
+Which authors are prolific is read from ``users.posts_count``: again
+whenever a public or home timeline loads, and at least every
+``TIMELINE_PROLIFIC_TTL`` seconds. An author crossing the threshold, either
+way, drops the public timeline and the home timelines the author fans out
+to. They reload in whichever worker reads them next, with that worker's
+prolific authors reread; the other workers merge the author's timeline in
+(or stop) once theirs expire.
+
+A slice reports how it ended. A short slice of a timeline that holds every
+post is the end of the feed; one of a timeline that reached the cap means
+older posts have to be paged from the ``posts`` table instead (``None``).
+
+Stores are pluggable via ``TIMELINE_BACKEND``: ``memory`` (per process, so
+only for a single worker: posts created by other workers never reach it) or
+``database`` (a ``timeline_entries`` table in the app's database, the
+default whenever ``WEB_CONCURRENCY`` asks for more than one worker).
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+from importlib import import_module
+
+from sqlalchemy import bindparam, literal, or_, select, tuple_
+
+PUBLIC = 'public'
+FEEDS = ('all', 'network')
+
+# How a slice ended: at the oldest entry of a timeline that holds every
+# post (COMPLETE) or of one that reached the cap (CAPPED), or on a timeline
+# that isn't loaded (UNLOADED). None: entries older than the slice remain.
+COMPLETE, CAPPED, UNLOADED = 'complete', 'capped', 'unloaded'
+
+# Keys per statement when fanning out; under SQLite's bound-parameter limit
+FANOUT_BATCH = 500
+
+
+class FeedError(ValueError):
+    """Raised for an unknown ``feed`` parameter."""
+
+
+def parse_feed(args):
+    feed = args.get('feed') or 'all'
+    if feed not in FEEDS:
+        raise FeedError(f"feed must be one of: {', '.join(FEEDS)}")
+    return feed
+
+
+def author_key(author_id):
+    return f'author:{author_id}'
+
+
+def home_key(user_id):
+    return f'home:{user_id}'
+
+
+def in_network(Post, Connection, user_id):
+    """Criterion for posts by ``user_id`` or one of their connections."""
+    return or_(Post.author_id == user_id, Post.author_id.in_(
+        select(Connection.connection_id).where(Connection.user_id == user_id)
+    ))
+
+
+class MemoryTimelineStore:
+    """Timelines as ascending lists in a dict; lost on restart and re-warmed."""
+
+    def __init__(self, max_length):
+        self.max_length = max_length
+        self._timelines = {}
+        self._capped = set()  # keys that reached max_length
+        self._loading = {}    # key -> [(entry, added)] written during its load
+        self._lock = threading.Lock()
+
+    def begin_load(self, key):
+        with self._lock:
+            if key not in self._timelines:
+                self._loading.setdefault(key, [])
+
+    def load(self, key, entries):
+        with self._lock:
+            writes = self._loading.pop(key, None)
+            if writes is None or key in self._timelines:
+                return  # loaded by another thread, or dropped meanwhile
+            entries = set(entries)
+            for entry, added in writes:
+                if added:
+                    entries.add(entry)
+                else:
+                    entries.discard(entry)
+            self._timelines[key] = sorted(entries)[-self.max_length:]
+            if len(self._timelines[key]) == self.max_length:
+                self._capped.add(key)
+
+    def add(self, keys, entry):
+        with self._lock:
+            for key in keys:
+                timeline = self._timelines.get(key)
+                if timeline is None:
+                    if key in self._loading:
+                        self._loading[key].append((entry, True))
+                    continue  # not loaded; its load will read the post
+                insort(timeline, entry)
+                if len(timeline) > self.max_length:
+                    del timeline[0]
+                if len(timeline) == self.max_length:
+                    self._capped.add(key)
+
+    def remove(self, keys, entry):
+        with self._lock:
+            for key in keys:
+                timeline = self._timelines.get(key)
+                if timeline is None:
+                    if key in self._loading:
+                        self._loading[key].append((entry, False))
+                    continue
+                index = bisect_left(timeline, entry)
+                if index < len(timeline) and timeline[index] == entry:
+                    del timeline[index]
+
+    def drop(self, keys):
+        with self._lock:
+            for key in keys:
+                self._timelines.pop(key, None)
+                self._capped.discard(key)
+                self._loading.pop(key, None)
+
+    def slice(self, key, before, limit):
+        """Newest-first entries strictly older than ``before``, and how the slice ended."""
+        with self._lock:
+            timeline = self._timelines.get(key)
+            if timeline is None:
+                return [], UNLOADED
+            end = bisect_left(timeline, before) if before else len(timeline)
+            start = max(0, end - limit)
+            if start:
+                ended = None
+            else:
+                ended = CAPPED if key in self._capped else COMPLETE
+            return timeline[start:end][::-1], ended
+
+    def clear(self):
+        with self._lock:
+            self._timelines.clear()
+            self._capped.clear()
+            self._loading.clear()
+
+
+class DatabaseTimelineStore:
+    """Timelines in a ``timeline_entries`` table; survives restarts.
+
+    Every loaded timeline has one marker row, older than any post, whose
+    ``post_id`` says whether it is still loading or has reached the cap. A
+    slice that runs into it learns how it ended without another query, and
+    fan-out writes only go to keys that have one.
+    """
+
+    # Marker post ids
+    MARKERS = {0: COMPLETE, -1: CAPPED, -2: UNLOADED}
+    COMPLETE_ID, CAPPED_ID, LOADING_ID = 0, -1, -2
+    MARKED_AT = datetime(1, 1, 1)
+
+    def __init__(self, max_length, db):
+        self.max_length = max_length
+        self.db = db
+        self.table = db.Table(
+            'timeline_entries',
+            db.Column('timeline_key', db.String(64), primary_key=True),
+            db.Column('created_at', db.DateTime, primary_key=True),
+            db.Column('post_id', db.Integer, primary_key=True),
+            extend_existing=True,
+        )
+
+    def _insert(self):
+        """INSERT that skips rows already there (a load and a fan-out can both write one)."""
+        dialect = self.db.session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            return import_module(f'sqlalchemy.dialects.{dialect}').insert(self.table).on_conflict_do_nothing()
+        return self.table.insert()
+
+    def _newest(self, key, offset):
+        """The real entry ``offset`` places from the newest of ``key``."""
+        c = self.table.c
+        return select(c.created_at, c.post_id).where(c.timeline_key == key, c.post_id > 0).order_by(
+            c.created_at.desc(), c.post_id.desc()
+        ).offset(offset).limit(1)
+
+    def _trim(self, session, keys):
+        """Drop entries past the cap and mark full timelines capped, in two statements."""
+        if not keys:
+            return
+        c = self.table.c
+        key = bindparam('key')
+        params = [{'key': key_} for key_ in keys]
+        session.execute(self.table.delete().where(
+            c.timeline_key == key, c.post_id > 0,
+            tuple_(c.created_at, c.post_id) < self._newest(key, self.max_length - 1).scalar_subquery()
+        ), params)
+        session.execute(self.table.update().where(
+            c.timeline_key == key, c.post_id <= 0, c.post_id != self.CAPPED_ID,
+            self._newest(key, self.max_length - 1).exists()
+        ).values(post_id=self.CAPPED_ID), params)
+
+    def begin_load(self, key):
+        c = self.table.c
+        session = self.db.session
+        # Committed first, so other workers' fan-out writes reach the key
+        # while its posts are read
+        marked = select(c.timeline_key).where(c.timeline_key == key, c.post_id <= 0)
+        session.execute(self._insert().from_select(
+            ['timeline_key', 'created_at', 'post_id'],
+            select(literal(key), literal(self.MARKED_AT, self.table.c.created_at.type), literal(self.LOADING_ID))
+            .where(~marked.exists())
+        ))
+        session.commit()
+
+    def load(self, key, entries):
+        session = self.db.session
+        if entries:
+            session.execute(self._insert(), [
+                {'timeline_key': key, 'created_at': created_at, 'post_id': post_id}
+                for created_at, post_id in entries
+            ])
+        self._trim(session, [key])
+        c = self.table.c
+        session.execute(self.table.update().where(
+            c.timeline_key == key, c.post_id == self.LOADING_ID
+        ).values(post_id=self.COMPLETE_ID))
+        session.commit()
+
+    def add(self, keys, entry):
+        session = self.db.session
+        c = self.table.c
+        keys = list(keys)
+        for start in range(0, len(keys), FANOUT_BATCH):
+            batch = keys[start:start + FANOUT_BATCH]
+            # One row per loaded key: those with a marker
+            session.execute(self._insert().from_select(
+                ['timeline_key', 'created_at', 'post_id'],
+                select(c.timeline_key, literal(entry[0], c.created_at.type), literal(entry[1])).where(
+                    c.timeline_key.in_(batch), c.post_id <= 0
+                )
+            ))
+        self._trim(session, keys)
+        session.commit()
+
+    def remove(self, keys, entry):
+        c = self.table.c
+        keys = list(keys)
+        for start in range(0, len(keys), FANOUT_BATCH):
+            self.db.session.execute(self.table.delete().where(
+                c.timeline_key.in_(keys[start:start + FANOUT_BATCH]),
+                c.created_at == entry[0], c.post_id == entry[1]
+            ))
+        self.db.session.commit()
+
+    def drop(self, keys):
+        self.db.session.execute(self.table.delete().where(self.table.c.timeline_key.in_(list(keys))))
+        self.db.session.commit()
+
+    def slice(self, key, before, limit):
+        c = self.table.c
+        query = select(c.created_at, c.post_id).where(c.timeline_key == key)
+        if before:
+            query = query.where(tuple_(c.created_at, c.post_id) < tuple_(*before))
+        query = query.order_by(c.created_at.desc(), c.post_id.desc()).limit(limit)
+        rows = [tuple(row) for row in self.db.session.execute(query)]
+        if rows and rows[-1][1] <= 0:
+            return rows[:-1], self.MARKERS[rows[-1][1]]
+        # Short without a marker: never loaded, or dropped
+        return rows, None if len(rows) == limit else UNLOADED
+
+    def clear(self):
+        self.db.session.execute(self.table.delete())
+        self.db.session.commit()
+
+
+class Timelines:
+    """Flask extension maintaining the timelines from the post write paths."""
+
+    def __init__(self, app=None, db=None, Post=None, User=None, Connection=None, graph=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app, db, Post, User, Connection, graph)
+
+    def init_app(self, app, db, Post, User, Connection, graph):
+        self.db, self.Post, self.User, self.Connection, self.graph = db, Post, User, Connection, graph
+        app.config.setdefault('TIMELINE_BACKEND', 'memory')
+        app.config.setdefault('TIMELINE_MAX_LENGTH', 800)
+        app.config.setdefault('TIMELINE_PROLIFIC_THRESHOLD', 1000)
+        app.config.setdefault('TIMELINE_PROLIFIC_TTL', 10)
+        self.max_length = app.config['TIMELINE_MAX_LENGTH']
+        self.prolific_threshold = app.config['TIMELINE_PROLIFIC_THRESHOLD']
+        self.prolific_ttl = app.config['TIMELINE_PROLIFIC_TTL']
+        if app.config['TIMELINE_BACKEND'] == 'database':
+            self.store = DatabaseTimelineStore(self.max_length, db)
+        else:
+            self.store = MemoryTimelineStore(self.max_length)
+        self._prolific, self._prolific_at = None, 0.0
+        app.extensions['timelines'] = self
+
+    def fanout_keys(self, author_id):
+        """Public and home timelines a new post by ``author_id`` is written into."""
+        connections = self.graph.connections_of(author_id, fresh=True)
+        return [PUBLIC, home_key(author_id)] + [home_key(user_id) for user_id in connections]
+
+    # Prolific authors (fan-out-on-read)
+
+    @property
+    def prolific_authors(self):
+        now = time.monotonic()
+        if self._prolific is None or now - self._prolific_at >= self.prolific_ttl:
+            User = self.User
+            self._prolific = {user_id for (user_id,) in self.db.session.query(User.id).filter(
+                User.posts_count >= self.prolific_threshold
+            )}
+            self._prolific_at = now
+        return self._prolific
+
+    def _crossed(self, author_id, posts_count):
+        """Whether ``author_id`` just became prolific or stopped being so.
+        If so, drops the timelines that hold (or lack) their posts and
+        rereads the prolific authors."""
+        prolific = posts_count >= self.prolific_threshold
+        if prolific == (author_id in self.prolific_authors):
+            return False
+        self.store.drop(self.fanout_keys(author_id))
+        self._prolific = None
+        return True
+
+    # Loading
+
+    def _source_query(self, key, *columns):
+        Post = self.Post
+        query = self.db.session.query(*columns)
+        kind, _, user_id = key.partition(':')
+        if kind == 'author':
+            return query.filter(Post.author_id == int(user_id))
+        if kind == 'home':
+            query = query.filter(in_network(Post, self.Connection, int(user_id)))
+        # Prolific authors are merged in on read
+        if self.prolific_authors:
+            query = query.filter(Post.author_id.notin_(self.prolific_authors))
+        return query
+
+    def _load(self, key):
+        Post = self.Post
+        kind, _, user_id = key.partition(':')
+        if kind != 'author':
+            # Another worker may have dropped it because an author crossed the
+            # threshold, or because the user connected
+            self._prolific = None
+            if kind == 'home':
+                self.graph.connections_of(int(user_id), fresh=True)
+        self.store.begin_load(key)
+        rows = self._source_query(key, Post.created_at, Post.id).order_by(
+            Post.created_at.desc(), Post.id.desc()
+        ).limit(self.max_length).all()
+        self.store.load(key, [tuple(row) for row in rows])
+
+    def rebuild(self):
+        """Drop every timeline; each reloads from ``posts`` when next read."""
+        self.store.clear()
+        self._prolific = None
+
+    # Write paths; call after the transaction has committed
+
+    def post_created(self, post):
+        entry = (post.created_at, post.id)
+        keys = [author_key(post.author_id)]
+        posts_count = post.author.posts_count
+        if not self._crossed(post.author_id, posts_count) and posts_count < self.prolific_threshold:
+            keys += self.fanout_keys(post.author_id)
+        self.store.add(keys, entry)
+
+    def post_deleted(self, post_id, author_id, created_at):
+        User = self.User
+        posts_count = self.db.session.query(User.posts_count).filter(User.id == author_id).scalar() or 0
+        keys = [author_key(author_id)]
+        if not self._crossed(author_id, posts_count):
+            keys += self.fanout_keys(author_id)
+        self.store.remove(keys, (created_at, post_id))
+
+    def network_changed(self, *user_ids):
+        """Drop the home timelines of users who connected or disconnected."""
+        self.store.drop([home_key(user_id) for user_id in user_ids])
+
+    # Reads
+
+    def _read(self, key, before, limit):
+        """Up to ``limit`` entries, or None once the capped window runs out."""
+        entries, ended = self.store.slice(key, before, limit)
+        if ended == UNLOADED:
+            self._load(key)
+            entries, ended = self.store.slice(key, before, limit)
+        if ended == UNLOADED or (ended == CAPPED and len(entries) < limit):
+            # Older posts may be missing; the caller pages the posts table instead
+            return None
+        return entries
+
+    def _merged(self, key, merges, before, limit):
+        """``key``'s entries merged with the author timelines of the
+        prolific authors ``merges`` accepts."""
+        # Read first: a reload rereads the prolific authors
+        sources = [self._read(key, before, limit)]
+        authors = [author_id for author_id in sorted(self.prolific_authors) if merges(author_id)]
+        sources += [self._read(author_key(author_id), before, limit) for author_id in authors]
+        if any(entries is None for entries in sources):
+            return None
+        # An author who became prolific can appear in both timelines
+        merged = []
+        for entry in heapq.merge(*sources, reverse=True):
+            if not merged or merged[-1] != entry:
+                merged.append(entry)
+            if len(merged) == limit:
+                break
+        return merged
+
+    def public(self, before, limit):
+        """Newest-first ``(created_at, post_id)`` entries for a page of every post."""
+        return self._merged(PUBLIC, lambda author_id: True, before, limit)
+
+    def home(self, user_id, before, limit):
+        """Entries for a page of posts by ``user_id`` and their connections."""
+        return self._merged(
+            home_key(user_id),
+            lambda author_id: author_id == user_id or self.graph.is_connected(user_id, author_id),
+            before, limit
+        )
+
+    def author(self, author_id, before, limit):
+        return self._read(author_key(author_id), before, limit)
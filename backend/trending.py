@@ -0,0 +1,348 @@
+"""Trending posts: net likes per post over sliding windows.
+
+    GET /api/posts/trending?window=1h&limit=20
+
+``toggle_like_post`` adds +1 or -1 for the post to the current time bucket
+(``TRENDING_BUCKET_SECONDS`` wide). Each window in ``TRENDING_WINDOWS``
+keeps running totals over its buckets: a toggle adds to them, and a bucket
+sliding out of the window is subtracted once, so nothing rescans
+``post_likes``.
+
+Each window also keeps its ``TRENDING_TOP_K`` leaders, with a min-heap over
+them. A post that gains likes enters when it passes the weakest leader, in
+O(log K); heap entries left behind by count changes are skipped when they
+surface. A leader that loses likes keeps its place until a rival overtakes
+it or the next bucket rolls over. At that point the leaders are chosen again
+from the totals. Reads sort the K leaders only.
+
+Bucket counts are persisted to ``trending_buckets`` in the like buffer's
+flush transaction. The windows are loaded from that table on first use, so
+a restart keeps them. Every ``TRENDING_REFRESH_INTERVAL`` seconds after
+that, the buckets written since the last read are read again, which picks
+up other workers' likes. Toggles from this worker that are not yet flushed
+are kept across reads.
+
+A read that overlaps one of this worker's flushes can't tell whether the
+flushed counts are in the table yet: they may be there and still unsaved,
+or already dropped from the unsaved counts and not there. ``saved`` bumps
+an epoch, and a read that saw it change or a save running leaves out the
+counts being saved and is repeated at the next request. The window may lag
+by one flush for that long, but never counts a toggle twice.
+"""
+import heapq
+import os
+import threading
+import time
+from collections import Counter
+from importlib import import_module
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = ('postgresql', 'sqlite')
+
+
+class TrendingWindowError(ValueError):
+    """Raised for a ``window`` parameter that isn't configured."""
+
+
+class Window:
+    """Running totals over the last ``span`` buckets and their top K."""
+
+    def __init__(self, span, k):
+        self.span, self.k = span, k
+        self.first = None  # oldest bucket index still counted
+        self.totals = Counter()
+        self.leaders = {}  # post_id -> count
+        self.heap = []     # (count, post_id) of the leaders, stale entries included
+
+    def add(self, post_id, delta):
+        count = self.totals[post_id] + delta
+        if count:
+            self.totals[post_id] = count
+        else:
+            del self.totals[post_id]
+
+        if post_id in self.leaders:
+            if count > 0:
+                self.leaders[post_id] = count
+                heapq.heappush(self.heap, (count, post_id))
+            else:
+                del self.leaders[post_id]
+        elif count > 0:
+            if len(self.leaders) < self.k:
+                self.leaders[post_id] = count
+                heapq.heappush(self.heap, (count, post_id))
+            elif count > self.weakest()[0]:
+                _, evicted = heapq.heapreplace(self.heap, (count, post_id))
+                del self.leaders[evicted]
+                self.leaders[post_id] = count
+        if len(self.heap) > 4 * self.k:
+            self.heap = [(count, post_id) for post_id, count in self.leaders.items()]
+            heapq.heapify(self.heap)
+
+    def weakest(self):
+        """The leader with the fewest likes; drops stale entries on the way."""
+        while self.heap[0][0] != self.leaders.get(self.heap[0][1]):
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+    def subtract(self, counts):
+        for post_id, likes in counts.items():
+            count = self.totals[post_id] - likes
+            if count:
+                self.totals[post_id] = count
+            else:
+                del self.totals[post_id]
+
+    def replace(self, old, new):
+        """Swap one bucket's counts for a newer read of it."""
+        for post_id in old.keys() | new.keys():
+            count = self.totals[post_id] - old[post_id] + new[post_id]
+            if count:
+                self.totals[post_id] = count
+            else:
+                del self.totals[post_id]
+
+    def rebuild(self):
+        self.heap = heapq.nlargest(
+            self.k, ((count, post_id) for post_id, count in self.totals.items() if count > 0)
+        )
+        self.leaders = {post_id: count for count, post_id in self.heap}
+        heapq.heapify(self.heap)
+
+    def top(self, limit):
+        """``[(post_id, likes)]``, most liked first, newer posts first on ties."""
+        return sorted(self.leaders.items(), key=lambda item: (-item[1], -item[0]))[:limit]
+
+
+class TrendingPosts:
+    """Flask extension counting likes per post in time buckets."""
+
+    def __init__(self, app=None, db=None, TrendingBucket=None):
+        self.clock = time.time
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        if app is not None:
+            self.init_app(app, db, TrendingBucket)
+
+    def init_app(self, app, db, TrendingBucket):
+        app.config.setdefault('TRENDING_WINDOWS', {'1h': 3600, '24h': 24 * 3600})
+        app.config.setdefault('TRENDING_BUCKET_SECONDS', 300)
+        app.config.setdefault('TRENDING_TOP_K', 100)
+        app.config.setdefault('TRENDING_REFRESH_INTERVAL', 60)
+        self.db, self.TrendingBucket = db, TrendingBucket
+        self.config = app.config
+        self.bucket_seconds = app.config['TRENDING_BUCKET_SECONDS']
+        self.spans = {
+            name: max(1, seconds // self.bucket_seconds) for name, seconds in app.config['TRENDING_WINDOWS'].items()
+        }
+        app.extensions['trending'] = self
+
+    def _reset(self):
+        self._buckets = {}   # bucket index -> Counter of net likes per post
+        self._unsaved = {}   # the part of _buckets not yet in trending_buckets
+        self._saving = {}    # the copy of _unsaved the running flush writes
+        self._epoch = 0      # bumped each time saved counts leave _unsaved
+        self._windows = {}
+        self._loaded_at = self._loaded_bucket = None
+        self._newest = None  # bucket index the windows were last slid to
+        self._lock = threading.Lock()
+
+    def parse_window(self, args):
+        window = args.get('window') or next(iter(self.spans))
+        if window not in self.spans:
+            raise TrendingWindowError(f"window must be one of: {', '.join(self.spans)}")
+        return window
+
+    # Counting
+
+    def liked(self, post_id, liked):
+        """Count a toggle: +1 for a like, -1 for an unlike."""
+        delta = 1 if liked else -1
+        bucket = int(self.clock() // self.bucket_seconds)
+        with self._lock:
+            self._advance(bucket)
+            self._buckets.setdefault(bucket, Counter())[post_id] += delta
+            self._unsaved.setdefault(bucket, Counter())[post_id] += delta
+            for window in self._windows.values():
+                window.add(post_id, delta)
+
+    def discard_post(self, post_id):
+        """Forget a deleted post; its persisted rows age out with their buckets."""
+        with self._lock:
+            for counts in (*self._buckets.values(), *self._unsaved.values()):
+                counts.pop(post_id, None)
+            for window in self._windows.values():
+                window.totals.pop(post_id, None)
+                if window.leaders.pop(post_id, None) is not None:
+                    window.rebuild()
+
+    def _advance(self, bucket):
+        """Slide every window so that ``bucket`` is its newest; caller holds the lock."""
+        if bucket == self._newest:
+            return
+        self._newest = bucket
+        for window in self._windows.values():
+            first = bucket - window.span + 1
+            if window.first is None or first <= window.first:
+                continue
+            for index in sorted(index for index in self._buckets if window.first <= index < first):
+                window.subtract(self._buckets[index])
+            window.first = first
+            window.rebuild()
+        oldest = bucket - max(self.spans.values()) + 1
+        for index in [index for index in self._buckets if index < oldest]:
+            del self._buckets[index]
+        for index in [index for index in self._unsaved if index < oldest]:
+            del self._unsaved[index]
+
+    # Reading
+
+    def top(self, window, limit=None):
+        """``[(post_id, likes)]`` for the window, at most ``TRENDING_TOP_K``."""
+        now = self.clock()
+        if self._loaded_at is None:
+            self.load()
+        elif now - self._loaded_at >= self.config['TRENDING_REFRESH_INTERVAL']:
+            self.refresh()
+        with self._lock:
+            self._advance(int(now // self.bucket_seconds))
+            return self._windows[window].top(limit)
+
+    def _read(self, first):
+        """Bucket counts from ``trending_buckets``, from bucket ``first`` on,
+        and the epoch they were read in (None while a flush is saving)."""
+        with self._lock:
+            epoch = None if self._saving else self._epoch
+        TrendingBucket = self.TrendingBucket
+        rows = self.db.session.execute(
+            self.db.select(TrendingBucket.bucket_start, TrendingBucket.post_id, TrendingBucket.likes).where(
+                TrendingBucket.bucket_start >= first * self.bucket_seconds
+            )
+        )
+        buckets = {}
+        for bucket_start, post_id, likes in rows:
+            buckets.setdefault(bucket_start // self.bucket_seconds, Counter())[post_id] += likes
+        return buckets, epoch
+
+    def _merge_unsaved(self, buckets, first, epoch):
+        """Add this worker's unsaved toggles; caller holds the lock. Returns
+        False if a flush overlapped the read, whose counts are then left out."""
+        settled = epoch == self._epoch and not self._saving
+        for index, counts in self._unsaved.items():
+            if index >= first:
+                saving = {} if settled else self._saving.get(index, {})
+                merged = buckets.setdefault(index, Counter())
+                for post_id, likes in counts.items():
+                    merged[post_id] += likes - saving.get(post_id, 0)
+        return settled
+
+    def _read_at(self, now, settled):
+        """When the windows were last read: ``now``, or long enough ago that
+        the next request reads again."""
+        return now if settled else now - self.config['TRENDING_REFRESH_INTERVAL']
+
+    def load(self):
+        """Rebuild the windows from ``trending_buckets`` plus unsaved toggles."""
+        now = self.clock()
+        bucket = int(now // self.bucket_seconds)
+        oldest = bucket - max(self.spans.values()) + 1
+        buckets, epoch = self._read(oldest)
+        with self._lock:
+            settled = self._merge_unsaved(buckets, oldest, epoch)
+            self._buckets = buckets
+            self._windows = {}
+            for name, span in self.spans.items():
+                window = Window(span, self.config['TRENDING_TOP_K'])
+                window.first = bucket - span + 1
+                for index, counts in buckets.items():
+                    if index >= window.first:
+                        window.totals.update(counts)
+                window.rebuild()
+                self._windows[name] = window
+            self._newest = None
+            self._advance(bucket)
+            self._loaded_at, self._loaded_bucket = self._read_at(now, settled), bucket
+
+    def refresh(self):
+        """Re-read only the buckets that can have changed since the last read:
+        the ones from then on, and the one before it for flushes that were
+        late. Older buckets are complete once every worker has flushed."""
+        now = self.clock()
+        first = self._loaded_bucket - 1
+        fresh, epoch = self._read(first)
+        with self._lock:
+            settled = self._merge_unsaved(fresh, first, epoch)
+            for index in fresh.keys() | {index for index in self._buckets if index >= first}:
+                old, new = self._buckets.get(index, Counter()), fresh.get(index, Counter())
+                for window in self._windows.values():
+                    if index >= window.first:
+                        window.replace(old, new)
+                if new:
+                    self._buckets[index] = new
+                else:
+                    self._buckets.pop(index, None)
+            for window in self._windows.values():
+                window.rebuild()
+            self._loaded_at = self._read_at(now, settled)
+            if settled:
+                self._loaded_bucket = int(now // self.bucket_seconds)
+
+    # Persisting, in the like buffer's flush transaction
+
+    def save(self):
+        """Add the unsaved bucket counts to ``trending_buckets``; the caller commits."""
+        with self._lock:
+            self._saving = {index: Counter(counts) for index, counts in self._unsaved.items()}
+        rows = [{'bucket_start': index * self.bucket_seconds, 'post_id': post_id, 'likes': likes}
+                for index, counts in self._saving.items() for post_id, likes in counts.items() if likes]
+        if not rows:
+            return
+        session = self.db.session
+        TrendingBucket = self.TrendingBucket
+        dialect = session.get_bind().dialect.name
+        if dialect in UPSERT_DIALECTS:
+            insert = import_module(f'sqlalchemy.dialects.{dialect}').insert
+            statement = insert(TrendingBucket)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['bucket_start', 'post_id'],
+                set_={'likes': TrendingBucket.likes + statement.excluded.likes}
+            ), rows)
+        else:
+            for row in rows:
+                existing = session.get(TrendingBucket, (row['bucket_start'], row['post_id']))
+                if existing:
+                    existing.likes += row['likes']
+                else:
+                    session.add(TrendingBucket(**row))
+        # Buckets older than the longest window are no longer read
+        oldest = int(self.clock() // self.bucket_seconds) - max(self.spans.values()) + 1
+        session.query(TrendingBucket).filter(
+            TrendingBucket.bucket_start < oldest * self.bucket_seconds
+        ).delete(synchronize_session=False)
+
+    def saved(self):
+        """The flush committed what ``save`` wrote. After a failed flush the
+        counts stay unsaved and the next flush writes them."""
+        with self._lock:
+            for index, counts in self._saving.items():
+                unsaved = self._unsaved.get(index, {})
+                # Posts discarded since are gone from _unsaved already
+                for post_id in counts.keys() & unsaved.keys():
+                    unsaved[post_id] -= counts[post_id]
+                    if not unsaved[post_id]:
+                        del unsaved[post_id]
+                if index in self._unsaved and not unsaved:
+                    del self._unsaved[index]
+            self._saving = {}
+            self._epoch += 1
+
+    def unsaved(self):
+        """The flush was rolled back: its counts stay unsaved, as they were."""
+        with self._lock:
+            self._saving = {}
+
+    def clear(self):
+        with self._lock:
+            self._buckets, self._unsaved, self._saving, self._windows = {}, {}, {}, {}
+            self._loaded_at = self._loaded_bucket = self._newest = None
+
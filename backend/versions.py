@@ -0,0 +1,97 @@
+"""Versions of the feeds, profiles and user list, for conditional GETs.
+
+Each is one query for ``updated_at`` values, answered from
+``ix_posts_updated_at``/``ix_users_updated_at`` (or the primary key)
+without touching the rows being served:
+
+* a post's ``updated_at`` moves when it is created and when a like flush
+  recounts its ``likes_count``;
+* a user's moves with every profile edit and every post they create or
+  delete (``posts_count``), which also covers author names on the feeds and
+  posts disappearing from them.
+
+Toggles still in the like buffer aren't in the database; the buffer's own
+``version()`` is added for the responses it overlays, ``?sort=ranked``
+adds the ranking's cache bucket, and ``?feed=network`` the viewer's newest
+connection and connection count (a disconnect only changes the count). The
+``*_statement``
+functions are shared with the async handlers.
+"""
+from flask import request
+
+from conditional import Version
+from extensions import db, like_buffer, ranked_feed
+from models import Connection, Post, User
+from viewer import current_viewer_id
+
+
+def latest(column, *criteria):
+    return db.select(db.func.max(column)).where(*criteria).scalar_subquery()
+
+
+def feed_statement(network_of=None):
+    columns = [latest(Post.updated_at), latest(User.updated_at)]
+    if network_of:
+        columns += [
+            latest(Connection.created_at, Connection.user_id == network_of),
+            db.select(db.func.count(Connection.id)).where(Connection.user_id == network_of).scalar_subquery()
+        ]
+    return db.select(*columns)
+
+
+def author_feed_statement(user_id):
+    return db.select(latest(Post.updated_at, Post.author_id == user_id),
+                     latest(User.updated_at, User.id == user_id))
+
+
+def profile_statement(user_id):
+    return db.select(User.updated_at).where(User.id == user_id)
+
+
+def users_statement():
+    return db.select(latest(User.updated_at))
+
+
+def version_of(row, overlaid=False, ranked=False, network=False):
+    """A ``Version`` from a statement's row; ``None`` if there was no row.
+
+    A ranked feed also changes with its ranking's cache bucket; a network
+    feed's row ends with the viewer's connection count.
+    """
+    if row is None:
+        return None
+    state = like_buffer.version() if overlaid else ()
+    if ranked:
+        state += (('ranked', ranked_feed.bucket()),)
+    if network:
+        *row, connections = row
+        state += (('connections', connections),)
+    return Version(row, state)
+
+
+def is_ranked(args):
+    return args.get('sort') == 'ranked'
+
+
+def is_network(args):
+    return args.get('feed') == 'network'
+
+
+# Flask views (arguments are the view's URL arguments)
+
+def feed():
+    network_of = current_viewer_id() if is_network(request.args) else None
+    return version_of(db.session.execute(feed_statement(network_of)).first(), overlaid=True,
+                      ranked=is_ranked(request.args), network=bool(network_of))
+
+
+def author_feed(user_id):
+    return version_of(db.session.execute(author_feed_statement(user_id)).first(), overlaid=True)
+
+
+def profile(user_id):
+    return version_of(db.session.execute(profile_statement(user_id)).first())
+
+
+def users():
+    return version_of(db.session.execute(users_statement()).first())
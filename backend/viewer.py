@@ -0,0 +1,149 @@
+"""Resolve the requesting user once per request.
+
+``ViewerResolver`` runs before every request, decodes the bearer token (if
+any) and stores the result on ``g``. Views read it through
+``current_viewer_id()`` or protect themselves with ``@viewer_required``
+instead of each calling ``verify_jwt_in_request``/``get_jwt_identity``.
+
+Verified tokens are kept in a bounded LRU until they expire (never longer
+than ``JWT_ACCESS_TOKEN_EXPIRES``), so repeat requests with the same token
+skip signature checking. Only access tokens with an integer ``sub`` are
+accepted; anything else is a 401.
+
+The resolver also caches each user's serialized profile, keyed by the
+user's ``updated_at``, which moves with every profile edit and post count
+change. Callers read that (one primary-key lookup) and only get the cached
+copy if it still matches, so an edit made on any worker shows at once.
+``forget_user`` drops this worker's copy right away.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, jsonify, request
+from flask_jwt_extended import decode_token
+from jwt import ExpiredSignatureError
+
+
+class LRUCache:
+    """A small thread-safe LRU of ``key -> (expires_at, value)``."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class ViewerResolver:
+    """Flask extension that decodes the Authorization header once per request."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('VIEWER_CACHE_SIZE', 10000)
+        app.config.setdefault('VIEWER_PROFILE_TTL', 60)
+        self.tokens = LRUCache(app.config['VIEWER_CACHE_SIZE'])
+        self.profiles = LRUCache(app.config['VIEWER_CACHE_SIZE'])
+        self.max_token_age = app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()
+        self.profile_ttl = app.config['VIEWER_PROFILE_TTL']
+        app.before_request(self.resolve)
+        app.extensions['viewer_resolver'] = self
+
+    def resolve(self):
+        g.viewer_id = None
+        g.viewer_error = ('Missing Authorization Header', 401)
+
+        header = request.headers.get('Authorization', '')
+        if not header:
+            return
+        scheme, _, token = header.partition(' ')
+        if scheme != 'Bearer' or not token:
+            g.viewer_error = ("Missing 'Bearer' type in 'Authorization' header", 422)
+            return
+
+        g.viewer_id, g.viewer_error = self.resolve_token(token)
+
+    def resolve_token(self, token):
+        """Return ``(viewer_id, None)`` or ``(None, (message, status))``.
+
+        Needs an app context when the token isn't cached yet.
+        """
+        viewer_id = self.tokens.get(token)
+        if viewer_id is None:
+            try:
+                claims = decode_token(token)
+            except ExpiredSignatureError:
+                return None, ('Token has expired', 401)
+            except Exception as e:
+                return None, (str(e) or 'Invalid token', 422)
+            if claims.get('type', 'access') != 'access':
+                return None, ('Only access tokens are allowed', 401)
+            try:
+                viewer_id = int(claims['sub'])
+            except (KeyError, TypeError, ValueError):
+                return None, ('Invalid token subject', 401)
+            expires_at = min(claims.get('exp', float('inf')), time.time() + self.max_token_age)
+            self.tokens.set(token, viewer_id, expires_at)
+        return viewer_id, None
+
+    # Cached profile summaries
+
+    def profile(self, user_id, updated_at):
+        """The cached profile, if it was built from this ``updated_at``."""
+        cached = self.profiles.get(user_id)
+        if cached is None or cached[0] != updated_at:
+            return None
+        return cached[1]
+
+    def remember_profile(self, user_id, updated_at, profile):
+        self.profiles.set(user_id, (updated_at, profile), time.time() + self.profile_ttl)
+        return profile
+
+    def forget_user(self, user_id):
+        self.profiles.pop(user_id)
+
+
+def current_viewer_id():
+    """The authenticated user's id, or None for anonymous/invalid tokens."""
+    return g.get('viewer_id')
+
+
+def viewer_required(view):
+    """Like ``@jwt_required()`` but reuses the token resolved before the request."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.get('viewer_id') is None:
+            message, status = g.get('viewer_error') or ('Missing Authorization Header', 401)
+            return jsonify({'msg': message}), status
+        return view(*args, **kwargs)
+    return wrapper
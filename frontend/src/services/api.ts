@@ -12,9 +12,23 @@ api.interceptors.request.use((config) => {
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  // Keeps reads on the primary database just after this user's writes
+  const pin = sessionStorage.getItem('readYourWrites');
+  if (pin) {
+    config.headers['X-Read-Your-Writes'] = pin;
+  }
   return config;
 });
 
+// Write responses carry a short-lived read-your-writes pin
+api.interceptors.response.use((response) => {
+  const pin = response.headers['x-read-your-writes'];
+  if (pin) {
+    sessionStorage.setItem('readYourWrites', pin);
+  }
+  return response;
+});
+
 export const authAPI = {
   login: (email: string, password: string) =>
     api.post('/auth/login', { email, password }),